@@ -0,0 +1,81 @@
+"""
+AgroAI Streaming Batch Prediction
+Runs many images through the shared inference path with bounded in-flight work
+"""
+
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def stream_predictions(entries: Iterable[Tuple[str, BinaryIO]],
+                       predict_fn: Callable[[BinaryIO], Dict[str, Any]],
+                       max_in_flight: int = 32, max_images: int = 1000,
+                       executor: ThreadPoolExecutor = None,
+                       slots: Optional[threading.Semaphore] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one result dict per image in completion order.
+
+    At most max_in_flight images are decoded or queued for inference at
+    once, so memory stays bounded however large the upload is. slots,
+    shared by every request on the same executor, bounds the images held
+    across all of them; one is taken before an image is read and given
+    back when its prediction finishes. Concurrent submissions land in the
+    same micro-batches as regular /api/predict traffic.
+    """
+    own_executor = executor is None
+    executor = executor or ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='batch-predict')
+    pending: Dict[Future, Tuple[int, str]] = {}
+    index = 0
+
+    def release(_=None):
+        if slots is not None:
+            slots.release()
+
+    def drain(return_when) -> Iterator[Dict[str, Any]]:
+        done, _ = wait(list(pending), return_when=return_when)
+        for future in done:
+            position, name = pending.pop(future)
+            try:
+                yield {'index': position, 'filename': name, 'result': future.result()}
+            except Exception as e:
+                logger.error(f"Batch prediction failed for {name}: {e}")
+                yield {'index': position, 'filename': name, 'error': str(e)}
+
+    try:
+        entry_iter = iter(entries)
+        while True:
+            if slots is not None:
+                slots.acquire()
+            try:
+                name, stream = next(entry_iter)
+            except StopIteration:
+                release()
+                break
+            except Exception as e:
+                # A corrupt archive member ends the stream but keeps earlier results
+                release()
+                yield {'index': index, 'error': str(e)}
+                break
+
+            if index >= max_images:
+                release()
+                yield {'index': index, 'error': f'Batch limit of {max_images} images reached'}
+                break
+
+            future = executor.submit(predict_fn, stream)
+            future.add_done_callback(release)
+            pending[future] = (index, name)
+            index += 1
+            if len(pending) >= max_in_flight:
+                yield from drain(FIRST_COMPLETED)
+
+        while pending:
+            yield from drain(FIRST_COMPLETED)
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
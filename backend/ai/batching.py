@@ -0,0 +1,168 @@
+"""
+AgroAI Micro-Batching Inference Scheduler
+Packs concurrent prediction requests into a single batched forward pass
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Queue concurrent inference requests and run them as one batch"""
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 name: str = 'ai-batcher', workers: int = 1):
+        """
+        batch_fn receives a list of inputs and must return one result per
+        input, in the same order. With workers > 1, that many batches may be
+        in flight at once, so batch_fn must be thread-safe.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}
+        self._latencies_ms = deque(maxlen=2048)
+        self._total_requests = 0
+        self._total_batches = 0
+        self._total_errors = 0
+        self._max_queue_depth = 0
+        self._running = True
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-{index}", daemon=True)
+            for index in range(max(1, int(workers)))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Enqueue an input and return a future for its result"""
+        if not self._running:
+            raise RuntimeError(f"{self.name} is stopped")
+
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return future
+
+    def predict(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Submit an input and block until its batched result is ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker threads after draining queued requests"""
+        self._running = False
+        self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+    def _collect_batch(self) -> List[tuple]:
+        """Block for the first request, then gather more until full or the wait expires"""
+        first = self._queue.get()
+        if first is None:
+            # Leave the sentinel for the other worker threads
+            self._queue.put(None)
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the sentinel so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        """Worker loop: collect a batch, run it, fan results back out"""
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                if not self._running:
+                    break
+                continue
+
+            inputs = [entry[0] for entry in batch]
+            try:
+                results = self.batch_fn(inputs)
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"batch_fn returned {len(results)} results for {len(batch)} inputs"
+                    )
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Batched inference failed ({len(batch)} requests): {e}")
+                with self._stats_lock:
+                    self._total_errors += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self._record_batch(batch)
+
+    def _record_batch(self, batch: List[tuple]):
+        """Update batch-size and latency counters"""
+        now = time.perf_counter()
+        with self._stats_lock:
+            size = len(batch)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._total_batches += 1
+            self._total_requests += size
+            for _, _, enqueued_at in batch:
+                self._latencies_ms.append((now - enqueued_at) * 1000.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue-depth, batch-size and latency statistics"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies_ms)
+            total_batches = self._total_batches
+            total_requests = self._total_requests
+            histogram = dict(sorted(self._batch_sizes.items()))
+            max_depth = self._max_queue_depth
+            errors = self._total_errors
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))
+            return round(latencies[index], 3)
+
+        return {
+            'max_batch_size': self.max_batch_size,
+            'workers': len(self._workers),
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': max_depth,
+            'total_requests': total_requests,
+            'total_batches': total_batches,
+            'total_errors': errors,
+            'avg_batch_size': round(total_requests / total_batches, 3) if total_batches else 0.0,
+            'batch_size_histogram': histogram,
+            'latency_ms': {
+                'p50': percentile(50),
+                'p95': percentile(95),
+                'p99': percentile(99)
+            }
+        }
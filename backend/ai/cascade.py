@@ -0,0 +1,85 @@
+"""
+AgroAI Model Cascade
+Runs a small model first and escalates only low-confidence images to the full model
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+STAGE_FAST = 'fast'
+STAGE_FULL = 'full'
+
+class ModelCascade:
+    """Two-stage confidence-gated cascade over a normalized input batch"""
+
+    def __init__(self, fast_model, full_model, confidence_threshold: float = 0.9):
+        self.fast_model = fast_model
+        self.full_model = full_model
+        self.confidence_threshold = float(confidence_threshold)
+
+        self._lock = threading.Lock()
+        self._latencies_ms = {STAGE_FAST: deque(maxlen=2048), STAGE_FULL: deque(maxlen=2048)}
+        self._images = 0
+        self._escalated = 0
+
+    def __call__(self, batch: torch.Tensor) -> Tuple[torch.Tensor, List[str]]:
+        """Return softmax probabilities and the answering stage for each image"""
+        start = time.perf_counter()
+        probabilities = torch.nn.functional.softmax(self.fast_model(batch), dim=1)
+        fast_ms = (time.perf_counter() - start) * 1000.0
+
+        confidence = probabilities.max(dim=1).values
+        escalate = (confidence < self.confidence_threshold).nonzero(as_tuple=True)[0]
+        stages = [STAGE_FAST] * batch.shape[0]
+
+        full_ms: Optional[float] = None
+        if escalate.numel():
+            start = time.perf_counter()
+            full_probabilities = torch.nn.functional.softmax(
+                self.full_model(batch.index_select(0, escalate)), dim=1
+            )
+            full_ms = (time.perf_counter() - start) * 1000.0
+            probabilities = probabilities.clone()
+            probabilities[escalate] = full_probabilities.to(probabilities.dtype)
+            for index in escalate.tolist():
+                stages[index] = STAGE_FULL
+
+        with self._lock:
+            self._images += batch.shape[0]
+            self._escalated += int(escalate.numel())
+            self._latencies_ms[STAGE_FAST].append(fast_ms)
+            if full_ms is not None:
+                self._latencies_ms[STAGE_FULL].append(full_ms)
+        return probabilities, stages
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-stage batch latency and escalation rate"""
+        with self._lock:
+            images = self._images
+            escalated = self._escalated
+            latencies = {stage: sorted(values) for stage, values in self._latencies_ms.items()}
+
+        def summary(values: List[float]) -> Dict[str, Optional[float]]:
+            if not values:
+                return {'batches': 0, 'mean': None, 'p50': None, 'p99': None}
+            return {
+                'batches': len(values),
+                'mean': round(sum(values) / len(values), 3),
+                'p50': round(values[len(values) // 2], 3),
+                'p99': round(values[min(len(values) - 1, int(0.99 * (len(values) - 1)))], 3)
+            }
+
+        return {
+            'confidence_threshold': self.confidence_threshold,
+            'images': images,
+            'escalated': escalated,
+            'escalation_rate': round(escalated / images, 4) if images else 0.0,
+            'latency_ms': {stage: summary(values) for stage, values in latencies.items()}
+        }
@@ -0,0 +1,65 @@
+"""
+AgroAI Image Decoding
+Reduced-resolution JPEG decoding for model input
+"""
+
+import io
+import logging
+from typing import BinaryIO, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .labels import MODEL_INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+# libjpeg can scale by 1/2, 1/4 and 1/8 while decoding, in the DCT domain
+_CV2_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+def reduction_factor(width: int, height: int, target_size: int = MODEL_INPUT_SIZE) -> int:
+    """Largest JPEG scale denominator that keeps both sides >= target_size"""
+    for factor, _ in _CV2_REDUCED_FLAGS:
+        if width // factor >= target_size and height // factor >= target_size:
+            return factor
+    return 1
+
+def decode_image(source: Union[str, BinaryIO], target_size: int = MODEL_INPUT_SIZE) -> Image.Image:
+    """
+    Decode an image as RGB at the smallest JPEG scale still >= target_size.
+    Non-JPEG formats are decoded at full resolution.
+    """
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        # draft() never goes below the requested size, so the final resize
+        # to (target_size, target_size) only ever downsamples
+        image.draft('RGB', (target_size, target_size))
+    return image.convert('RGB')
+
+def decode_image_cv2(source: Union[str, BinaryIO, bytes],
+                     target_size: int = MODEL_INPUT_SIZE) -> np.ndarray:
+    """Decode to an RGB uint8 array using cv2.IMREAD_REDUCED_* for JPEGs"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            data = f.read()
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        data = source.read()
+
+    flag = cv2.IMREAD_COLOR
+    # Only the header is parsed here; pixels are decoded by cv2 below
+    header = Image.open(io.BytesIO(data))
+    if header.format == 'JPEG':
+        factor = reduction_factor(header.width, header.height, target_size)
+        flag = dict(_CV2_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+
+    array = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if array is None:
+        raise ValueError("Unable to decode image")
+    return cv2.cvtColor(array, cv2.COLOR_BGR2RGB)
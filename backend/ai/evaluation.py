@@ -0,0 +1,63 @@
+"""
+AgroAI Model Evaluation
+Sample-directory loading and per-class top-1 agreement between two models
+"""
+
+import os
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import torch
+
+from .decode import decode_image
+from .labels import MODEL_INPUT_SIZE, PLANT_DISEASE_CLASSES
+from .preprocessing import BatchPreprocessor
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+def collect_images(root: str) -> List[Tuple[str, str]]:
+    """Return (path, label) pairs; label is the class sub-directory or ''"""
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        label = os.path.basename(dirpath) if dirpath != root else ''
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                images.append((os.path.join(dirpath, filename), label))
+    return images
+
+def iter_batches(images: List[Tuple[str, str]], batch_size: int = 16,
+                 size: int = MODEL_INPUT_SIZE) -> Iterator[Tuple[torch.Tensor, List[str]]]:
+    """Yield (normalized batch, labels) using the production decode/preprocess path"""
+    preprocessor = BatchPreprocessor(batch_size, size)
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        arrays = [np.asarray(decode_image(path, size)) for path, _ in chunk]
+        # prepare() returns a view into a reused buffer; clone before yielding
+        yield preprocessor.prepare(arrays).clone(), [label for _, label in chunk]
+
+def per_class_agreement(reference_model, candidate_model, images: List[Tuple[str, str]],
+                        batch_size: int = 16) -> Dict[str, Dict[str, float]]:
+    """
+    Compare top-1 predictions of two models. Images are grouped by their
+    directory label when it names a class, otherwise by the reference
+    model's prediction.
+    """
+    per_class: Dict[str, Dict[str, float]] = {}
+    with torch.no_grad():
+        for batch, labels in iter_batches(images, batch_size):
+            reference = reference_model(batch).argmax(dim=1).tolist()
+            candidate = candidate_model(batch).argmax(dim=1).tolist()
+            for label, ref_idx, cand_idx in zip(labels, reference, candidate):
+                key = label if label in PLANT_DISEASE_CLASSES else PLANT_DISEASE_CLASSES[ref_idx]
+                counts = per_class.setdefault(key, {'total': 0, 'agree': 0})
+                counts['total'] += 1
+                counts['agree'] += int(ref_idx == cand_idx)
+
+    for counts in per_class.values():
+        counts['agreement'] = counts['agree'] / counts['total']
+    return per_class
+
+def overall_agreement(per_class: Dict[str, Dict[str, float]]) -> float:
+    total = sum(counts['total'] for counts in per_class.values())
+    agree = sum(counts['agree'] for counts in per_class.values())
+    return agree / total if total else 0.0
@@ -0,0 +1,124 @@
+"""
+AgroAI Model Loader
+Loads the disease model as a pickled module, TorchScript or ONNX Runtime session
+
+Export a compiled artifact from the pickled checkpoint with:
+    python -m backend.ai.model_loader --format torchscript \
+        --source models/plant_disease_model.pth --output models/plant_disease_model.pt
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import torch
+
+from .labels import MODEL_INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMATS = ('pytorch', 'torchscript', 'onnx')
+
+DEFAULT_MODEL_PATHS = {
+    'pytorch': 'models/plant_disease_model.pth',
+    'torchscript': 'models/plant_disease_model.pt',
+    'onnx': 'models/plant_disease_model.onnx'
+}
+
+class OnnxModel:
+    """ONNX Runtime CPU session with the same call signature as a torch module"""
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime is required for AI_MODEL_FORMAT=onnx") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        # ONNX Runtime expects a contiguous NCHW array
+        inputs = batch.detach().cpu().contiguous().numpy()
+        outputs = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(outputs)
+
+    def eval(self) -> 'OnnxModel':
+        return self
+
+def load_model(model_format: str, model_path: str, device: torch.device):
+    """Load a model artifact and return a callable mapping a batch to logits"""
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Unknown model format '{model_format}', expected one of {MODEL_FORMATS}")
+
+    if model_format == 'onnx':
+        return OnnxModel(model_path, num_threads=torch.get_num_threads())
+
+    if model_format == 'torchscript':
+        model = torch.jit.load(model_path, map_location=device)
+        model.eval()
+        try:
+            # Freezes weights and fuses conv/bn ahead of the first request
+            model = torch.jit.optimize_for_inference(model)
+        except Exception as e:
+            logger.warning(f"TorchScript optimize_for_inference skipped: {e}")
+        return model
+
+    model = torch.load(model_path, map_location=device)
+    model.eval()
+    return model
+
+def warmup(model, device: torch.device, batch_sizes: Iterable[int],
+           size: int = MODEL_INPUT_SIZE) -> Dict[int, float]:
+    """Run one forward pass per batch size and return their latencies in ms"""
+    timings = {}
+    with torch.no_grad():
+        for batch_size in sorted(set(batch_sizes)):
+            dummy = torch.zeros((batch_size, 3, size, size), dtype=torch.float32).to(
+                device, memory_format=torch.channels_last
+            )
+            start = time.perf_counter()
+            model(dummy)
+            timings[batch_size] = round((time.perf_counter() - start) * 1000.0, 3)
+    return timings
+
+def export_model(model_format: str, source: str, output: str, size: int = MODEL_INPUT_SIZE):
+    """Export the pickled checkpoint to TorchScript or ONNX"""
+    model = torch.load(source, map_location='cpu')
+    model.eval()
+    example = torch.zeros((1, 3, size, size), dtype=torch.float32)
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    if model_format == 'torchscript':
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example)
+        traced.save(output)
+    elif model_format == 'onnx':
+        torch.onnx.export(
+            model, example, output,
+            input_names=['input'], output_names=['logits'],
+            dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=17
+        )
+    else:
+        raise ValueError(f"Cannot export to '{model_format}'")
+    logger.info(f"Exported {source} to {output} ({model_format})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the AgroAI model to a compiled format')
+    parser.add_argument('--format', choices=('torchscript', 'onnx'), required=True)
+    parser.add_argument('--source', default=DEFAULT_MODEL_PATHS['pytorch'])
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_model(args.format, args.source, args.output or DEFAULT_MODEL_PATHS[args.format])
+
+if __name__ == '__main__':
+    main()
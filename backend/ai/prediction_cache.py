@@ -0,0 +1,150 @@
+"""
+AgroAI Prediction Cache
+Content-addressed cache of disease predictions keyed by image SHA-256
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+def sha256_file(source: Union[str, BinaryIO], chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file path or seekable file object without loading it at once"""
+    hash_obj = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hash_obj.update(chunk)
+    else:
+        start = source.tell()
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            hash_obj.update(chunk)
+        source.seek(start)
+    return hash_obj.hexdigest()
+
+class PredictionCache:
+    """Two-tier prediction cache: in-process LRU plus optional Redis"""
+
+    def __init__(self, redis_client=None, max_entries: int = 1024,
+                 ttl_seconds: int = 3600, model_version: str = 'unversioned',
+                 prefix: str = 'agroai:prediction'):
+        self.redis_client = redis_client
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self.prefix = prefix
+        self.model_version = model_version
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'redis_errors': 0
+        }
+
+    def set_model_version(self, model_version: str):
+        """Invalidate cached predictions produced by a different model"""
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            self._entries.clear()
+        # Redis keys are namespaced by version, so stale entries simply
+        # become unreachable and age out through their TTL
+        logger.info(f"Prediction cache invalidated for model version {model_version}")
+
+    def _redis_key(self, digest: str) -> str:
+        return f"{self.prefix}:{self.model_version}:{digest}"
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Look up a prediction by image digest"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(digest)
+                    self._counters['local_hits'] += 1
+                    return dict(result)
+                del self._entries[digest]
+                self._counters['expirations'] += 1
+
+        result = self._redis_get(digest)
+        if result is not None:
+            self._store_local(digest, result)
+            with self._lock:
+                self._counters['redis_hits'] += 1
+            return dict(result)
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def set(self, digest: str, result: Dict[str, Any]):
+        """Store a prediction for an image digest in both tiers"""
+        self._store_local(digest, result)
+        self._redis_set(digest, result)
+
+    def clear(self):
+        """Drop every entry from the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, digest: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self.ttl_seconds, dict(result))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _redis_get(self, digest: str) -> Optional[Dict[str, Any]]:
+        if self.redis_client is None:
+            return None
+        try:
+            cached = self.redis_client.get(self._redis_key(digest))
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            self._record_redis_error(e)
+            return None
+
+    def _redis_set(self, digest: str, result: Dict[str, Any]):
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.setex(self._redis_key(digest), self.ttl_seconds, json.dumps(result))
+        except Exception as e:
+            self._record_redis_error(e)
+
+    def _record_redis_error(self, error: Exception):
+        with self._lock:
+            self._counters['redis_errors'] += 1
+        logger.warning(f"Prediction cache Redis tier unavailable: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and occupancy"""
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+
+        hits = counters['local_hits'] + counters['redis_hits']
+        lookups = hits + counters['misses']
+        return {
+            'model_version': self.model_version,
+            'entries': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'redis_enabled': self.redis_client is not None,
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            **counters
+        }
@@ -0,0 +1,105 @@
+"""
+AgroAI Batch Preprocessing
+cv2 resize and single-op normalization into a reusable channels-last input buffer
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+import torch
+
+from .labels import MODEL_INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# Accepted mean |difference| against the torchvision Resize/ToTensor/Normalize
+# chain, in normalized units. Normalization is the same arithmetic; the gap
+# comes only from PIL and cv2 using different resampling kernels, so output is
+# not bit-exact. 0.02 is roughly 1/255 of pixel intensity. Measure with
+# backend.benchmarks.preprocess_benchmark.
+PARITY_TOLERANCE = 0.02
+
+class BatchPreprocessor:
+    """
+    Resizes RGB uint8 images with cv2 and normalizes the whole batch at once.
+    Output tensors are views into a preallocated channels-last buffer and are
+    only valid until the next call to prepare(); callers must serialize use
+    of a preprocessor across threads.
+    """
+
+    def __init__(self, max_batch_size: int, size: int = MODEL_INPUT_SIZE,
+                 mean: Iterable[float] = IMAGENET_MEAN, std: Iterable[float] = IMAGENET_STD,
+                 staging: Optional[np.ndarray] = None):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.size = size
+
+        # NHWC uint8 staging area written by cv2.resize(dst=...); may be
+        # supplied by the caller, e.g. as a view over shared memory
+        shape = (self.max_batch_size, size, size, 3)
+        if staging is not None and (staging.shape != shape or staging.dtype != np.uint8):
+            raise ValueError(f"Staging buffer must be uint8 with shape {shape}")
+        self.staging = staging if staging is not None else np.empty(shape, dtype=np.uint8)
+        # NCHW float tensor whose memory is NHWC (channels_last), so the
+        # staging layout maps onto it without a transpose copy. Allocated on
+        # first normalize() so resize-only users do not pay for it.
+        self._input = None
+        self._input_nhwc = None
+
+        # ToTensor + Normalize folded into one multiply-add per element
+        mean_t = torch.tensor(mean, dtype=torch.float32)
+        std_t = torch.tensor(std, dtype=torch.float32)
+        self._scale = 1.0 / (255.0 * std_t)
+        self._shift = -mean_t / std_t
+
+    def resize_into(self, index: int, image: np.ndarray):
+        """Resize one HxWx3 RGB uint8 image into staging slot `index`"""
+        height, width = image.shape[:2]
+        # INTER_AREA tracks PIL's antialiased bilinear on downscale
+        interpolation = cv2.INTER_AREA if (height > self.size or width > self.size) else cv2.INTER_LINEAR
+        cv2.resize(image, (self.size, self.size), dst=self.staging[index], interpolation=interpolation)
+
+    def stage(self, images: List[np.ndarray]) -> int:
+        """Resize RGB uint8 arrays into the staging area and return the count"""
+        count = len(images)
+        if count > self.max_batch_size:
+            raise ValueError(f"Batch of {count} exceeds buffer size {self.max_batch_size}")
+
+        for index, image in enumerate(images):
+            self.resize_into(index, image)
+        return count
+
+    def normalize(self, count: int) -> torch.Tensor:
+        """Normalize the first `count` staged images into the float buffer"""
+        if self._input is None:
+            self._input = torch.empty(
+                (self.max_batch_size, 3, self.size, self.size), dtype=torch.float32
+            ).contiguous(memory_format=torch.channels_last)
+            self._input_nhwc = self._input.permute(0, 2, 3, 1)
+
+        output = self._input_nhwc[:count]
+        output.copy_(torch.from_numpy(self.staging[:count]))
+        output.mul_(self._scale).add_(self._shift)
+        return self._input[:count]
+
+    def prepare(self, images: List[np.ndarray]) -> torch.Tensor:
+        """Fill the buffer from RGB uint8 arrays and return the normalized batch"""
+        return self.normalize(self.stage(images))
+
+def parity_report(preprocessor: BatchPreprocessor, images: List[np.ndarray], transform) -> Dict[str, float]:
+    """Compare the batched path against a torchvision transform on PIL images"""
+    from PIL import Image
+
+    reference = torch.stack([transform(Image.fromarray(image)) for image in images])
+    candidate = preprocessor.prepare(images)
+    diff = (candidate - reference).abs()
+    return {
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+        'tolerance': PARITY_TOLERANCE,
+        'within_tolerance': bool(diff.mean() <= PARITY_TOLERANCE)
+    }
@@ -0,0 +1,199 @@
+"""
+AgroAI INT8 Quantization
+Builds, evaluates and gates an INT8 CPU variant of the disease model
+
+Build and evaluate a quantized artifact with:
+    python -m backend.ai.quantization --mode static --images path/to/samples \
+        [--source models/plant_disease_model.pth] [--threshold 0.98]
+
+The command calibrates on the sample images (static mode), then reports
+per-class top-1 agreement with fp32 across the 25 PlantVillage classes.
+It writes the TorchScript artifact and a JSON report only if every
+class has evaluation images and meets the threshold. At startup,
+AIService loads the artifact only when the report says it passed and
+every class is at least AI_QUANTIZATION_MIN_AGREEMENT.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from .evaluation import collect_images, iter_batches, overall_agreement, per_class_agreement
+from .labels import MODEL_INPUT_SIZE, PLANT_DISEASE_CLASSES
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ('dynamic', 'static')
+DEFAULT_QUANTIZED_MODEL_PATH = 'models/plant_disease_model_int8.pt'
+DEFAULT_MIN_AGREEMENT = 0.98
+
+def _select_engine():
+    """Pick the best available quantized CPU kernel backend"""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("No quantized CPU engine available in this torch build")
+
+def quantize_dynamic(model):
+    """INT8 weights for Linear layers, activations quantized on the fly"""
+    _select_engine()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def quantize_static(model, calibration_images: List[Tuple[str, str]], batch_size: int = 16):
+    """Post-training static INT8 via FX graph mode, calibrated on sample images"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = _select_engine()
+    example = torch.zeros((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example,))
+    with torch.no_grad():
+        for batch, _ in iter_batches(calibration_images, batch_size):
+            prepared(batch)
+    return convert_fx(prepared)
+
+def report_path_for(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + '.json'
+
+def failing_classes(per_class: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Classes with no evaluation images or agreement below threshold"""
+    return [name for name in PLANT_DISEASE_CLASSES
+            if not per_class.get(name, {}).get('total')
+            or per_class[name].get('agreement', 0.0) < threshold]
+
+def split_by_class(images: List[Tuple[str, str]], fraction: float) -> Tuple[List, List]:
+    """
+    Calibration and evaluation sets drawn from each label separately, so
+    every class with images keeps at least one for evaluation
+    """
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    for image in images:
+        groups.setdefault(image[1], []).append(image)
+    calibration, evaluation_set = [], []
+    rng = random.Random(0)
+    for label in sorted(groups):
+        group = groups[label]
+        rng.shuffle(group)
+        split = min(len(group) - 1, int(len(group) * fraction))
+        calibration.extend(group[:split])
+        evaluation_set.extend(group[split:])
+    return calibration, evaluation_set
+
+def evaluate(fp32_model, quantized_model, images: List[Tuple[str, str]],
+             threshold: float, batch_size: int = 16) -> Dict[str, Any]:
+    """Per-class top-1 agreement report; passes only if every class meets threshold"""
+    per_class = per_class_agreement(fp32_model, quantized_model, images, batch_size)
+    agreement = overall_agreement(per_class)
+    failing = failing_classes(per_class, threshold)
+    return {
+        'agreement': round(agreement, 6),
+        'min_class_agreement': round(min((per_class.get(name, {}).get('agreement', 0.0)
+                                          for name in PLANT_DISEASE_CLASSES), default=0.0), 6),
+        'threshold': threshold,
+        'passed': agreement >= threshold and not failing,
+        'failing_classes': failing,
+        'images': sum(counts['total'] for counts in per_class.values()),
+        'per_class': {
+            name: per_class.get(name, {'total': 0, 'agree': 0, 'agreement': 0.0})
+            for name in PLANT_DISEASE_CLASSES
+        },
+        'created_at': datetime.now().isoformat()
+    }
+
+def build_quantized_model(source: str, mode: str, images_dir: str, output: str,
+                          threshold: float = DEFAULT_MIN_AGREEMENT,
+                          calibration_fraction: float = 0.5) -> Dict[str, Any]:
+    """Quantize, evaluate on held-out images, and save only if the gate passes"""
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+
+    images = collect_images(images_dir)
+    if not images:
+        raise ValueError(f"No images found under {images_dir}")
+
+    fp32_model = torch.load(source, map_location='cpu')
+    fp32_model.eval()
+
+    # Calibrate and evaluate on disjoint images so the gate is not optimistic
+    if mode == 'static':
+        calibration, evaluation_set = split_by_class(images, calibration_fraction)
+        # Only with one image per class: calibrate on the evaluation images
+        calibration = calibration or evaluation_set
+    else:
+        calibration, evaluation_set = [], list(images)
+
+    if mode == 'static':
+        quantized = quantize_static(fp32_model, calibration)
+    else:
+        quantized = quantize_dynamic(fp32_model)
+    quantized.eval()
+
+    report = evaluate(fp32_model, quantized, evaluation_set, threshold)
+    report.update({'mode': mode, 'source': source, 'calibration_images': len(calibration)})
+
+    if not report['passed']:
+        logger.error(f"INT8 agreement {report['agreement']:.4f} (classes below threshold {threshold}: "
+                     f"{', '.join(report['failing_classes']) or 'none'}); not writing {output}")
+        return report
+
+    example = torch.zeros((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+    with torch.no_grad():
+        scripted = torch.jit.trace(quantized, example)
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    scripted.save(output)
+    with open(report_path_for(output), 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"INT8 model written to {output} (agreement {report['agreement']:.4f})")
+    return report
+
+def load_quantized_model(model_path: str, min_agreement: float) -> Optional[Any]:
+    """Load a gated INT8 artifact, or return None if it is missing or failed the gate"""
+    report_path = report_path_for(model_path)
+    if not os.path.exists(model_path) or not os.path.exists(report_path):
+        logger.warning(f"INT8 model or report missing at {model_path}; using fp32")
+        return None
+
+    with open(report_path, 'r') as f:
+        report = json.load(f)
+    failing = failing_classes(report.get('per_class') or {}, min_agreement)
+    if not report.get('passed') or report.get('agreement', 0.0) < min_agreement or failing:
+        logger.warning(f"INT8 model agreement {report.get('agreement')} (classes below {min_agreement}: "
+                       f"{', '.join(failing) or 'none'}); refusing to enable quantization")
+        return None
+
+    _select_engine()
+    model = torch.jit.load(model_path, map_location='cpu')
+    model.eval()
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and evaluate the INT8 AgroAI model')
+    parser.add_argument('--mode', choices=QUANTIZATION_MODES, default='static')
+    parser.add_argument('--images', required=True, help='Sample image directory (PlantVillage layout)')
+    parser.add_argument('--source', default='models/plant_disease_model.pth')
+    parser.add_argument('--output', default=DEFAULT_QUANTIZED_MODEL_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = build_quantized_model(args.source, args.mode, args.images, args.output, args.threshold)
+
+    print(f"\n{'class':<55} {'agree':>7} {'total':>7} {'rate':>8}")
+    for name, counts in report['per_class'].items():
+        print(f"{name:<55} {counts['agree']:>7} {counts['total']:>7} {counts['agreement']:>7.2%}")
+    if report['failing_classes']:
+        print(f"\nBelow threshold or without images: {', '.join(report['failing_classes'])}")
+    print(f"\nOverall agreement {report['agreement']:.2%} "
+          f"(threshold {report['threshold']:.2%}): {'PASS' if report['passed'] else 'FAIL'}")
+    raise SystemExit(0 if report['passed'] else 1)
+
+if __name__ == '__main__':
+    main()
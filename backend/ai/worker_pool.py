@@ -0,0 +1,218 @@
+"""
+AgroAI Inference Worker Pool
+Forked CPU inference workers sharing model weights copy-on-write
+
+The parent loads the model once, then forks workers that inherit the
+weights without copying them. Each worker owns a shared-memory slot:
+the parent resizes images straight into the slot's uint8 staging area
+and sends only the batch size over a pipe. The worker normalizes and
+runs the forward pass under its own torch thread budget, then writes
+softmax probabilities back into shared memory. Images are never pickled.
+
+Intended for the pytorch and torchscript model formats. ONNX Runtime
+sessions are not fork-safe. Build the pool before the process starts any
+other thread: a forked child keeps only the forking thread, and locks
+held by the others stay locked in it. For the same reason a worker that
+dies is dropped rather than re-forked from the by-then threaded parent.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import torch
+
+from .labels import MODEL_INPUT_SIZE
+from .preprocessing import BatchPreprocessor
+
+logger = logging.getLogger(__name__)
+
+class WorkerDied(RuntimeError):
+    """The worker process behind a slot exited or its pipe broke"""
+
+def _worker_main(model, conn, input_name: str, output_name: str, max_batch_size: int,
+                 size: int, num_classes: int, num_threads: int):
+    """Worker process loop: normalize staged images, run forward, write probabilities"""
+    torch.set_num_threads(num_threads)
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        staging = np.ndarray((max_batch_size, size, size, 3), dtype=np.uint8, buffer=input_shm.buf)
+        outputs = np.ndarray((max_batch_size, num_classes), dtype=np.float32, buffer=output_shm.buf)
+        preprocessor = BatchPreprocessor(max_batch_size, size, staging=staging)
+
+        while True:
+            count = conn.recv()
+            if count is None:
+                break
+            try:
+                with torch.no_grad():
+                    logits = model(preprocessor.normalize(count))
+                    probabilities = torch.nn.functional.softmax(logits, dim=1)
+                outputs[:count] = probabilities.cpu().numpy()
+                conn.send(('ok', None))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    finally:
+        input_shm.close()
+        output_shm.close()
+        conn.close()
+
+class _WorkerSlot:
+    """Parent-side handle on one worker process and its shared buffers"""
+
+    def __init__(self, context, model, index: int, max_batch_size: int, size: int,
+                 num_classes: int, num_threads: int):
+        self.index = index
+        self.input_shm = shared_memory.SharedMemory(create=True, size=max_batch_size * size * size * 3)
+        self.output_shm = shared_memory.SharedMemory(create=True, size=max_batch_size * num_classes * 4)
+        staging = np.ndarray((max_batch_size, size, size, 3), dtype=np.uint8, buffer=self.input_shm.buf)
+        self.outputs = np.ndarray((max_batch_size, num_classes), dtype=np.float32, buffer=self.output_shm.buf)
+        self.stager = BatchPreprocessor(max_batch_size, size, staging=staging)
+
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(model, child_conn, self.input_shm.name, self.output_shm.name,
+                  max_batch_size, size, num_classes, num_threads),
+            name=f"ai-worker-{index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.batches = 0
+
+    def run(self, images: List[np.ndarray]) -> np.ndarray:
+        count = self.stager.stage(images)
+        try:
+            self.conn.send(count)
+            status, error = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerDied(f"Inference worker {self.index} (pid {self.process.pid}) is gone: {e}")
+        if status != 'ok':
+            raise RuntimeError(f"Inference worker {self.index} failed: {error}")
+        self.batches += 1
+        return self.outputs[:count].copy()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        for shm in (self.input_shm, self.output_shm):
+            shm.close()
+            shm.unlink()
+
+class InferenceWorkerPool:
+    """Pool of forked inference workers dispatched over shared-memory slots"""
+
+    def __init__(self, model, workers: int, max_batch_size: int, num_classes: int,
+                 threads_per_worker: Optional[int] = None, size: int = MODEL_INPUT_SIZE):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("InferenceWorkerPool requires the fork start method")
+
+        self.workers = max(1, int(workers))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+
+        # Parameters are only read by the workers, so their pages stay shared
+        # after fork. Gradients are never needed.
+        for parameter in getattr(model, 'parameters', lambda: [])():
+            parameter.requires_grad_(False)
+
+        context = multiprocessing.get_context('fork')
+        self._slots = [
+            _WorkerSlot(context, model, index, self.max_batch_size, size,
+                        num_classes, self.threads_per_worker)
+            for index in range(self.workers)
+        ]
+        self._free: "queue.Queue[_WorkerSlot]" = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+        self._alive = len(self._slots)
+        self._busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        logger.info(f"Inference worker pool started: {self.workers} workers x "
+                    f"{self.threads_per_worker} threads")
+
+    def _acquire(self) -> _WorkerSlot:
+        """Next free live worker; dead ones found on the way are dropped"""
+        while True:
+            with self._stats_lock:
+                if not self._alive:
+                    raise WorkerDied("No inference workers left")
+            try:
+                slot = self._free.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if slot.process.is_alive():
+                return slot
+            self._drop(slot, f"exited with code {slot.process.exitcode}")
+
+    def _drop(self, slot: _WorkerSlot, reason: str):
+        with self._stats_lock:
+            self._alive -= 1
+            self._slots = [s for s in self._slots if s is not slot]
+            alive = self._alive
+        logger.error(f"Inference worker {slot.index} {reason}; {alive} worker(s) left")
+        try:
+            slot.close()
+        except Exception as e:
+            logger.warning(f"Failed to clean up inference worker {slot.index}: {e}")
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[torch.Tensor]:
+        """Run a batch on the next free worker; thread-safe"""
+        slot = self._acquire()
+        start = time.perf_counter()
+        try:
+            probabilities = slot.run(images)
+        except WorkerDied as e:
+            # Its pipe is no longer in step with the worker, if there is one
+            self._drop(slot, str(e))
+            raise
+        except Exception:
+            self._free.put(slot)
+            raise
+        finally:
+            with self._stats_lock:
+                self._busy_seconds += time.perf_counter() - start
+        self._free.put(slot)
+        return [torch.from_numpy(row) for row in probabilities]
+
+    def warmup(self, batch_sizes: Iterable[int], size: int = MODEL_INPUT_SIZE) -> Dict[int, float]:
+        """Run each batch size once on every worker; returns the slowest latency per size"""
+        timings: Dict[int, float] = {}
+        for batch_size in sorted(set(min(b, self.max_batch_size) for b in batch_sizes)):
+            dummy = [np.zeros((size, size, 3), dtype=np.uint8)] * batch_size
+            for slot in self._slots:
+                start = time.perf_counter()
+                slot.run(dummy)
+                elapsed = round((time.perf_counter() - start) * 1000.0, 3)
+                timings[batch_size] = max(timings.get(batch_size, 0.0), elapsed)
+        return timings
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            busy = self._busy_seconds
+        return {
+            'workers': self.workers,
+            'threads_per_worker': self.threads_per_worker,
+            'idle_workers': self._free.qsize(),
+            'alive_workers': self._alive,
+            'batches_per_worker': [slot.batches for slot in self._slots],
+            'busy_seconds': round(busy, 3)
+        }
+
+    def close(self):
+        for slot in self._slots:
+            slot.close()
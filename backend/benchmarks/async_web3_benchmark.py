@@ -0,0 +1,105 @@
+"""
+AgroAI Async Web3 Benchmark
+Compares chain-read throughput of sync Web3 (sequential and threaded) with AsyncWeb3
+
+Usage:
+    npx hardhat node        # local dev chain on 127.0.0.1:8545
+    python -m backend.benchmarks.async_web3_benchmark \
+        [--rpc http://127.0.0.1:8545] [--calls 2000] [--threads 16] \
+        [--concurrency 200] [--token 0x...]
+
+Each run issues the same number of reads. By default each read is
+eth_getBalance across the dev chain's accounts. With --token, each read
+is a getUserStats eth_call on a deployed AgroAIToken (ABI from
+config/AgroAIToken-abi.json). Reports calls/second and p50/p95 latency.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import aiohttp
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
+
+from backend.blockchain.web3_service import load_abi
+
+def summarize(name: str, latencies: List[float], elapsed: float):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000.0
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000.0
+    print(f"{name:<24} {len(latencies) / elapsed:>10.1f} {p50:>10.2f} {p95:>10.2f}")
+
+def timed(fn: Callable, latencies: List[float]):
+    start = time.perf_counter()
+    fn()
+    latencies.append(time.perf_counter() - start)
+
+def run_sync(w3: Web3, reads: List[Callable], threads: int):
+    latencies: List[float] = []
+    start = time.perf_counter()
+    if threads <= 1:
+        for read in reads:
+            timed(read, latencies)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda read: timed(read, latencies), reads))
+    return latencies, time.perf_counter() - start
+
+async def run_async(rpc: str, addresses: List[str], token: str, calls: int, concurrency: int):
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        provider = AsyncHTTPProvider(rpc)
+        await provider.cache_async_session(session)
+        w3 = AsyncWeb3(provider)
+        contract = w3.eth.contract(address=token, abi=load_abi('AgroAIToken')) if token else None
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+
+        async def read(index: int):
+            address = addresses[index % len(addresses)]
+            async with semaphore:
+                start = time.perf_counter()
+                if contract is not None:
+                    await contract.functions.getUserStats(address).call()
+                else:
+                    await w3.eth.get_balance(address)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(read(i) for i in range(calls)))
+        return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rpc', default='http://127.0.0.1:8545')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--token', default='', help='Deployed AgroAIToken address (optional)')
+    args = parser.parse_args()
+
+    w3 = Web3(Web3.HTTPProvider(args.rpc, request_kwargs={'timeout': 30}))
+    if not w3.is_connected():
+        raise SystemExit(f"No node at {args.rpc}; start one with `npx hardhat node`")
+    addresses = w3.eth.accounts or [w3.eth.get_block('latest')['miner']]
+    contract = w3.eth.contract(address=args.token, abi=load_abi('AgroAIToken')) if args.token else None
+
+    def make_read(index: int) -> Callable:
+        address = addresses[index % len(addresses)]
+        if contract is not None:
+            return lambda: contract.functions.getUserStats(address).call()
+        return lambda: w3.eth.get_balance(address)
+
+    reads = [make_read(i) for i in range(args.calls)]
+    print(f"{args.calls} {'getUserStats' if contract else 'eth_getBalance'} reads against {args.rpc}\n")
+    print(f"{'mode':<24} {'calls/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+
+    summarize('sync sequential', *run_sync(w3, reads, 1))
+    summarize(f'sync {args.threads} threads', *run_sync(w3, reads, args.threads))
+    summarize(f'async {args.concurrency} in flight',
+              *asyncio.run(run_async(args.rpc, addresses, args.token, args.calls, args.concurrency)))
+
+if __name__ == '__main__':
+    main()
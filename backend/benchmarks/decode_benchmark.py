@@ -0,0 +1,108 @@
+"""
+AgroAI Decode Benchmark
+Compares full-resolution decode against the reduced-resolution JPEG fast path
+
+Usage:
+    python -m backend.benchmarks.decode_benchmark --images path/to/plantvillage \
+        [--model models/plant_disease_model.pth] [--repeat 3]
+
+The image directory may be flat or use one sub-directory per class named
+after AIService.classes (PlantVillage layout). With --model, the script
+also reports per-class top-1 agreement between the two decode paths.
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from backend.ai.decode import decode_image
+from backend.ai.evaluation import collect_images
+from backend.ai.labels import MODEL_INPUT_SIZE, PLANT_DISEASE_CLASSES
+
+TRANSFORM = transforms.Compose([
+    transforms.Resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+def full_decode(path: str) -> torch.Tensor:
+    """Current AIService path: full decode then Resize"""
+    return TRANSFORM(Image.open(path).convert('RGB'))
+
+def fast_decode(path: str) -> torch.Tensor:
+    """DCT-domain downscale then Resize"""
+    return TRANSFORM(decode_image(path))
+
+def time_path(fn, images: List[Tuple[str, str]], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        for path, _ in images:
+            start = time.perf_counter()
+            fn(path)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+def summarize(name: str, timings: List[float]) -> str:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    return (f"{name:<12} mean {statistics.mean(ordered):8.2f} ms   "
+            f"p50 {statistics.median(ordered):8.2f} ms   p99 {p99:8.2f} ms")
+
+def parity_check(model, images: List[Tuple[str, str]]) -> Dict[str, Dict[str, int]]:
+    """Per-class count of images where both decode paths agree on top-1"""
+    per_class: Dict[str, Dict[str, int]] = {}
+    with torch.no_grad():
+        for path, label in images:
+            batch = torch.stack([full_decode(path), fast_decode(path)])
+            predicted = model(batch).argmax(dim=1).tolist()
+            key = label if label in PLANT_DISEASE_CLASSES else PLANT_DISEASE_CLASSES[predicted[0]]
+            counts = per_class.setdefault(key, {'total': 0, 'agree': 0})
+            counts['total'] += 1
+            counts['agree'] += int(predicted[0] == predicted[1])
+    return per_class
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--images', required=True, help='Directory of sample images')
+    parser.add_argument('--model', default='models/plant_disease_model.pth')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    images = collect_images(args.images)
+    if not images:
+        raise SystemExit(f"No images found under {args.images}")
+
+    print(f"Decoding {len(images)} image(s) x {args.repeat}")
+    full = time_path(full_decode, images, args.repeat)
+    fast = time_path(fast_decode, images, args.repeat)
+    print(summarize('full', full))
+    print(summarize('draft', fast))
+    print(f"speedup      {statistics.mean(full) / statistics.mean(fast):.2f}x")
+
+    if not os.path.exists(args.model):
+        print(f"Model {args.model} not found, skipping accuracy parity")
+        return
+
+    model = torch.load(args.model, map_location='cpu')
+    model.eval()
+    per_class = parity_check(model, images)
+
+    print(f"\n{'class':<55} {'agree':>7} {'total':>7}")
+    agree = total = 0
+    for name in PLANT_DISEASE_CLASSES:
+        counts = per_class.get(name)
+        if not counts:
+            continue
+        agree += counts['agree']
+        total += counts['total']
+        print(f"{name:<55} {counts['agree']:>7} {counts['total']:>7}")
+    print(f"\nTop-1 agreement: {agree}/{total} ({100.0 * agree / total:.2f}%)")
+
+if __name__ == '__main__':
+    main()
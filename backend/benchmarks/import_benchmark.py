@@ -0,0 +1,94 @@
+"""
+AgroAI Import Benchmark
+Profiles cold-start import time of the Flask backend with -X importtime and checks it against a budget
+
+Usage:
+    python -m backend.benchmarks.import_benchmark [--budget-ms 1500] [--repeat 5] [--top 15]
+
+Each run imports enhanced_backend_complete in a fresh interpreter with
+SERVICE_BOOTSTRAP_MODE=lazy, so only the import itself is measured and
+no service starts. The report shows the median wall time, the slowest
+direct imports from the last -X importtime profile, and any heavy
+dependency that was imported eagerly. The exit status is 1 when the
+median exceeds the budget (IMPORT_TIME_BUDGET_MS) or a heavy dependency
+is loaded at import, so CI can run this as a regression check.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Must stay behind backend.lazy until first use
+HEAVY_MODULES = ('torch', 'torchvision', 'cv2', 'numpy', 'PIL', 'web3', 'eth_abi',
+                 'ipfshttpclient', 'redis', 'requests')
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import enhanced_backend_complete
+elapsed = (time.perf_counter() - start) * 1000.0
+print(json.dumps({'wall_ms': elapsed, 'heavy': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def run_once() -> Tuple[Dict, str]:
+    env = dict(os.environ, SERVICE_BOOTSTRAP_MODE='lazy')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def direct_imports(profile: str, module: str = 'enhanced_backend_complete') -> List[Tuple[str, int]]:
+    """(name, cumulative microseconds) for each import made directly by module"""
+    children: List[Tuple[str, int]] = []
+    for line in profile.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        # Nesting is two spaces per level after the column separator, and
+        # -X importtime prints a module's imports before the module itself
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(fields[1])))
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500')))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    wall = statistics.median(run['wall_ms'] for run, _ in runs)
+    last, profile = runs[-1]
+
+    print(f"{'module':<40} {'cumulative ms':>14}")
+    for name, micros in sorted(direct_imports(profile), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40} {micros / 1000.0:>14.1f}")
+
+    print(f"\nimport enhanced_backend_complete: median {wall:.1f} ms over {args.repeat} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if last['heavy']:
+        print(f"FAIL: imported eagerly: {', '.join(last['heavy'])}")
+        failed = True
+    if wall > args.budget_ms:
+        print(f"FAIL: over budget by {wall - args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print('OK')
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
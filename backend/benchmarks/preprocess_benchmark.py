@@ -0,0 +1,70 @@
+"""
+AgroAI Preprocessing Benchmark
+Compares the torchvision transform chain against BatchPreprocessor
+
+Usage:
+    python -m backend.benchmarks.preprocess_benchmark --images path/to/images \
+        [--batch-size 16] [--repeat 5]
+
+Reports per-batch latency for both paths and the numerical gap between
+them against PARITY_TOLERANCE. Exits non-zero if the gap exceeds it.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from backend.ai.decode import decode_image
+from backend.ai.evaluation import collect_images
+from backend.ai.labels import MODEL_INPUT_SIZE
+from backend.ai.preprocessing import IMAGENET_MEAN, IMAGENET_STD, BatchPreprocessor, parity_report
+
+TRANSFORM = transforms.Compose([
+    transforms.Resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD))
+])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--images', required=True, help='Directory of sample images')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = [path for path, _ in collect_images(args.images)][:args.batch_size]
+    if not paths:
+        raise SystemExit(f"No images found under {args.images}")
+
+    arrays = [np.asarray(decode_image(path)) for path in paths]
+    pil_images = [Image.fromarray(array) for array in arrays]
+    preprocessor = BatchPreprocessor(len(arrays))
+
+    torchvision_ms, batched_ms = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        torch.stack([TRANSFORM(image) for image in pil_images])
+        torchvision_ms.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        preprocessor.prepare(arrays)
+        batched_ms.append((time.perf_counter() - start) * 1000.0)
+
+    print(f"Batch of {len(arrays)} x {args.repeat}")
+    print(f"torchvision  mean {statistics.mean(torchvision_ms):8.2f} ms")
+    print(f"batched      mean {statistics.mean(batched_ms):8.2f} ms")
+
+    report = parity_report(preprocessor, arrays, TRANSFORM)
+    print(f"max |diff| {report['max_abs_diff']:.4f}   mean |diff| {report['mean_abs_diff']:.4f}   "
+          f"tolerance {report['tolerance']}")
+    if not report['within_tolerance']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
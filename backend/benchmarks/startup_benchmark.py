@@ -0,0 +1,74 @@
+"""
+AgroAI Startup Benchmark
+Measures time-to-serve and time-to-ready of the Flask backend for each bootstrap mode
+
+Usage:
+    python -m backend.benchmarks.startup_benchmark [--repeat 3] \
+        [--modes sequential,parallel,background]
+
+Each run imports enhanced_backend_complete in a fresh interpreter with
+SERVICE_BOOTSTRAP_MODE set. It reports:
+
+- import: time until the module is imported, i.e. when the port could bind;
+- health: latency of the first /api/health request;
+- ready: time until every service has finished starting.
+
+sequential is the old behaviour of constructing each service in turn at
+import. The environment (.env, RPC, IPFS, model path) is used as-is, so
+run it with the same configuration as production to see real
+network and disk costs.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from backend.bootstrap import MODE_BACKGROUND, MODE_PARALLEL, MODE_SEQUENTIAL
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import enhanced_backend_complete as backend
+imported = time.perf_counter()
+backend.app.test_client().get('/api/health')
+health = time.perf_counter()
+backend.services.wait()
+ready = time.perf_counter()
+print(json.dumps({
+    'import': (imported - start) * 1000.0,
+    'health': (health - imported) * 1000.0,
+    'ready': (ready - start) * 1000.0,
+    'services': {name: s['elapsed_ms'] for name, s in backend.services.get_status()['services'].items()}
+}))
+"""
+
+def run_once(mode: str) -> Dict:
+    env = dict(os.environ, SERVICE_BOOTSTRAP_MODE=mode)
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True,
+                            text=True, check=True).stdout
+    # Services may log to stdout; the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--modes', default=','.join([MODE_SEQUENTIAL, MODE_PARALLEL, MODE_BACKGROUND]))
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'import ms':>10} {'health ms':>10} {'ready ms':>10}")
+    for mode in args.modes.split(','):
+        runs: List[Dict] = [run_once(mode) for _ in range(args.repeat)]
+        medians = {key: statistics.median(run[key] for run in runs) for key in ('import', 'health', 'ready')}
+        print(f"{mode:<12} {medians['import']:>10.1f} {medians['health']:>10.1f} {medians['ready']:>10.1f}")
+
+    # Per-service construction cost from the last run
+    print('\nper-service start (ms): ' + ', '.join(
+        f"{name} {elapsed:.1f}" for name, elapsed in runs[-1]['services'].items() if elapsed is not None
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+AgroAI Worker Pool Benchmark
+Measures inference throughput as InferenceWorkerPool scales across cores
+
+Usage:
+    python -m backend.benchmarks.worker_pool_benchmark \
+        [--model models/plant_disease_model.pth] [--max-workers 8] \
+        [--batch-size 8] [--batches 64] [--threads-per-worker 1]
+
+Without a model file, an untrained torchvision resnet18 with 25 outputs is
+used; throughput does not depend on the weights. Each run keeps every
+worker busy with two client threads and reports images/second plus
+scaling efficiency relative to a single worker.
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import torch
+
+from backend.ai.labels import MODEL_INPUT_SIZE, PLANT_DISEASE_CLASSES
+from backend.ai.worker_pool import InferenceWorkerPool
+
+def load_benchmark_model(path: str):
+    if os.path.exists(path):
+        model = torch.load(path, map_location='cpu')
+    else:
+        import torchvision
+        print(f"{path} not found, using untrained resnet18")
+        model = torchvision.models.resnet18(num_classes=len(PLANT_DISEASE_CLASSES))
+    model.eval()
+    return model
+
+def run(pool: InferenceWorkerPool, batch_size: int, batches: int) -> float:
+    """Push `batches` batches through the pool and return images/second"""
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.uint8)
+              for _ in range(batch_size)]
+    remaining = [batches]
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            pool.predict_batch(images)
+
+    clients = [threading.Thread(target=client) for _ in range(pool.workers * 2)]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return batches * batch_size / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--model', default='models/plant_disease_model.pth')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=64)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    args = parser.parse_args()
+
+    model = load_benchmark_model(args.model)
+    worker_counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n <= args.max_workers], args.max_workers})
+
+    baseline = None
+    print(f"{'workers':>8} {'threads':>8} {'img/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for workers in worker_counts:
+        threads = args.threads_per_worker
+        pool = InferenceWorkerPool(model, workers, args.batch_size, len(PLANT_DISEASE_CLASSES), threads)
+        try:
+            pool.warmup([args.batch_size])
+            throughput = run(pool, args.batch_size, args.batches)
+        finally:
+            pool.close()
+
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{workers:>8} {threads:>8} {throughput:>10.1f} {speedup:>7.2f}x {speedup / workers:>9.0%}")
+
+if __name__ == '__main__':
+    main()
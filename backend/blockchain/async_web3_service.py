@@ -0,0 +1,437 @@
+"""
+AgroAI Async Web3 Service
+asyncio counterpart of Web3Service on AsyncWeb3 with a shared aiohttp session
+
+Mirrors the Web3Service read and write surface with coroutines, so one
+event loop can keep hundreds of RPC calls in flight over a single pooled
+aiohttp session instead of parking a thread per round trip:
+
+    async with AsyncWeb3Service() as service:
+        stats = await asyncio.gather(*(service.get_user_stats(a) for a in addresses))
+
+IPFS uploads stay on the synchronous service; ipfshttpclient has no async API.
+Nonces come from the same shared NonceManager as Web3Service, so both
+services can sign with one key in one process without reusing a nonce.
+Fees come from a FeeEngine, as on Web3Service: capped by max_fee_cap
+and refreshed in its thread, which also re-sends stuck transactions.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import aiohttp
+from eth_account import Account
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from web3.logs import DISCARD
+from web3.middleware import async_geth_poa_middleware
+
+from .fee_engine import GAS_HEADROOM, FeeEngine, argument_shape, gas_limit
+from .nonce_manager import is_nonce_error, shared_nonce_manager
+from .receipt_tracker import STATUS_CONFIRMED, STATUS_FAILED, STATUS_PENDING
+from .reward_accumulator import REWARD_AMOUNTS, REWARD_DISEASE, REWARD_EARLY_DETECTION, REWARD_PHOTO
+from .rpc_pool import AsyncPooledHTTPProvider, PooledHTTPProvider, RPCPool
+from .web3_service import load_abi, load_config, rpc_urls
+
+logger = logging.getLogger(__name__)
+
+# (attribute, config['contracts'] key, ABI name)
+CONTRACTS = (('token', 'agroToken', 'AgroAIToken'), ('core', 'agroCore', 'AgroAICore'))
+
+class AsyncWeb3Service:
+    """Coroutine-based Web3 service for asyncio request paths"""
+
+    def __init__(self, config_path: str = None, max_connections: int = 100,
+                 request_timeout: float = 30.0, wait_for_receipts: bool = False,
+                 fee_ttl: float = 12.0, gas_cache_ttl: float = 300.0, gas_buffer: float = 1.2,
+                 gas_headroom: int = GAS_HEADROOM, rpc_pool: Optional[RPCPool] = None,
+                 max_fee_cap: Optional[int] = None, stuck_after: float = 90.0):
+        """
+        Pass the sync service's `w3.provider.pool` as rpc_pool to share
+        endpoint scores between both services. fee_ttl is the fee engine's
+        refresh interval; max_fee_cap (wei) defaults to MAX_FEE_PER_GAS.
+        """
+        self.config = load_config(config_path)
+        self.rpc_pool = rpc_pool or RPCPool(rpc_urls(self.config), **self.config['web3'].get('rpcPool', {}))
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.wait_for_receipts = wait_for_receipts
+        self.fee_ttl = fee_ttl
+        self.gas_cache_ttl = gas_cache_ttl
+        self.gas_buffer = gas_buffer
+        self.gas_headroom = gas_headroom
+        self.stuck_after = stuck_after
+        if max_fee_cap is None and os.getenv('MAX_FEE_PER_GAS'):
+            max_fee_cap = int(os.getenv('MAX_FEE_PER_GAS'))
+        self.max_fee_cap = max_fee_cap
+
+        private_key = self.config['web3']['privateKey']
+        self.account = Account.from_key(private_key) if private_key else None
+
+        self.w3: Optional[AsyncWeb3] = None
+        self.contracts: Dict[str, Any] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._chain_id: Optional[int] = None
+        self.nonce_manager = None
+        self.fee_engine: Optional[FeeEngine] = None
+        # Sync twins of the contracts, for the fee engine to re-sign stuck calls
+        self._sync_contracts: Dict[str, Any] = {}
+        # Replaced hash -> replacement, so receipt waits follow fee bumps
+        self._replacements: Dict[str, str] = {}
+        self._gas_cache: Dict[Hashable, Tuple[float, int]] = {}
+
+    async def connect(self) -> 'AsyncWeb3Service':
+        """Open the shared aiohttp session and load contracts"""
+        if self.w3 is not None:
+            return self
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+        provider = AsyncPooledHTTPProvider(rpc_urls(self.config), pool=self.rpc_pool)
+        await provider.cache_async_session(self._session)
+
+        w3 = AsyncWeb3(provider)
+        w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+        if not await w3.is_connected():
+            await self._session.close()
+            raise ConnectionError("Failed to connect to Ethereum network")
+
+        self._chain_id = await w3.eth.chain_id
+        self.contracts = {
+            name: w3.eth.contract(address=self.config['contracts'][key], abi=load_abi(abi))
+            for name, key, abi in CONTRACTS
+        }
+        if self.account:
+            # A nonce resync and the fee engine's polls run off the event
+            # loop, over a sync provider on the same pool
+            sync_w3 = Web3(PooledHTTPProvider(rpc_urls(self.config), pool=self.rpc_pool, hedge_workers=2))
+            self.nonce_manager = shared_nonce_manager(sync_w3, self.account.address)
+            self.fee_engine = FeeEngine(
+                sync_w3,
+                self.account,
+                refresh_interval=self.fee_ttl,
+                gas_cache_ttl=self.gas_cache_ttl,
+                gas_buffer=self.gas_buffer,
+                gas_headroom=self.gas_headroom,
+                stuck_after=self.stuck_after,
+                max_fee_cap=self.max_fee_cap,
+                fallback_gas_price=int(self.config['web3']['gasPrice']),
+                on_replaced=self._on_replaced
+            )
+            self._sync_contracts = {
+                contract.address: sync_w3.eth.contract(address=contract.address, abi=contract.abi)
+                for contract in self.contracts.values()
+            }
+        self.w3 = w3
+        if self.fee_engine:
+            self.fee_engine.start()
+        logger.info(f"Async Web3 connected. Chain ID: {self._chain_id}")
+        return self
+
+    async def close(self):
+        if self.fee_engine is not None:
+            self.fee_engine.stop()
+            self.fee_engine.w3.provider.close()
+            self.fee_engine = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.w3 = None
+
+    async def __aenter__(self) -> 'AsyncWeb3Service':
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _fee_fields(self) -> Dict[str, int]:
+        """Capped fees from the fee engine; only its first refresh waits on an RPC"""
+        return await asyncio.to_thread(self.fee_engine.fees)
+
+    def _on_replaced(self, old_hash, new_hash):
+        """Fee engine hook (its thread): a stuck transaction was re-sent"""
+        self._replacements[Web3.to_hex(old_hash)] = Web3.to_hex(new_hash)
+
+    def _sync_function(self, function):
+        """The same contract call on the sync provider, for the fee engine to re-sign"""
+        contract = self._sync_contracts[function.address]
+        return getattr(contract.functions, function.fn_name)(*function.args, **(function.kwargs or {}))
+
+    async def _wait_for_receipt(self, tx_hash, timeout: float = 120.0, poll_interval: float = 2.0):
+        """Receipt of tx_hash or of whichever fee-bumped replacement was mined"""
+        deadline = time.monotonic() + timeout
+        while True:
+            hashes = [Web3.to_hex(tx_hash)]
+            while hashes[-1] in self._replacements:
+                hashes.append(self._replacements[hashes[-1]])
+            for candidate in reversed(hashes):
+                try:
+                    receipt = await self.w3.eth.get_transaction_receipt(candidate)
+                except TransactionNotFound:
+                    continue
+                if receipt:
+                    return receipt
+            if time.monotonic() >= deadline:
+                raise TimeExhausted(f"Transaction {hashes[0]} not mined after {timeout}s")
+            await asyncio.sleep(poll_interval)
+
+    async def _estimate_gas(self, function) -> int:
+        key = (function.address, function.fn_name, tuple(argument_shape(arg) for arg in function.args))
+        now = time.monotonic()
+        cached = self._gas_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        estimate = await function.estimate_gas({'from': self.account.address})
+        gas = gas_limit(estimate, self.gas_buffer, self.gas_headroom)
+        self._gas_cache[key] = (now + self.gas_cache_ttl, gas)
+        return gas
+
+    async def _send_transaction(self, function, max_attempts: int = 3) -> Dict[str, Any]:
+        """Price, sign with a locally allocated nonce and broadcast"""
+        gas, fees = await asyncio.gather(self._estimate_gas(function), self._fee_fields())
+
+        for attempt in range(1, max_attempts + 1):
+            # allocate() blocks on an RPC only when it has to resync
+            nonce = await asyncio.to_thread(self.nonce_manager.allocate)
+            try:
+                transaction = await function.build_transaction({
+                    'from': self.account.address,
+                    'chainId': self._chain_id,
+                    'gas': gas,
+                    'nonce': nonce,
+                    **fees
+                })
+                signed = self.account.sign_transaction(transaction)
+                tx_hash = await self.w3.eth.send_raw_transaction(signed.rawTransaction)
+                break
+            except asyncio.CancelledError:
+                # It may or may not have been broadcast; the pending count knows
+                self.nonce_manager.resync()
+                raise
+            except Exception as e:
+                if is_nonce_error(e):
+                    self.nonce_manager.resync()
+                    if attempt < max_attempts:
+                        logger.warning(f"Nonce {nonce} rejected ({e}); resyncing (attempt {attempt})")
+                        continue
+                else:
+                    self.nonce_manager.release(nonce)
+                raise
+        self.fee_engine.watch(nonce, tx_hash, self.nonce_manager, self._sync_function(function), gas, fees)
+
+        if not self.wait_for_receipts:
+            return {
+                'transaction_hash': tx_hash.hex(),
+                'status': STATUS_PENDING,
+                'gas_used': None
+            }
+
+        receipt = await self._wait_for_receipt(tx_hash)
+        return {
+            'transaction_hash': receipt['transactionHash'].hex(),
+            'status': STATUS_CONFIRMED if receipt['status'] == 1 else STATUS_FAILED,
+            'gas_used': receipt['gasUsed'],
+            'block_number': receipt['blockNumber']
+        }
+
+    async def reward_photo_upload(self, user_address: str) -> Dict[str, Any]:
+        """Reward user for photo upload"""
+        try:
+            function = self.contracts['token'].functions.rewardPhotoUpload(user_address)
+            tx_result = await self._send_transaction(function)
+
+            logger.info(f"Photo reward sent to {user_address}. Tx: {tx_result['transaction_hash']}")
+
+            return {
+                'success': True,
+                **tx_result,
+                'reward_amount': REWARD_AMOUNTS[REWARD_PHOTO]
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to reward photo upload: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def reward_disease_detection(self, user_address: str, is_early_detection: bool,
+                                       disease: str) -> Dict[str, Any]:
+        """Reward user for disease detection"""
+        try:
+            function = self.contracts['token'].functions.rewardDiseaseDetection(
+                user_address,
+                is_early_detection,
+                disease
+            )
+            tx_result = await self._send_transaction(function)
+
+            reward_amount = REWARD_AMOUNTS[REWARD_EARLY_DETECTION if is_early_detection else REWARD_DISEASE]
+            logger.info(f"Disease detection reward ({reward_amount} AGRO) sent to {user_address}")
+
+            return {
+                'success': True,
+                **tx_result,
+                'reward_amount': reward_amount,
+                'disease': disease,
+                'early_detection': is_early_detection
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to reward disease detection: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def process_purchase(self, user_address: str, purchase_amount: float) -> Dict[str, Any]:
+        """Process purchase with token discounts and cashback"""
+        try:
+            amount_wei = self.w3.to_wei(purchase_amount, 'ether')
+
+            function = self.contracts['token'].functions.processPurchase(user_address, amount_wei)
+            tx_result = await self._send_transaction(function)
+
+            # The applied amounts come from the mined PurchaseProcessed event
+            amounts = {'discount_applied': None, 'cashback_earned': None}
+            if tx_result['status'] == STATUS_CONFIRMED:
+                amounts.update(await self._purchase_amounts(tx_result['transaction_hash']))
+
+            logger.info(f"Purchase processed for {user_address}. Amount: {purchase_amount}")
+
+            return {
+                'success': True,
+                **tx_result,
+                'purchase_amount': purchase_amount,
+                **amounts
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to process purchase: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def _purchase_amounts(self, tx_hash: str) -> Dict[str, float]:
+        """Discount and cashback from a mined purchase's PurchaseProcessed event"""
+        receipt = await self.w3.eth.get_transaction_receipt(tx_hash)
+        events = self.contracts['token'].events.PurchaseProcessed().process_receipt(receipt, errors=DISCARD)
+        if not events:
+            logger.warning(f"No PurchaseProcessed event in {tx_hash}")
+            return {}
+        args = events[0]['args']
+        return {
+            'discount_applied': float(self.w3.from_wei(args['discount'], 'ether')),
+            'cashback_earned': float(self.w3.from_wei(args['cashback'], 'ether'))
+        }
+
+    async def get_user_stats(self, user_address: str) -> Dict[str, Any]:
+        """Get user statistics from blockchain"""
+        try:
+            stats = await self.contracts['token'].functions.getUserStats(user_address).call()
+
+            return {
+                'token_balance': self.w3.from_wei(stats[0], 'ether'),
+                'photo_count': stats[1],
+                'disease_detections': stats[2],
+                'total_purchases': self.w3.from_wei(stats[3], 'ether'),
+                'total_savings': self.w3.from_wei(stats[4], 'ether'),
+                'user_tier': stats[5],
+                'last_activity': stats[6]
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get user stats: {e}")
+            return {
+                'error': str(e)
+            }
+
+    async def calculate_purchase_discount(self, user_address: str, purchase_amount: float) -> Dict[str, Any]:
+        """Calculate potential discount for purchase"""
+        try:
+            amount_wei = self.w3.to_wei(purchase_amount, 'ether')
+            result = await self.contracts['token'].functions.calculateDiscount(user_address, amount_wei).call()
+
+            return {
+                'discount_amount': self.w3.from_wei(result[0], 'ether'),
+                'cashback_amount': self.w3.from_wei(result[1], 'ether'),
+                'can_afford_discount': result[2],
+                'tier_multiplier': result[3]
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to calculate discount: {e}")
+            return {
+                'error': str(e)
+            }
+
+    async def request_chainlink_verification(self, backend_url: str, ipfs_hash: str, crop_type: str,
+                                             location: str, latitude: str, longitude: str) -> Dict[str, Any]:
+        """Request Chainlink Functions verification"""
+        try:
+            function = self.contracts['core'].functions.requestPhotoAnalysis(
+                backend_url, ipfs_hash, crop_type, location, latitude, longitude
+            )
+            tx_result = await self._send_transaction(function)
+
+            return {
+                'success': True,
+                **tx_result
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to request Chainlink verification: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def get_account_balance(self) -> float:
+        """Get ETH balance of the service account"""
+        try:
+            balance_wei = await self.w3.eth.get_balance(self.account.address)
+            return self.w3.from_wei(balance_wei, 'ether')
+        except Exception as e:
+            logger.error(f"Failed to get account balance: {e}")
+            return 0.0
+
+    async def is_connected(self) -> bool:
+        """Check if Web3 is connected"""
+        return self.w3 is not None and await self.w3.is_connected()
+
+    async def get_network_info(self) -> Dict[str, Any]:
+        """Get network information (the three lookups run concurrently)"""
+        try:
+            chain_id, block_number, gas_price = await asyncio.gather(
+                self.w3.eth.chain_id, self.w3.eth.block_number, self.w3.eth.gas_price
+            )
+            return {
+                'chain_id': chain_id,
+                'block_number': block_number,
+                'gas_price': gas_price,
+                'connected': True,
+                'rpc_endpoints': self.rpc_pool.get_stats()
+            }
+        except Exception as e:
+            logger.error(f"Failed to get network info: {e}")
+            return {'error': str(e)}
+
+# Singleton instance, bound to the event loop that first connects it
+_async_web3_service = None
+# connect() awaits, so two coroutines could both see None without it
+_async_web3_service_lock = asyncio.Lock()
+
+async def get_async_web3_service(config_path: str = None) -> AsyncWeb3Service:
+    """Get the connected singleton async Web3 service"""
+    global _async_web3_service
+    async with _async_web3_service_lock:
+        if _async_web3_service is None:
+            _async_web3_service = await AsyncWeb3Service(config_path).connect()
+    return _async_web3_service
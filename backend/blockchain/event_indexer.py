@@ -0,0 +1,338 @@
+"""
+AgroAI Event Indexer
+Incrementally indexes contract logs into SQLite for history and stats queries
+
+Every event declared in the contract ABI is fetched with one eth_getLogs
+call per block chunk (topic0 OR-filter). The decoded rows and the new
+checkpoint are committed in the same SQLite transaction, so a restart
+resumes exactly where the last chunk ended and re-indexing a chunk is a
+no-op. Only blocks at least `confirmations` deep are indexed, which keeps
+shallow reorgs out of the store. Indexing starts at start_block, the
+contract's deployment block; nothing before it can hold its events.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from eth_utils import event_abi_to_log_topic
+
+logger = logging.getLogger(__name__)
+
+# Argument names holding the account an event belongs to
+USER_ARGS = ('user', 'farmer')
+# Argument identifying the crop, purchase, alert or claim an event refers to
+REF_ARGS = ('cropId', 'purchaseId', 'alertId', 'claimId')
+AMOUNT_ARGS = ('amount',)
+
+# Provider messages for a getLogs block range or result count over its cap
+RANGE_ERRORS = ('block range', 'blocks range', 'range is too', 'range too', 'maximum range',
+                'more than', 'too many results', 'too many logs', 'response size')
+# Rate limiting is retried at the next poll, never with a smaller range
+RATE_LIMIT_ERRORS = ('429', 'rate limit', 'too many requests')
+# Successful chunks in a row before the chunk size is doubled again
+GROW_AFTER = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    event TEXT NOT NULL,
+    user TEXT,
+    ref_id INTEGER,
+    amount TEXT,
+    amount_eth REAL,
+    timestamp INTEGER,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_user ON events (user, block_number);
+CREATE INDEX IF NOT EXISTS events_name ON events (event, block_number);
+CREATE INDEX IF NOT EXISTS events_ref ON events (event, ref_id);
+CREATE INDEX IF NOT EXISTS events_tx ON events (tx_hash);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    contract TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    return str(value)
+
+def _is_range_error(error: Exception) -> bool:
+    message = str(error).lower()
+    if any(marker in message for marker in RATE_LIMIT_ERRORS):
+        return False
+    return any(marker in message for marker in RANGE_ERRORS)
+
+class EventIndexer:
+    """Chunked eth_getLogs sync of one contract's events into SQLite (WAL)"""
+
+    def __init__(self, w3, contract, start_block: int, db_path: str = 'data/events.db',
+                 chunk_size: int = 2000, confirmations: int = 2, poll_interval: float = 12.0):
+        self.w3 = w3
+        self.contract = contract
+        self.address = contract.address
+        self.db_path = db_path
+        self.start_block = max(0, int(start_block))
+        self.max_chunk_size = max(1, int(chunk_size))
+        self.chunk_size = self.max_chunk_size
+        self.confirmations = max(0, int(confirmations))
+        self.poll_interval = poll_interval
+
+        # topic0 -> event ABI entry for every event the contract declares
+        self._events = {
+            '0x' + bytes(event_abi_to_log_topic(entry)).hex(): entry
+            for entry in contract.abi if entry.get('type') == 'event'
+        }
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._running = False
+        self._head: Optional[int] = None
+        self._last_sync_ms: Optional[float] = None
+        self._successes = 0
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def start(self) -> 'EventIndexer':
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='event-indexer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.warning(f"Event indexer sync failed: {e}")
+            self._wakeup.wait(self.poll_interval)
+
+    def checkpoint(self) -> int:
+        """Last fully indexed block"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT block_number FROM checkpoints WHERE contract = ?", (self.address,)
+            ).fetchone()
+        return row[0] if row else self.start_block - 1
+
+    def sync(self) -> int:
+        """Index every confirmed block past the checkpoint; returns events added"""
+        start = time.perf_counter()
+        self._head = self.w3.eth.block_number
+        target = self._head - self.confirmations
+        from_block = self.checkpoint() + 1
+        added = 0
+
+        while from_block <= target:
+            to_block = min(from_block + self.chunk_size - 1, target)
+            try:
+                logs = self.w3.eth.get_logs({
+                    'address': self.address,
+                    'fromBlock': from_block,
+                    'toBlock': to_block,
+                    'topics': [list(self._events)]
+                })
+            except Exception as e:
+                # Timeouts and dropped connections fail the sync; only a
+                # range or result cap is answered with a smaller range
+                if self.chunk_size == 1 or not _is_range_error(e):
+                    raise
+                self.chunk_size = max(1, self.chunk_size // 2)
+                self._successes = 0
+                logger.info(f"eth_getLogs {from_block}-{to_block} rejected ({e}); "
+                            f"chunk size now {self.chunk_size}")
+                continue
+
+            added += self._store(self._decode(logs), to_block)
+            from_block = to_block + 1
+            self._grow()
+
+        self._last_sync_ms = round((time.perf_counter() - start) * 1000.0, 3)
+        if added:
+            logger.info(f"Indexed {added} events up to block {target}")
+        return added
+
+    def _grow(self):
+        """Double the chunk size after GROW_AFTER accepted chunks, up to the configured size"""
+        self._successes += 1
+        if self._successes >= GROW_AFTER and self.chunk_size < self.max_chunk_size:
+            # Dense blocks that forced the shrink may be behind us
+            self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+            self._successes = 0
+
+    def _decode(self, logs: List[Any]) -> List[tuple]:
+        rows = []
+        timestamps: Dict[int, int] = {}
+        for log in logs:
+            topic0 = log['topics'][0]
+            topic0 = topic0 if isinstance(topic0, str) else '0x' + bytes(topic0).hex()
+            entry = self._events.get(topic0.lower())
+            if entry is None:
+                continue
+            try:
+                event = getattr(self.contract.events, entry['name'])().process_log(log)
+            except Exception as e:
+                logger.warning(f"Could not decode {entry['name']} log: {e}")
+                continue
+
+            args = dict(event['args'])
+            block_number = event['blockNumber']
+            if block_number not in timestamps:
+                timestamps[block_number] = self.w3.eth.get_block(block_number)['timestamp']
+
+            user = next((args[name] for name in USER_ARGS if name in args), None)
+            ref_id = next((args[name] for name in REF_ARGS if name in args), None)
+            amount = next((args[name] for name in AMOUNT_ARGS if name in args), None)
+            rows.append((
+                block_number,
+                event['logIndex'],
+                self.w3.to_hex(event['transactionHash']),
+                event['event'],
+                user.lower() if user else None,
+                ref_id,
+                str(amount) if amount is not None else None,
+                float(self.w3.from_wei(amount, 'ether')) if amount is not None else None,
+                timestamps[block_number],
+                json.dumps(args, default=_json_default)
+            ))
+        return rows
+
+    def _store(self, rows: List[tuple], to_block: int) -> int:
+        """Insert a chunk and advance the checkpoint atomically"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO events (block_number, log_index, tx_hash, event, user, "
+                    "ref_id, amount, amount_eth, timestamp, args) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                added = self._conn.total_changes - before
+                self._conn.execute(
+                    "INSERT INTO checkpoints (contract, block_number, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(contract) DO UPDATE SET block_number = excluded.block_number, "
+                    "updated_at = excluded.updated_at",
+                    (self.address, to_block, time.time())
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return added
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'event': row['event'],
+            'block_number': row['block_number'],
+            'transaction_hash': row['tx_hash'],
+            'timestamp': row['timestamp'],
+            'args': json.loads(row['args'])
+        }
+
+    def user_history(self, address: str, event: Optional[str] = None, limit: int = 50,
+                     before_block: Optional[int] = None) -> List[Dict[str, Any]]:
+        """A user's events, newest first, including disease detections on their crops"""
+        user = address.lower()
+        clauses = ["(user = ? OR (event = 'DiseaseDetected' AND ref_id IN ("
+                   "SELECT ref_id FROM events WHERE event = 'PhotoUploaded' AND user = ?)))"]
+        params: list = [user, user]
+        if event:
+            clauses.append("event = ?")
+            params.append(event)
+        if before_block is not None:
+            clauses.append("block_number < ?")
+            params.append(int(before_block))
+        params.append(max(1, min(int(limit), 500)))
+
+        rows = self._query(
+            f"SELECT * FROM events WHERE {' AND '.join(clauses)} "
+            f"ORDER BY block_number DESC, log_index DESC LIMIT ?", tuple(params)
+        )
+        return [self._row_to_dict(row) for row in rows]
+
+    def user_stats(self, address: str) -> Dict[str, Any]:
+        """Aggregate a user's indexed activity"""
+        user = address.lower()
+        counts = {row[0]: row[1] for row in self._query(
+            "SELECT event, COUNT(*) FROM events WHERE user = ? GROUP BY event", (user,)
+        )}
+        totals = {row[0]: row[1] for row in self._query(
+            "SELECT event, SUM(amount_eth) FROM events WHERE user = ? AND amount_eth IS NOT NULL "
+            "GROUP BY event", (user,)
+        )}
+        diseases = self._query(
+            "SELECT COUNT(*) FROM events WHERE event = 'DiseaseDetected' AND ref_id IN ("
+            "SELECT ref_id FROM events WHERE event = 'PhotoUploaded' AND user = ?)", (user,)
+        )[0][0]
+        tier = self._query(
+            "SELECT args FROM events WHERE user = ? AND event = 'TierUpgraded' "
+            "ORDER BY block_number DESC, log_index DESC LIMIT 1", (user,)
+        )
+        last = self._query(
+            "SELECT MAX(timestamp) FROM events WHERE user = ?", (user,)
+        )[0][0]
+
+        return {
+            'photos_uploaded': counts.get('PhotoUploaded', 0),
+            'diseases_detected': diseases,
+            'rewards_earned': round(totals.get('RewardsEarned', 0.0) or 0.0, 6),
+            'reward_events': counts.get('RewardsEarned', 0),
+            'purchases': counts.get('PurchaseMade', 0),
+            'purchase_volume': round(totals.get('PurchaseMade', 0.0) or 0.0, 6),
+            'staking_rewards': round(totals.get('StakingRewardsDistributed', 0.0) or 0.0, 6),
+            'insurance_claims': counts.get('InsuranceClaimProcessed', 0),
+            'tier': json.loads(tier[0][0])['newTier'] if tier else 0,
+            'last_activity': last,
+            'indexed_to_block': self.checkpoint()
+        }
+
+    def events_for_transaction(self, tx_hash: str) -> List[Dict[str, Any]]:
+        """Indexed events emitted by one transaction"""
+        tx_hash = tx_hash.lower() if tx_hash.startswith('0x') else '0x' + tx_hash.lower()
+        rows = self._query(
+            "SELECT * FROM events WHERE tx_hash = ? ORDER BY log_index", (tx_hash,)
+        )
+        return [self._row_to_dict(row) for row in rows]
+
+    def get_status(self) -> Dict[str, Any]:
+        checkpoint = self.checkpoint()
+        total = self._query("SELECT COUNT(*) FROM events", ())[0][0]
+        return {
+            'contract': self.address,
+            'indexed_to_block': checkpoint,
+            'head': self._head,
+            'lag_blocks': (self._head - checkpoint) if self._head is not None else None,
+            'events': total,
+            'chunk_size': self.chunk_size,
+            'last_sync_ms': self._last_sync_ms
+        }
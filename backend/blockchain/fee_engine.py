@@ -0,0 +1,329 @@
+"""
+AgroAI Fee Engine
+Cached gas estimates, background EIP-1559 fee tracking and stuck-transaction replacement
+
+Sending used to cost an estimateGas, a gas-price lookup and a chain-id
+lookup per transaction. The engine answers all three from memory:
+estimates are cached per (contract, selector, argument shape) and
+refreshed after gas_cache_ttl seconds. A shape does not say whose
+storage a call touches, so a limit measured on a warm account carries
+gas_headroom on top, enough for the first writes of a cold one. Base
+and priority fees come from
+an eth_feeHistory poll in a background thread. The same thread watches
+broadcast nonces and re-sends any transaction still pending after
+stuck_after seconds with bumped fees, so one underpriced transaction
+cannot stall every later nonce.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .nonce_manager import StaleNonce
+
+logger = logging.getLogger(__name__)
+
+# Nodes require at least a 10% bump on both fee fields to accept a replacement
+MIN_REPLACEMENT_BUMP = 0.10
+# Absolute gas over an estimate: a couple of zero-to-nonzero SSTOREs (20k
+# each) for a user whose storage the cached estimate found already set
+GAS_HEADROOM = 50000
+
+def _call(function, snake: str, camel: str, *args):
+    """Call a web3 v6 snake_case method, falling back to the v5 camelCase name"""
+    method = getattr(function, snake, None) or getattr(function, camel)
+    return method(*args)
+
+def argument_shape(value) -> Hashable:
+    """Shape of a call argument for gas purposes: type and length, not contents"""
+    if isinstance(value, (list, tuple)):
+        return ('list', len(value), tuple(argument_shape(item) for item in value[:1]))
+    if isinstance(value, (str, bytes)):
+        # Calldata is padded to 32-byte words
+        return (type(value).__name__, math.ceil(len(value) / 32))
+    return type(value).__name__
+
+def gas_limit(estimate: int, buffer: float, headroom: int = GAS_HEADROOM) -> int:
+    """Gas limit for a reused estimate: the larger of the relative buffer and the absolute headroom"""
+    return max(int(estimate * buffer), estimate + headroom)
+
+def _hex(value) -> str:
+    if isinstance(value, str):
+        return value
+    return '0x' + bytes(value).hex()
+
+def _raw_transaction(signed) -> bytes:
+    return getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+
+class FeeEngine:
+    """Per-signer gas and fee oracle with automatic fee bumping"""
+
+    def __init__(self, w3, account, refresh_interval: float = 12.0, history_blocks: int = 10,
+                 reward_percentile: float = 50.0, base_fee_multiplier: float = 2.0,
+                 gas_cache_ttl: float = 300.0, gas_buffer: float = 1.2,
+                 gas_headroom: int = GAS_HEADROOM, stuck_after: float = 90.0, bump_percent: float = 12.5,
+                 max_replacements: int = 5, max_fee_cap: Optional[int] = None,
+                 fallback_gas_price: Optional[int] = None,
+                 on_replaced: Optional[Callable[[Any, Any], None]] = None):
+        """
+        account is the signing LocalAccount. max_fee_cap (wei) bounds every
+        fee the engine will ever offer, bumps included. on_replaced(old, new)
+        is called with both hashes whenever a stuck transaction is re-sent.
+        """
+        self.w3 = w3
+        self.account = account
+        self.refresh_interval = refresh_interval
+        self.history_blocks = max(1, int(history_blocks))
+        self.reward_percentile = reward_percentile
+        self.base_fee_multiplier = base_fee_multiplier
+        self.gas_cache_ttl = gas_cache_ttl
+        self.gas_buffer = max(1.0, gas_buffer)
+        self.gas_headroom = max(0, int(gas_headroom))
+        self.stuck_after = stuck_after
+        self.bump = max(MIN_REPLACEMENT_BUMP, bump_percent / 100.0)
+        self.max_replacements = max(0, int(max_replacements))
+        self.max_fee_cap = max_fee_cap
+        self.fallback_gas_price = fallback_gas_price
+        self.on_replaced = on_replaced
+
+        self._lock = threading.Lock()
+        self._fees: Optional[Dict[str, int]] = None
+        # None until the first eth_feeHistory attempt tells us which pricing applies
+        self._eip1559: Optional[bool] = None
+        self._fees_updated_at = 0.0
+        self._chain_id: Optional[int] = None
+        self._gas_cache: Dict[Hashable, Tuple[float, int]] = {}
+        # nonce -> in-flight transaction being watched for replacement
+        self._inflight: Dict[int, Dict[str, Any]] = {}
+        self._counters = {
+            'gas_cache_hits': 0,
+            'gas_estimates': 0,
+            'fee_refreshes': 0,
+            'replacements': 0
+        }
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self) -> 'FeeEngine':
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='fee-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                self.refresh_fees()
+            except Exception as e:
+                logger.warning(f"Fee refresh failed: {e}")
+            try:
+                self._replace_stuck()
+            except Exception as e:
+                logger.warning(f"Stuck transaction check failed: {e}")
+            self._wakeup.wait(self.refresh_interval)
+
+    @property
+    def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def refresh_fees(self) -> Dict[str, int]:
+        """Recompute fees from eth_feeHistory, or eth_gasPrice on pre-London chains"""
+        fees = None
+        if self._eip1559 is not False:
+            try:
+                history = self.w3.eth.fee_history(self.history_blocks, 'latest', [self.reward_percentile])
+                # The last entry is the base fee of the next block
+                base_fee = int(history['baseFeePerGas'][-1])
+                rewards = sorted(int(reward[0]) for reward in history.get('reward') or [] if reward)
+                tip = rewards[len(rewards) // 2] if rewards else self.w3.eth.max_priority_fee
+                tip = max(1, tip)
+                fees = {
+                    'maxPriorityFeePerGas': tip,
+                    'maxFeePerGas': int(base_fee * self.base_fee_multiplier) + tip
+                }
+                self._eip1559 = True
+            except Exception as e:
+                if self._eip1559:
+                    # Transient failure on a London chain; keep the last fees
+                    raise
+                logger.info(f"eth_feeHistory unavailable ({e}); using legacy gas pricing")
+                self._eip1559 = False
+
+        if fees is None:
+            try:
+                fees = {'gasPrice': int(self.w3.eth.gas_price)}
+            except Exception:
+                if self.fallback_gas_price is None:
+                    raise
+                fees = {'gasPrice': int(self.fallback_gas_price)}
+
+        fees = self._apply_cap(fees)
+        with self._lock:
+            self._fees = fees
+            self._fees_updated_at = time.time()
+            self._counters['fee_refreshes'] += 1
+        return dict(fees)
+
+    def _apply_cap(self, fees: Dict[str, int]) -> Dict[str, int]:
+        if self.max_fee_cap is None:
+            return fees
+        return {field: min(value, self.max_fee_cap) for field, value in fees.items()}
+
+    def fees(self) -> Dict[str, int]:
+        """Current fee fields for a new transaction, without an RPC round trip"""
+        with self._lock:
+            if self._fees is not None:
+                return dict(self._fees)
+        return self.refresh_fees()
+
+    def estimate_gas(self, function) -> int:
+        """Cached gas limit (estimate plus buffer or headroom) for a call of this shape"""
+        key = (
+            function.address,
+            function.fn_name,
+            tuple(argument_shape(arg) for arg in function.args),
+            tuple(sorted((k, argument_shape(v)) for k, v in (function.kwargs or {}).items()))
+        )
+        now = time.monotonic()
+        with self._lock:
+            cached = self._gas_cache.get(key)
+            if cached and cached[0] > now:
+                self._counters['gas_cache_hits'] += 1
+                return cached[1]
+
+        estimate = _call(function, 'estimate_gas', 'estimateGas', {'from': self.account.address})
+        gas = gas_limit(estimate, self.gas_buffer, self.gas_headroom)
+        with self._lock:
+            self._gas_cache[key] = (now + self.gas_cache_ttl, gas)
+            self._counters['gas_estimates'] += 1
+        return gas
+
+    def _sign(self, function, gas: int, nonce: int, fees: Dict[str, int]) -> bytes:
+        transaction = _call(function, 'build_transaction', 'buildTransaction', {
+            'from': self.account.address,
+            'chainId': self.chain_id,
+            'gas': gas,
+            'nonce': nonce,
+            **fees
+        })
+        signed = self.w3.eth.account.sign_transaction(transaction, self.account.key)
+        return _raw_transaction(signed)
+
+    def send(self, function, nonce_manager):
+        """
+        Price, sign and broadcast a contract call with a locally allocated
+        nonce, then watch it for replacement. Returns the transaction hash.
+        """
+        gas = self.estimate_gas(function)
+        fees = self.fees()
+        used = {}
+
+        def build_signed(nonce: int) -> bytes:
+            used['nonce'] = nonce
+            return self._sign(function, gas, nonce, fees)
+
+        tx_hash = nonce_manager.submit(build_signed)
+        self.watch(used['nonce'], tx_hash, nonce_manager, function, gas, fees)
+        return tx_hash
+
+    def watch(self, nonce: int, tx_hash, nonce_manager, function, gas: int, fees: Dict[str, int]):
+        """
+        Watch a transaction broadcast elsewhere for replacement; function
+        must be a sync contract call the engine can re-sign
+        """
+        with self._lock:
+            self._inflight[nonce] = {
+                'tx_hash': tx_hash,
+                'nonce_manager': nonce_manager,
+                'function': function,
+                'gas': gas,
+                'fees': fees,
+                'sent_at': time.time(),
+                'replacements': 0
+            }
+
+    def _bumped(self, old: Dict[str, int]) -> Dict[str, int]:
+        """At least bump% over the old fees, and no less than the current market"""
+        current = self.fees()
+        bumped = {}
+        for field, value in old.items():
+            minimum = int(math.ceil(value * (1 + self.bump))) + 1
+            bumped[field] = max(minimum, current.get(field, 0))
+        if 'maxFeePerGas' in bumped:
+            bumped['maxFeePerGas'] = max(bumped['maxFeePerGas'], bumped['maxPriorityFeePerGas'])
+        return bumped
+
+    def _replace_stuck(self):
+        with self._lock:
+            if not self._inflight:
+                return
+        mined_below = self.w3.eth.get_transaction_count(self.account.address, 'latest')
+        now = time.time()
+
+        with self._lock:
+            for nonce in [n for n in self._inflight if n < mined_below]:
+                del self._inflight[nonce]
+            stuck = [(nonce, dict(entry)) for nonce, entry in sorted(self._inflight.items())
+                     if now - entry['sent_at'] >= self.stuck_after]
+
+        for nonce, entry in stuck:
+            if entry['replacements'] >= self.max_replacements:
+                continue
+            fees = self._bumped(entry['fees'])
+            if self.max_fee_cap is not None and max(fees.values()) > self.max_fee_cap:
+                logger.warning(f"Nonce {nonce} stuck but a bump would exceed the fee cap")
+                continue
+
+            try:
+                # Through the allocator that issued the nonce, which refuses
+                # nonces it has since released or resynced past
+                new_hash = entry['nonce_manager'].replace(
+                    nonce, lambda n: self._sign(entry['function'], entry['gas'], n, fees)
+                )
+            except Exception as e:
+                message = str(e).lower()
+                if isinstance(e, StaleNonce) or 'nonce too low' in message:
+                    # Mined while we were deciding, or dropped and handed back
+                    with self._lock:
+                        self._inflight.pop(nonce, None)
+                else:
+                    logger.warning(f"Replacement for nonce {nonce} rejected: {e}")
+                continue
+
+            with self._lock:
+                if nonce in self._inflight:
+                    self._inflight[nonce].update({
+                        'tx_hash': new_hash,
+                        'fees': fees,
+                        'sent_at': time.time(),
+                        'replacements': entry['replacements'] + 1
+                    })
+                self._counters['replacements'] += 1
+            logger.info(f"Replaced stuck nonce {nonce}: {_hex(entry['tx_hash'])} -> "
+                        f"{_hex(new_hash)} with {fees}")
+            if self.on_replaced:
+                self.on_replaced(entry['tx_hash'], new_hash)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'eip1559': self._eip1559,
+                'fees': dict(self._fees) if self._fees else None,
+                'fees_age_seconds': round(time.time() - self._fees_updated_at, 3) if self._fees else None,
+                'gas_cache_entries': len(self._gas_cache),
+                'inflight_nonces': sorted(self._inflight),
+                **self._counters
+            }
@@ -0,0 +1,133 @@
+"""
+AgroAI Nonce Manager
+Hands out transaction nonces locally so one signer can pipeline many transactions
+
+Two allocators for one key would hand out the same nonces, so services
+get theirs from shared_nonce_manager(): one per signing address per
+process, whichever service (sync or async) asks first.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+NONCE_ERROR_MARKERS = (
+    'nonce too low',
+    'nonce too high',
+    'replacement transaction underpriced',
+    'invalid nonce',
+)
+
+class StaleNonce(RuntimeError):
+    """A replacement for a nonce the allocator no longer considers in flight"""
+
+def is_nonce_error(error: Exception) -> bool:
+    """Whether a send failure means our local nonce view is stale"""
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+class NonceManager:
+    """Thread-safe nonce allocator for a single signing account"""
+
+    def __init__(self, w3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce: Optional[int] = None
+        self._needs_sync = True
+        self.resyncs = 0
+        self.replacements = 0
+
+    def _sync(self):
+        """Reload from the node's pending count (caller holds the lock)"""
+        pending = self.w3.eth.get_transaction_count(self.address, 'pending')
+        if self._next_nonce is not None and pending != self._next_nonce:
+            logger.info(f"Nonce resynced for {self.address}: {self._next_nonce} -> {pending}")
+        self._next_nonce = pending
+        self._needs_sync = False
+
+    def allocate(self) -> int:
+        """Reserve the next nonce without an RPC round trip"""
+        with self._lock:
+            if self._needs_sync or self._next_nonce is None:
+                self._sync()
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int):
+        """Give back a nonce whose transaction was never broadcast"""
+        with self._lock:
+            if self._next_nonce is not None and nonce == self._next_nonce - 1:
+                self._next_nonce = nonce
+            else:
+                # A hole below in-flight nonces would stall every later
+                # transaction; the pending count points back at the hole
+                self._needs_sync = True
+
+    def resync(self):
+        """Force the next allocation to reload from the node"""
+        with self._lock:
+            self._needs_sync = True
+            self.resyncs += 1
+
+    def submit(self, build_signed: Callable[[int], bytes], max_attempts: int = 3):
+        """
+        Allocate a nonce, sign with build_signed(nonce) and broadcast.
+        Stale-nonce rejections trigger a resync and a retry; any other
+        failure releases the nonce and re-raises.
+        """
+        for attempt in range(1, max_attempts + 1):
+            nonce = self.allocate()
+            try:
+                return self.w3.eth.send_raw_transaction(build_signed(nonce))
+            except Exception as e:
+                if is_nonce_error(e) and attempt < max_attempts:
+                    logger.warning(f"Nonce {nonce} rejected ({e}); resyncing (attempt {attempt})")
+                    self.resync()
+                    continue
+                if is_nonce_error(e):
+                    self.resync()
+                else:
+                    self.release(nonce)
+                raise
+
+    def replace(self, nonce: int, build_signed: Callable[[int], bytes]):
+        """
+        Re-broadcast a transaction for a nonce already in flight, e.g. with
+        bumped fees. Raises StaleNonce when the nonce was released or lies
+        at or past the node's pending count, where the next allocation
+        would hand it to a different transaction.
+        """
+        with self._lock:
+            if self._needs_sync or self._next_nonce is None:
+                self._sync()
+            if nonce >= self._next_nonce:
+                raise StaleNonce(f"Nonce {nonce} is not in flight for {self.address}")
+        tx_hash = self.w3.eth.send_raw_transaction(build_signed(nonce))
+        with self._lock:
+            self.replacements += 1
+        return tx_hash
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                'address': self.address,
+                'next_nonce': self._next_nonce,
+                'needs_sync': self._needs_sync,
+                'resyncs': self.resyncs,
+                'replacements': self.replacements
+            }
+
+_shared: Dict[str, NonceManager] = {}
+_shared_lock = threading.Lock()
+
+def shared_nonce_manager(w3, address: str) -> NonceManager:
+    """The process's NonceManager for address; w3 is only used to create it"""
+    with _shared_lock:
+        manager = _shared.get(address.lower())
+        if manager is None:
+            manager = _shared[address.lower()] = NonceManager(w3, address)
+        return manager
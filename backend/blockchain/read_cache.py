@@ -0,0 +1,212 @@
+"""
+AgroAI Block-Aware Read Cache
+Batches contract view calls through Multicall3 and caches them per block
+
+Reads are keyed by the caller (for example ('stats', address)) and cached
+until the chain head moves. Every uncached key requested at the same time
+goes out in one Multicall3 aggregate3 round trip pinned to the current
+block. A key that is already in flight is awaited instead of fetched
+again, so concurrent identical lookups cost a single call.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional
+
+from ..lazy import lazy_import
+
+eth_abi = lazy_import('eth_abi')
+eth_utils_abi = lazy_import('eth_utils.abi')
+
+logger = logging.getLogger(__name__)
+
+# Deployed at the same address on mainnet, Sepolia and most EVM chains
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+MULTICALL3_ABI = [{
+    'name': 'aggregate3',
+    'type': 'function',
+    'stateMutability': 'payable',
+    'inputs': [{
+        'name': 'calls',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'target', 'type': 'address'},
+            {'name': 'allowFailure', 'type': 'bool'},
+            {'name': 'callData', 'type': 'bytes'}
+        ]
+    }],
+    'outputs': [{
+        'name': 'returnData',
+        'type': 'tuple[]',
+        'components': [
+            {'name': 'success', 'type': 'bool'},
+            {'name': 'returnData', 'type': 'bytes'}
+        ]
+    }]
+}]
+
+class ReadCallError(Exception):
+    """A batched view call reverted"""
+
+class BlockAwareReadCache:
+    """Per-block cache of contract view calls with multicall batching and coalescing"""
+
+    def __init__(self, w3, multicall_address: Optional[str] = MULTICALL3_ADDRESS,
+                 head_ttl: float = 1.0):
+        """
+        head_ttl bounds how often the chain head is re-read; a new head
+        invalidates every cached result. Pass multicall_address=None on
+        chains without Multicall3 to fall back to one eth_call per key.
+        """
+        self.w3 = w3
+        self.head_ttl = max(0.0, float(head_ttl))
+        self.multicall = (
+            w3.eth.contract(address=multicall_address, abi=MULTICALL3_ABI)
+            if multicall_address else None
+        )
+
+        self._lock = threading.Lock()
+        self._block: Optional[int] = None
+        self._block_checked_at = 0.0
+        self._results: Dict[Hashable, Any] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'round_trips': 0,
+            'invalidations': 0
+        }
+
+    def current_block(self) -> int:
+        """Chain head, re-read at most once per head_ttl; a new block clears the cache"""
+        now = time.monotonic()
+        with self._lock:
+            if self._block is not None and now - self._block_checked_at < self.head_ttl:
+                return self._block
+
+        block = self.w3.eth.block_number
+        with self._lock:
+            self._block_checked_at = now
+            if self._block is None or block > self._block:
+                if self._results:
+                    self._counters['invalidations'] += 1
+                self._block = block
+                self._results.clear()
+            return self._block
+
+    def invalidate(self):
+        """Drop cached results, e.g. after this process changed contract state"""
+        with self._lock:
+            self._results.clear()
+            self._block_checked_at = 0.0
+
+    def read(self, calls: Dict[Hashable, Any], timeout: float = 30.0) -> Dict[Hashable, Any]:
+        """
+        Resolve {key: contract_function} to {key: decoded result}. Cached
+        keys are served locally, in-flight keys are awaited, and the rest
+        are fetched together in one round trip.
+        """
+        block = self.current_block()
+        results: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, Future] = {}
+        owned: Dict[Hashable, Future] = {}
+
+        with self._lock:
+            for key, function in calls.items():
+                cache_key = (key, block)
+                if cache_key in self._results:
+                    results[key] = self._results[cache_key]
+                    self._counters['hits'] += 1
+                elif cache_key in self._inflight:
+                    waiting[key] = self._inflight[cache_key]
+                    self._counters['coalesced'] += 1
+                else:
+                    future = Future()
+                    self._inflight[cache_key] = future
+                    owned[key] = future
+                    self._counters['misses'] += 1
+
+        if owned:
+            self._fetch({key: calls[key] for key in owned}, owned, block)
+
+        for key, future in {**owned, **waiting}.items():
+            results[key] = future.result(timeout=timeout)
+        return results
+
+    def read_one(self, key: Hashable, function) -> Any:
+        return self.read({key: function})[key]
+
+    def _fetch(self, calls: Dict[Hashable, Any], futures: Dict[Hashable, Future], block: int):
+        try:
+            if self.multicall is not None and len(calls) > 1:
+                fetched = self._aggregate(calls, block)
+            else:
+                fetched = {}
+                for key, function in calls.items():
+                    try:
+                        fetched[key] = function.call(block_identifier=block)
+                    except Exception as e:
+                        fetched[key] = ReadCallError(str(e))
+                    with self._lock:
+                        self._counters['round_trips'] += 1
+        except Exception as e:
+            fetched = {key: e for key in calls}
+
+        with self._lock:
+            for key, future in futures.items():
+                cache_key = (key, block)
+                self._inflight.pop(cache_key, None)
+                value = fetched[key]
+                if isinstance(value, Exception):
+                    future.set_exception(value)
+                    continue
+                # Only cache while the block is still current
+                if block == self._block:
+                    self._results[cache_key] = value
+                future.set_result(value)
+
+    def _aggregate(self, calls: Dict[Hashable, Any], block: int) -> Dict[Hashable, Any]:
+        """One aggregate3 eth_call for every key; failures come back per key"""
+        keys = list(calls)
+        payload = [
+            (calls[key].address, True, calls[key]._encode_transaction_data())
+            for key in keys
+        ]
+        responses = self.multicall.functions.aggregate3(payload).call(block_identifier=block)
+        with self._lock:
+            self._counters['round_trips'] += 1
+
+        fetched = {}
+        for key, (success, data) in zip(keys, responses):
+            if not success:
+                fetched[key] = ReadCallError(f"{calls[key].fn_name} reverted")
+                continue
+            fetched[key] = self._decode(calls[key], data)
+        return fetched
+
+    @staticmethod
+    def _decode(function, data: bytes) -> Any:
+        """Decode return data the way ContractFunction.call() would"""
+        # Canonical type strings, tuples as '(t1,t2)'; the same list web3 builds internally
+        output_types = [eth_utils_abi.collapse_if_tuple(output) for output in function.abi.get('outputs', [])]
+        values = eth_abi.decode(output_types, data)
+        return values[0] if len(values) == 1 else list(values)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._results)
+            inflight = len(self._inflight)
+        lookups = counters['hits'] + counters['misses'] + counters['coalesced']
+        return {
+            'block_number': self._block,
+            'entries': size,
+            'inflight': inflight,
+            'multicall_enabled': self.multicall is not None,
+            'hit_rate': round((counters['hits'] + counters['coalesced']) / lookups, 4) if lookups else 0.0,
+            **counters
+        }
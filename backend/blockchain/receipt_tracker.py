@@ -0,0 +1,339 @@
+"""
+AgroAI Receipt Tracker
+Resolves submitted transactions in the background instead of blocking request threads
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from ..lazy import lazy_import
+
+# Only webhook delivery needs them; urllib3 comes with requests
+requests = lazy_import('requests')
+urllib3 = lazy_import('urllib3')
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_CONFIRMED = 'confirmed'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+
+# Beyond this many new blocks per poll, look receipts up per hash instead
+MAX_BLOCKS_PER_POLL = 16
+
+def _to_int(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value)
+
+def _to_hex(value) -> str:
+    if isinstance(value, str):
+        return value.lower() if value.startswith('0x') else '0x' + value.lower()
+    return '0x' + bytes(value).hex()
+
+class WebhookRejected(ValueError):
+    """A callback URL that is not https, not allow-listed, or resolves to a non-public address"""
+
+def _allowed_webhook_hosts() -> List[str]:
+    return [h.strip().lower() for h in os.environ.get('WEBHOOK_ALLOWED_HOSTS', '').split(',') if h.strip()]
+
+def _host_allowed(host: str, allowed: Iterable[str]) -> bool:
+    for pattern in allowed:
+        if pattern.startswith('*.') and host.endswith(pattern[1:]):
+            return True
+        if host == pattern:
+            return True
+    return False
+
+def _resolve_public_address(host: str, port: int) -> str:
+    """Every address the host resolves to must be globally routable; returns the first"""
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise WebhookRejected(f"Webhook host {host} does not resolve: {e}")
+    addresses = [ipaddress.ip_address(info[4][0].split('%')[0]) for info in infos]
+    for address in addresses:
+        if not address.is_global or address.is_multicast:
+            raise WebhookRejected(f"Webhook host {host} resolves to non-public address {address}")
+    if not addresses:
+        raise WebhookRejected(f"Webhook host {host} does not resolve")
+    return str(addresses[0])
+
+def validate_webhook_url(url: str, allowed_hosts: Optional[Iterable[str]] = None) -> str:
+    """
+    Return url if the server may POST to it: https, host on the
+    allow-list (WEBHOOK_ALLOWED_HOSTS, '*.example.com' wildcards; empty
+    disables webhooks), and resolving only to public addresses
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != 'https' or not parsed.hostname:
+        raise WebhookRejected("Webhook URL must be https")
+    host = parsed.hostname.lower()
+    allowed = _allowed_webhook_hosts() if allowed_hosts is None else [h.lower() for h in allowed_hosts]
+    if not _host_allowed(host, allowed):
+        raise WebhookRejected(f"Webhook host {host} is not allowed")
+    _resolve_public_address(host, parsed.port or 443)
+    return url
+
+def webhook_callback(url: str, timeout: float = 10.0) -> Callable[[Dict[str, Any]], None]:
+    """
+    Build a callback that POSTs the final transaction record to a URL;
+    WebhookRejected unless validate_webhook_url accepts it
+    """
+    validate_webhook_url(url)
+    parsed = urlparse(url)
+    host, port = parsed.hostname.lower(), parsed.port or 443
+    path = parsed.path or '/'
+    if parsed.query:
+        path += '?' + parsed.query
+
+    def post(record: Dict[str, Any]):
+        # Re-resolve at delivery, which may be minutes later, then connect
+        # to the address just checked (SNI and the certificate still use
+        # the hostname): a second lookup could be rebound inside. Redirects
+        # are never followed, so a 30x cannot point it inside either.
+        address = _resolve_public_address(host, port)
+        pool = urllib3.HTTPSConnectionPool(
+            address, port,
+            server_hostname=host, assert_hostname=host,
+            cert_reqs='CERT_REQUIRED', ca_certs=requests.certs.where(),
+            timeout=timeout, retries=False
+        )
+        try:
+            pool.urlopen('POST', path, body=json.dumps(record),
+                         headers={'Host': parsed.netloc.rsplit('@', 1)[-1],
+                                  'Content-Type': 'application/json'},
+                         redirect=False)
+        finally:
+            pool.close()
+    return post
+
+class ReceiptTracker:
+    """Polls once per new block and resolves every pending transaction together"""
+
+    def __init__(self, w3, poll_interval: float = 2.0, timeout_seconds: float = 600.0,
+                 max_records: int = 10000, callback_workers: int = 4):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout_seconds = timeout_seconds
+        self.max_records = max_records
+
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._callbacks: Dict[str, List[Callable]] = {}
+        self._global_callbacks: List[Callable] = []
+        # Replaced hash -> record key; either transaction may end up mined
+        self._aliases: Dict[str, str] = {}
+        self._last_block: Optional[int] = None
+        self._seen = set()
+        self._block_receipts_supported = True
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Webhooks can take seconds; they must not hold up the next poll
+        self._callback_executor = ThreadPoolExecutor(max_workers=callback_workers,
+                                                     thread_name_prefix='receipt-callback')
+
+    def start(self) -> 'ReceiptTracker':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='receipt-tracker', daemon=True)
+            self._thread.start()
+        return self
+
+    def add_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        """Register a hook called with every transaction's final record"""
+        self._global_callbacks.append(callback)
+
+    def track(self, tx_hash, metadata: Optional[Dict[str, Any]] = None,
+              callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Start tracking a broadcast transaction and return its pending record"""
+        key = _to_hex(tx_hash)
+        record = {
+            'transaction_hash': key,
+            'status': STATUS_PENDING,
+            'submitted_at': time.time(),
+            'block_number': None,
+            'gas_used': None,
+            'effective_gas_price': None,
+            'metadata': metadata or {}
+        }
+        with self._lock:
+            self._records[key] = record
+            if callback:
+                self._callbacks.setdefault(key, []).append(callback)
+            self._evict()
+        self.start()
+        return dict(record)
+
+    def replace(self, old_hash, new_hash):
+        """Follow a fee-bumped replacement that reuses a tracked transaction's nonce"""
+        old_key, new_key = _to_hex(old_hash), _to_hex(new_hash)
+        with self._lock:
+            key = self._aliases.get(old_key, old_key)
+            record = self._records.pop(key, None)
+            if record is None:
+                return
+            record['transaction_hash'] = new_key
+            record['replaced'] = record.get('replaced', []) + [key]
+            self._records[new_key] = record
+            if key in self._callbacks:
+                self._callbacks[new_key] = self._callbacks.pop(key)
+            for alias, target in self._aliases.items():
+                if target == key:
+                    self._aliases[alias] = new_key
+            self._aliases[key] = new_key
+            self._seen.discard(key)
+    
+    def get(self, tx_hash) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            key = _to_hex(tx_hash)
+            record = self._records.get(self._aliases.get(key, key))
+            return dict(record) if record else None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for record in self._records.values() if record['status'] == STATUS_PENDING)
+
+    def _evict(self):
+        """Drop the oldest resolved records past max_records (caller holds the lock)"""
+        overflow = len(self._records) - self.max_records
+        if overflow <= 0:
+            return
+        evicted = set()
+        for key in [k for k, r in self._records.items() if r['status'] != STATUS_PENDING][:overflow]:
+            del self._records[key]
+            self._callbacks.pop(key, None)
+            self._seen.discard(key)
+            evicted.add(key)
+        for alias in [a for a, target in self._aliases.items() if target in evicted]:
+            del self._aliases[alias]
+
+    def _run(self):
+        while True:
+            try:
+                self._poll()
+            except Exception as e:
+                logger.warning(f"Receipt tracker poll failed: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _poll(self):
+        if not self.pending_count():
+            return
+
+        block_number = self.w3.eth.block_number
+        with self._lock:
+            pending = {k: r for k, r in self._records.items() if r['status'] == STATUS_PENDING}
+            fresh = {k for k in pending if k not in self._seen}
+            self._seen.update(fresh)
+            # Every hash that may resolve a known record, replaced ones included
+            known = {k: k for k in pending if k not in fresh}
+            known.update({a: k for a, k in self._aliases.items() if k in known})
+
+        # Hashes tracked since the last poll are looked up individually once,
+        # after the head was read: if not mined yet, they land above it.
+        receipts = self._lookup_receipts(fresh)
+        if known and (self._last_block is None or block_number > self._last_block):
+            for tx_hash, receipt in self._fetch_block_receipts(set(known), self._last_block,
+                                                               block_number).items():
+                receipts[known[tx_hash]] = receipt
+        self._last_block = block_number
+
+        for key, receipt in receipts.items():
+            self._resolve(key, receipt)
+        self._expire({k: r for k, r in pending.items() if k not in receipts})
+
+    def _fetch_block_receipts(self, pending, previous_block: Optional[int], last_block: int) -> Dict[str, Any]:
+        """
+        Resolve every known pending hash from the receipts of the blocks
+        mined since the previous poll, one call per block instead of one per
+        transaction.
+        """
+        if (self._block_receipts_supported and previous_block is not None
+                and last_block - previous_block <= MAX_BLOCKS_PER_POLL):
+            try:
+                found = {}
+                for number in range(previous_block + 1, last_block + 1):
+                    response = self.w3.provider.make_request('eth_getBlockReceipts', [hex(number)])
+                    if 'error' in response:
+                        raise ValueError(response['error'])
+                    for receipt in response.get('result') or []:
+                        key = _to_hex(receipt['transactionHash'])
+                        if key in pending:
+                            found[key] = receipt
+                return found
+            except Exception as e:
+                logger.info(f"eth_getBlockReceipts unavailable, falling back to per-hash lookups: {e}")
+                self._block_receipts_supported = False
+
+        return self._lookup_receipts(pending)
+
+    def _lookup_receipts(self, hashes) -> Dict[str, Any]:
+        found = {}
+        for key in hashes:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(key)
+            except Exception:
+                # TransactionNotFound: not mined yet
+                continue
+            if receipt:
+                found[key] = receipt
+        return found
+
+    def _resolve(self, key: str, receipt):
+        status = _to_int(receipt['status'])
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or record['status'] != STATUS_PENDING:
+                return
+            record.update({
+                'status': STATUS_CONFIRMED if status == 1 else STATUS_FAILED,
+                'mined_hash': _to_hex(receipt['transactionHash']),
+                'block_number': _to_int(receipt['blockNumber']),
+                'gas_used': _to_int(receipt['gasUsed']),
+                'effective_gas_price': _to_int(receipt.get('effectiveGasPrice')),
+                'resolved_at': time.time()
+            })
+            final = dict(record)
+            callbacks = self._callbacks.pop(key, []) + list(self._global_callbacks)
+            self._seen.discard(key)
+        logger.info(f"Transaction {key} {final['status']} in block {final['block_number']}")
+        self._notify(final, callbacks)
+
+    def _expire(self, pending: Dict[str, Dict]):
+        deadline = time.time() - self.timeout_seconds
+        for key, record in pending.items():
+            if record['submitted_at'] >= deadline:
+                continue
+            with self._lock:
+                if self._records.get(key, {}).get('status') != STATUS_PENDING:
+                    continue
+                self._records[key].update({'status': STATUS_TIMEOUT, 'resolved_at': time.time()})
+                final = dict(self._records[key])
+                callbacks = self._callbacks.pop(key, []) + list(self._global_callbacks)
+                self._seen.discard(key)
+            logger.warning(f"Transaction {key} not mined after {self.timeout_seconds}s")
+            self._notify(final, callbacks)
+
+    def _notify(self, record: Dict[str, Any], callbacks: List[Callable]):
+        if callbacks:
+            self._callback_executor.submit(self._deliver, record, callbacks)
+
+    def _deliver(self, record: Dict[str, Any], callbacks: List[Callable]):
+        """Run a record's callbacks in order (callback pool)"""
+        for callback in callbacks:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.warning(f"Receipt callback failed for {record['transaction_hash']}: {e}")
@@ -0,0 +1,355 @@
+"""
+AgroAI Reward Accumulator
+Buffers per-upload rewards durably and settles them in batched transactions
+
+Each reward is written to SQLite before the request returns. A flush
+claims up to max_batch_size pending rewards under a random bytes32 batch
+id, folds them per address and settles them with one
+AgroAIToken.batchRewardUploads call. The contract refuses a batch id it
+has already settled, so a batch left in flight by a crash, a failed
+transaction or a receipt timeout is simply re-sent under the same id:
+owed rewards are never lost and never paid twice.
+"""
+
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .receipt_tracker import STATUS_CONFIRMED
+
+logger = logging.getLogger(__name__)
+
+REWARD_PHOTO = 'photo'
+REWARD_DISEASE = 'disease'
+REWARD_EARLY_DETECTION = 'early_detection'
+REWARD_KINDS = (REWARD_PHOTO, REWARD_DISEASE, REWARD_EARLY_DETECTION)
+
+# AGRO per reward kind, mirroring the AgroAIToken constants
+REWARD_AMOUNTS = {
+    REWARD_PHOTO: 5,
+    REWARD_DISEASE: 100,
+    REWARD_EARLY_DETECTION: 200
+}
+
+BATCH_OPEN = 'open'
+BATCH_SUBMITTED = 'submitted'
+BATCH_SETTLED = 'settled'
+BATCH_FAILED = 'failed'
+
+# (users, photos, detections, early detections), index-aligned
+FoldedBatch = Tuple[List[str], List[int], List[int], List[int]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rewards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    address TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    disease TEXT,
+    created_at REAL NOT NULL,
+    batch_id TEXT
+);
+CREATE INDEX IF NOT EXISTS rewards_batch ON rewards (batch_id);
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    tx_hash TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+def fold_rewards(rows: List[Tuple[str, str]]) -> FoldedBatch:
+    """Fold (address, kind) rows into per-address reward counts"""
+    counts: Dict[str, Dict[str, int]] = {}
+    for address, kind in rows:
+        per_kind = counts.setdefault(address, dict.fromkeys(REWARD_KINDS, 0))
+        per_kind[kind] += 1
+
+    users = list(counts)
+    return (
+        users,
+        [counts[user][REWARD_PHOTO] for user in users],
+        [counts[user][REWARD_DISEASE] for user in users],
+        [counts[user][REWARD_EARLY_DETECTION] for user in users]
+    )
+
+class RewardAccumulator:
+    """Durable pending-reward buffer flushed on a size or time trigger"""
+
+    def __init__(self, settle_fn: Callable[[str, FoldedBatch, Callable], Dict[str, Any]],
+                 is_settled_fn: Optional[Callable[[str], bool]] = None,
+                 db_path: str = 'data/rewards.db', max_batch_size: int = 100,
+                 flush_interval: float = 60.0, max_attempts: int = 5):
+        """
+        settle_fn(batch_id, folded, callback) sends the batch transaction and
+        returns a dict with its transaction_hash; callback receives the
+        receipt tracker's final record. is_settled_fn(batch_id) reads the
+        contract's settledBatches mapping.
+        """
+        self.settle_fn = settle_fn
+        self.is_settled_fn = is_settled_fn
+        self.db_path = db_path
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(SCHEMA)
+        self._recover()
+
+    def _recover(self):
+        """Reopen batches whose outcome was lost with the previous process"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE batches SET status = ?, updated_at = ? WHERE status = ?",
+                (BATCH_OPEN, time.time(), BATCH_SUBMITTED)
+            )
+            pending = self._conn.execute(
+                "SELECT COUNT(*) FROM rewards"
+            ).fetchone()[0]
+        if cursor.rowcount or pending:
+            logger.info(f"Recovered {pending} owed rewards "
+                        f"({cursor.rowcount} batches to re-check)")
+
+    def start(self) -> 'RewardAccumulator':
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='reward-flusher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def add(self, address: str, kind: str, disease: Optional[str] = None,
+            callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Durably record an owed reward; it is paid with the next batch"""
+        if kind not in REWARD_KINDS:
+            raise ValueError(f"Unknown reward kind '{kind}'")
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO rewards (address, kind, disease, created_at) VALUES (?, ?, ?, ?)",
+                (address, kind, disease, time.time())
+            )
+            reward_id = cursor.lastrowid
+            if callback:
+                # Callbacks live in memory only; a restart drops them but not the reward
+                self._callbacks[reward_id] = callback
+            unassigned = self._unassigned_count()
+
+        if unassigned >= self.max_batch_size:
+            self._wakeup.set()
+
+        return {
+            'reward_id': reward_id,
+            'status': 'queued',
+            'reward_amount': REWARD_AMOUNTS[kind]
+        }
+
+    def _unassigned_count(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM rewards WHERE batch_id IS NULL"
+        ).fetchone()[0]
+
+    def pending_for(self, address: str) -> Dict[str, int]:
+        """Get an address's owed but not yet settled rewards"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*) FROM rewards WHERE address = ? GROUP BY kind", (address,)
+            ).fetchall()
+        counts = dict.fromkeys(REWARD_KINDS, 0)
+        counts.update(dict(rows))
+        counts['total_amount'] = sum(REWARD_AMOUNTS[kind] * counts[kind] for kind in REWARD_KINDS)
+        return counts
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self._running and self.flush():
+                    pass
+            except Exception as e:
+                logger.error(f"Reward flush failed: {e}")
+
+    def flush(self) -> bool:
+        """
+        Send one batch: a reopened batch first, otherwise the oldest
+        unassigned rewards. Returns True if more work may be waiting.
+        """
+        with self._flush_lock:
+            batch_id, rows = self._claim_batch()
+            if batch_id is None:
+                return False
+
+            if self.is_settled_fn:
+                try:
+                    if self.is_settled_fn(batch_id):
+                        # Mined before the previous attempt's outcome was recorded
+                        self._mark_settled(batch_id, None)
+                        return True
+                except Exception as e:
+                    logger.warning(f"Could not check settlement of batch {batch_id}: {e}")
+
+            # Submitted before the send: the receipt tracker may call
+            # _on_receipt before settle_fn returns, and its outcome must not
+            # be overwritten by this attempt's bookkeeping
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE batches SET status = ?, tx_hash = NULL, attempts = attempts + 1, "
+                    "error = NULL, updated_at = ? WHERE batch_id = ?",
+                    (BATCH_SUBMITTED, time.time(), batch_id)
+                )
+
+            folded = fold_rewards(rows)
+            try:
+                result = self.settle_fn(
+                    batch_id, folded, lambda record: self._on_receipt(batch_id, record)
+                )
+            except Exception as e:
+                self._record_failure(batch_id, str(e))
+                return False
+
+            with self._lock:
+                # Only the hash; a receipt that already arrived has set the status
+                self._conn.execute(
+                    "UPDATE batches SET tx_hash = COALESCE(tx_hash, ?) WHERE batch_id = ? AND status = ?",
+                    (result.get('transaction_hash'), batch_id, BATCH_SUBMITTED)
+                )
+            logger.info(f"Reward batch {batch_id} sent: {len(rows)} rewards for "
+                        f"{len(folded[0])} addresses, tx {result.get('transaction_hash')}")
+            return self._has_unassigned()
+
+    def _has_unassigned(self) -> bool:
+        with self._lock:
+            return self._unassigned_count() > 0
+
+    def _claim_batch(self) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+        """Pick a reopened batch, or assign unassigned rewards to a new one"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT batch_id FROM batches WHERE status = ? ORDER BY created_at LIMIT 1",
+                (BATCH_OPEN,)
+            ).fetchone()
+            if row:
+                batch_id = row[0]
+            else:
+                if not self._unassigned_count():
+                    return None, []
+                batch_id = '0x' + secrets.token_hex(32)
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._conn.execute(
+                        "INSERT INTO batches (batch_id, status, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?)", (batch_id, BATCH_OPEN, now, now)
+                    )
+                    self._conn.execute(
+                        "UPDATE rewards SET batch_id = ? WHERE id IN ("
+                        "SELECT id FROM rewards WHERE batch_id IS NULL ORDER BY id LIMIT ?)",
+                        (batch_id, self.max_batch_size)
+                    )
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+
+            rows = self._conn.execute(
+                "SELECT address, kind FROM rewards WHERE batch_id = ? ORDER BY id", (batch_id,)
+            ).fetchall()
+        return batch_id, rows
+
+    def _on_receipt(self, batch_id: str, record: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batches SET tx_hash = ? WHERE batch_id = ?",
+                (record.get('mined_hash') or record['transaction_hash'], batch_id)
+            )
+        if record['status'] == STATUS_CONFIRMED:
+            self._mark_settled(batch_id, record)
+            return
+
+        # Reverted or not mined in time: re-send under the same batch id. If
+        # the earlier transaction lands after all, settledBatches says so.
+        self._record_failure(batch_id, f"transaction {record['status']}")
+        self._wakeup.set()
+
+    def _record_failure(self, batch_id: str, error: str):
+        """Reopen a submitted attempt that failed, or park the batch after max_attempts"""
+        with self._lock:
+            attempts = self._conn.execute(
+                "SELECT attempts FROM batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()[0]
+            status = BATCH_FAILED if attempts >= self.max_attempts else BATCH_OPEN
+            self._conn.execute(
+                "UPDATE batches SET status = ?, error = ?, updated_at = ? "
+                "WHERE batch_id = ?", (status, error, time.time(), batch_id)
+            )
+        if status == BATCH_FAILED:
+            logger.error(f"Reward batch {batch_id} failed {attempts} times, "
+                         f"holding it for manual review: {error}")
+        else:
+            logger.warning(f"Reward batch {batch_id} attempt {attempts} failed: {error}")
+
+    def _mark_settled(self, batch_id: str, record: Optional[Dict[str, Any]]):
+        with self._lock:
+            reward_ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM rewards WHERE batch_id = ?", (batch_id,)
+            )]
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute("DELETE FROM rewards WHERE batch_id = ?", (batch_id,))
+                self._conn.execute(
+                    "UPDATE batches SET status = ?, error = NULL, updated_at = ? WHERE batch_id = ?",
+                    (BATCH_SETTLED, time.time(), batch_id)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            callbacks = [self._callbacks.pop(i) for i in reward_ids if i in self._callbacks]
+
+        logger.info(f"Reward batch {batch_id} settled ({len(reward_ids)} rewards)")
+        notification = dict(record or {}, batch_id=batch_id)
+        for callback in callbacks:
+            try:
+                callback(notification)
+            except Exception as e:
+                logger.warning(f"Reward callback failed for batch {batch_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get owed-reward and batch counters"""
+        with self._lock:
+            owed = self._conn.execute("SELECT COUNT(*) FROM rewards").fetchone()[0]
+            unassigned = self._unassigned_count()
+            batches = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM batches GROUP BY status"
+            ).fetchall())
+        return {
+            'owed_rewards': owed,
+            'unassigned_rewards': unassigned,
+            'batches': {status: batches.get(status, 0) for status in
+                        (BATCH_OPEN, BATCH_SUBMITTED, BATCH_SETTLED, BATCH_FAILED)},
+            'max_batch_size': self.max_batch_size,
+            'flush_interval': self.flush_interval
+        }
@@ -0,0 +1,356 @@
+"""
+AgroAI RPC Pool
+Multi-endpoint web3 providers with latency-aware routing, hedged reads and pinned writes
+
+RPCPool keeps a rolling latency sample and error count per endpoint.
+Reads go to the fastest healthy endpoint. If that endpoint has not
+answered within its own hedge percentile (p95 by default), the same read
+is also sent to the runner-up and the first answer wins. Writes and
+nonce lookups stay pinned to one endpoint, so a transaction and the
+pending count that produced its nonce come from the same mempool. The pin
+moves only when the node fails. An endpoint that fails
+`failure_threshold` times in a row is benched for `cooldown` seconds.
+
+PooledHTTPProvider (sync) and AsyncPooledHTTPProvider (asyncio) are
+drop-in web3 providers over one shared RPCPool, so Web3Service and
+AsyncWeb3Service can route through the same scores.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from web3 import AsyncHTTPProvider, HTTPProvider
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+logger = logging.getLogger(__name__)
+
+# Methods whose answer must come from the node that broadcasts our transactions
+PINNED_METHODS = frozenset({
+    'eth_sendRawTransaction',
+    'eth_sendTransaction',
+    'eth_getTransactionCount'
+})
+
+class Endpoint:
+    """Rolling latency and error record for one RPC URL"""
+
+    def __init__(self, url: str, window: int = 200):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.requests = 0
+        self.hedged = 0
+
+    def record(self, seconds: Optional[float]):
+        """Record a success (with its latency) or, with None, a failure"""
+        self.requests += 1
+        if seconds is None:
+            self.outcomes.append(0)
+            self.consecutive_failures += 1
+        else:
+            self.outcomes.append(1)
+            self.latencies.append(seconds)
+            self.consecutive_failures = 0
+            self.benched_until = 0.0
+
+    def error_rate(self) -> float:
+        return 1.0 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by the error rate"""
+        median = self.percentile(50)
+        if median is None:
+            # Unmeasured endpoints get tried before we settle on a favourite
+            return 0.0
+        return median * (1.0 + 10.0 * self.error_rate())
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.benched_until
+
+class RPCPool:
+    """Endpoint scores plus routing decisions shared by the pooled providers"""
+
+    def __init__(self, urls: List[str], hedge: bool = True, hedge_percentile: float = 95.0,
+                 hedge_min_ms: float = 50.0, hedge_default_ms: float = 500.0,
+                 failure_threshold: int = 3, cooldown: float = 30.0):
+        urls = [url.strip() for url in urls if url and url.strip()]
+        if not urls:
+            raise ValueError("RPCPool needs at least one RPC URL")
+
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min = hedge_min_ms / 1000.0
+        self.hedge_default = hedge_default_ms / 1000.0
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._pinned: Optional[Endpoint] = None
+
+    def ranked(self) -> List[Endpoint]:
+        """Healthy endpoints best-first, then benched ones as a last resort"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=Endpoint.score)
+            benched = sorted((e for e in self.endpoints if not e.healthy(now)),
+                             key=lambda e: e.benched_until)
+        return healthy + benched
+
+    def pinned(self) -> Endpoint:
+        """The write endpoint; kept until it fails"""
+        with self._lock:
+            if self._pinned is not None and self._pinned.healthy(time.monotonic()):
+                return self._pinned
+        endpoint = self.ranked()[0]
+        with self._lock:
+            if self._pinned is not endpoint:
+                logger.info(f"RPC writes pinned to {endpoint.url}")
+            self._pinned = endpoint
+        return endpoint
+
+    def fallback_for(self, failed: Endpoint) -> Optional[Endpoint]:
+        """Best endpoint other than the one that just failed"""
+        return next((endpoint for endpoint in self.ranked() if endpoint is not failed), None)
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        with self._lock:
+            enough = len(endpoint.latencies) >= 20
+            delay = endpoint.percentile(self.hedge_percentile) if enough else self.hedge_default
+        return max(self.hedge_min, delay)
+
+    def record(self, endpoint: Endpoint, seconds: Optional[float]):
+        with self._lock:
+            endpoint.record(seconds)
+            if seconds is None and endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.benched_until = time.monotonic() + self.cooldown
+                if self._pinned is endpoint:
+                    self._pinned = None
+                logger.warning(f"RPC endpoint {endpoint.url} benched for {self.cooldown}s "
+                               f"after {endpoint.consecutive_failures} failures")
+
+    def record_hedge(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.hedged += 1
+
+    def is_healthy(self) -> bool:
+        """Whether any endpoint is serving, judged from recent traffic only"""
+        now = time.monotonic()
+        with self._lock:
+            return any(e.healthy(now) and (not e.outcomes or e.outcomes[-1])
+                       for e in self.endpoints)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'url': endpoint.url,
+                'healthy': endpoint.healthy(now),
+                'pinned': endpoint is self._pinned,
+                'requests': endpoint.requests,
+                'hedged': endpoint.hedged,
+                'error_rate': round(endpoint.error_rate(), 4),
+                'p50_ms': round(endpoint.percentile(50) * 1000.0, 2) if endpoint.latencies else None,
+                'p95_ms': round(endpoint.percentile(95) * 1000.0, 2) if endpoint.latencies else None
+            } for endpoint in self.endpoints]
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Synchronous web3 provider routing requests through an RPCPool"""
+
+    def __init__(self, urls: List[str], request_kwargs: Optional[Dict[str, Any]] = None,
+                 pool: Optional[RPCPool] = None, hedge_workers: int = 64, **pool_kwargs):
+        super().__init__()
+        self.pool = pool or RPCPool(urls, **pool_kwargs)
+        self.providers = {
+            endpoint.url: HTTPProvider(endpoint.url, request_kwargs=request_kwargs)
+            for endpoint in self.pool.endpoints
+        }
+        # Only hedged reads leave the request thread; each needs at most two
+        # workers, so this bounds concurrent hedged reads, not all calls
+        self._executor = ThreadPoolExecutor(max_workers=max(2, hedge_workers),
+                                            thread_name_prefix='rpc-pool') if self.pool.hedge else None
+
+    def close(self):
+        """Release the hedge workers; the provider must not be used afterwards"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _send(self, endpoint: Endpoint, method: str, params: Any):
+        start = time.perf_counter()
+        try:
+            response = self.providers[endpoint.url].make_request(method, params)
+        except Exception:
+            self.pool.record(endpoint, None)
+            raise
+        self.pool.record(endpoint, time.perf_counter() - start)
+        return response
+
+    def make_request(self, method, params):
+        if method in PINNED_METHODS:
+            return self._pinned_request(method, params)
+        return self._read_request(method, params)
+
+    def _pinned_request(self, method, params):
+        pinned = self.pool.pinned()
+        try:
+            return self._send(pinned, method, params)
+        except Exception as e:
+            fallback = self.pool.fallback_for(pinned)
+            if fallback is None:
+                raise
+            # Re-sending the same signed transaction elsewhere is safe; the
+            # worst case is an "already known" answer
+            logger.warning(f"Pinned RPC request {method} failed ({e}); retrying on {fallback.url}")
+            return self._send(fallback, method, params)
+
+    def _read_request(self, method, params):
+        ranked = self.pool.ranked()
+        if not self.pool.hedge:
+            # Nothing to race, so the request thread makes the call itself
+            try:
+                return self._send(ranked[0], method, params)
+            except Exception as e:
+                return self._failover(ranked[1:], method, params, e)
+
+        # The runner-up's answer can only win if the primary is not blocking
+        # the request thread, so both go to the executor
+        primary = self._executor.submit(self._send, ranked[0], method, params)
+        try:
+            return primary.result(timeout=self.pool.hedge_delay(ranked[0]))
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            return self._failover(ranked[1:], method, params, e)
+
+        # Primary is slower than its own percentile; race the runner-up
+        self.pool.record_hedge(ranked[1])
+        pending = {primary, self._executor.submit(self._send, ranked[1], method, params)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        return self._failover(ranked[2:], method, params, error)
+
+    def _failover(self, endpoints: List[Endpoint], method, params, error: Exception = None):
+        for endpoint in endpoints:
+            try:
+                return self._send(endpoint, method, params)
+            except Exception as e:
+                error = e
+        raise error or ConnectionError(f"All RPC endpoints failed for {method}")
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        """Answered from recent traffic; never blocks on a slow node"""
+        if not any(endpoint.requests for endpoint in self.pool.endpoints):
+            try:
+                self.make_request('eth_chainId', [])
+            except Exception:
+                return False
+        return self.pool.is_healthy()
+
+    # web3 v5 name
+    isConnected = is_connected
+
+class AsyncPooledHTTPProvider(AsyncJSONBaseProvider):
+    """asyncio web3 provider routing requests through an RPCPool"""
+
+    def __init__(self, urls: List[str], request_kwargs: Optional[Dict[str, Any]] = None,
+                 pool: Optional[RPCPool] = None, **pool_kwargs):
+        super().__init__()
+        self.pool = pool or RPCPool(urls, **pool_kwargs)
+        self.providers = {
+            endpoint.url: AsyncHTTPProvider(endpoint.url, request_kwargs=request_kwargs)
+            for endpoint in self.pool.endpoints
+        }
+
+    async def cache_async_session(self, session):
+        """Share one aiohttp session across every endpoint"""
+        for provider in self.providers.values():
+            await provider.cache_async_session(session)
+
+    async def _send(self, endpoint: Endpoint, method: str, params: Any):
+        start = time.perf_counter()
+        try:
+            response = await self.providers[endpoint.url].make_request(method, params)
+        except asyncio.CancelledError:
+            # Lost a hedge race: not a failure, but it was at least this slow,
+            # otherwise a node that always loses would never get measured
+            self.pool.record(endpoint, time.perf_counter() - start)
+            raise
+        except Exception:
+            self.pool.record(endpoint, None)
+            raise
+        self.pool.record(endpoint, time.perf_counter() - start)
+        return response
+
+    async def make_request(self, method, params):
+        if method in PINNED_METHODS:
+            pinned = self.pool.pinned()
+            try:
+                return await self._send(pinned, method, params)
+            except Exception as e:
+                fallback = self.pool.fallback_for(pinned)
+                if fallback is None:
+                    raise
+                logger.warning(f"Pinned RPC request {method} failed ({e}); retrying on {fallback.url}")
+                return await self._send(fallback, method, params)
+
+        ranked = self.pool.ranked()
+        primary = asyncio.ensure_future(self._send(ranked[0], method, params))
+        if self.pool.hedge:
+            done, _ = await asyncio.wait({primary}, timeout=self.pool.hedge_delay(ranked[0]))
+            if not done:
+                self.pool.record_hedge(ranked[1])
+                backup = asyncio.ensure_future(self._send(ranked[1], method, params))
+                error = None
+                for next_done in asyncio.as_completed({primary, backup}):
+                    try:
+                        result = await next_done
+                    except Exception as e:
+                        error = e
+                        continue
+                    for task in (primary, backup):
+                        task.cancel()
+                    return result
+                return await self._failover(ranked[2:], method, params, error)
+
+        try:
+            return await primary
+        except Exception as e:
+            return await self._failover(ranked[1:], method, params, e)
+
+    async def _failover(self, endpoints: List[Endpoint], method, params, error: Exception = None):
+        for endpoint in endpoints:
+            try:
+                return await self._send(endpoint, method, params)
+            except Exception as e:
+                error = e
+        raise error or ConnectionError(f"All RPC endpoints failed for {method}")
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        if not any(endpoint.requests for endpoint in self.pool.endpoints):
+            try:
+                await self.make_request('eth_chainId', [])
+            except Exception:
+                return False
+        return self.pool.is_healthy()
@@ -6,18 +6,81 @@ Handles all blockchain interactions for the Flask backend
 import json
 import os
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Callable, Optional, Tuple
 from web3 import Web3
+from web3.logs import DISCARD
 from web3.middleware import geth_poa_middleware
 import ipfshttpclient
 from eth_account import Account
-import hashlib
+import io
+import threading
 import time
 
+from .fee_engine import FeeEngine
+from .nonce_manager import shared_nonce_manager
+from .read_cache import MULTICALL3_ADDRESS, BlockAwareReadCache
+from .receipt_tracker import STATUS_CONFIRMED, STATUS_FAILED, STATUS_PENDING, ReceiptTracker
+from .reward_accumulator import (
+    REWARD_DISEASE, REWARD_EARLY_DETECTION, REWARD_PHOTO, FoldedBatch, RewardAccumulator
+)
+from .rpc_pool import PooledHTTPProvider
+from ..storage.cid import compute_cid, ipfs_add_options
+from ..storage.pin_queue import PinQueue
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def load_config(config_path: str = None) -> Dict[str, Any]:
+    """Load configuration from file or environment"""
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    
+    # Fallback to environment variables
+    return {
+        'web3': {
+            'rpcUrl': os.getenv('SEPOLIA_RPC_URL', 'https://sepolia.infura.io/v3/YOUR_INFURA_KEY'),
+            # Extra endpoints for the RPC pool; empty means rpcUrl alone
+            'rpcUrls': [url for url in os.getenv('RPC_URLS', '').split(',') if url.strip()],
+            'rpcPool': {
+                'hedge': os.getenv('RPC_HEDGING', 'true').lower() == 'true',
+                'hedge_percentile': float(os.getenv('RPC_HEDGE_PERCENTILE', '95')),
+                'failure_threshold': int(os.getenv('RPC_FAILURE_THRESHOLD', '3')),
+                'cooldown': float(os.getenv('RPC_COOLDOWN_SECONDS', '30'))
+            },
+            'privateKey': os.getenv('PRIVATE_KEY', ''),
+            'gasLimit': int(os.getenv('GAS_LIMIT', '500000')),
+            'gasPrice': os.getenv('GAS_PRICE', '20000000000')
+        },
+        'contracts': {
+            'agroToken': os.getenv('AGRO_TOKEN_ADDRESS', ''),
+            'agroCore': os.getenv('AGRO_CORE_ADDRESS', '')
+        },
+        'ipfs': {
+            'projectId': os.getenv('IPFS_PROJECT_ID', ''),
+            'projectSecret': os.getenv('IPFS_PROJECT_SECRET', ''),
+            'endpoint': os.getenv('IPFS_ENDPOINT', 'https://ipfs.infura.io:5001'),
+            'cidVersion': int(os.getenv('IPFS_CID_VERSION', '0')),
+            'pinDbPath': os.getenv('IPFS_PIN_DB_PATH', 'data/pins.db'),
+            'pinSpoolDir': os.getenv('IPFS_PIN_SPOOL_DIR', 'data/pin_spool'),
+            'pinConcurrency': int(os.getenv('IPFS_PIN_CONCURRENCY', '4')),
+            'pinMaxAttempts': int(os.getenv('IPFS_PIN_MAX_ATTEMPTS', '8')),
+            'pinStaleSeconds': float(os.getenv('IPFS_PIN_STALE_SECONDS', '900'))
+        }
+    }
+
+def rpc_urls(config: Dict[str, Any]) -> list:
+    """RPC endpoints from config, primary URL first"""
+    web3_config = config['web3']
+    return [web3_config['rpcUrl']] + list(web3_config.get('rpcUrls') or [])
+
+def load_abi(name: str) -> list:
+    """Load a contract ABI exported to the config directory"""
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../config')
+    with open(os.path.join(config_dir, f'{name}-abi.json'), 'r') as f:
+        return json.load(f)
+
 class Web3Service:
     """Main Web3 service for blockchain interactions"""
     
@@ -25,39 +88,56 @@ class Web3Service:
         """Initialize Web3 service with configuration"""
         self.config = self._load_config(config_path)
         self.w3 = self._initialize_web3()
-        self.account = self._load_account()
-        self.contracts = self._load_contracts()
-        self.ipfs_client = self._initialize_ipfs()
+        try:
+            self.account = self._load_account()
+            self.nonce_manager = shared_nonce_manager(self.w3, self.account.address)
+            self.receipt_tracker = ReceiptTracker(
+                self.w3,
+                poll_interval=float(os.getenv('RECEIPT_POLL_INTERVAL', '2')),
+                timeout_seconds=float(os.getenv('RECEIPT_TIMEOUT', '600'))
+            )
+            self.fee_engine = FeeEngine(
+                self.w3,
+                self.account,
+                gas_cache_ttl=float(os.getenv('GAS_CACHE_TTL_SECONDS', '300')),
+                gas_headroom=int(os.getenv('GAS_HEADROOM', '50000')),
+                stuck_after=float(os.getenv('TX_STUCK_AFTER_SECONDS', '90')),
+                max_fee_cap=int(os.getenv('MAX_FEE_PER_GAS')) if os.getenv('MAX_FEE_PER_GAS') else None,
+                fallback_gas_price=int(self.config['web3']['gasPrice']),
+                on_replaced=self.receipt_tracker.replace
+            )
+            # Legacy behaviour: block the request until the receipt arrives
+            self.wait_for_receipts = os.getenv('WAIT_FOR_RECEIPTS', 'false').lower() == 'true'
+            self.contracts = self._load_contracts()
+            self.reads = BlockAwareReadCache(
+                self.w3,
+                multicall_address=os.getenv('MULTICALL3_ADDRESS', MULTICALL3_ADDRESS) or None,
+                head_ttl=float(os.getenv('READ_CACHE_HEAD_TTL', '1'))
+            )
+            self.ipfs_client = self._initialize_ipfs()
+            self.pin_queue = self._initialize_pin_queue()
+            self.reward_accumulator = self._initialize_reward_accumulator()
+        except Exception:
+            # Nothing has started a thread yet, only the provider's hedge workers
+            self.w3.provider.close()
+            raise
+        
+        # Background loops start once construction can no longer fail, so a
+        # retried construction leaves no threads polling the RPC behind
+        self.fee_engine.start()
+        self.pin_queue.start()
+        if self.reward_accumulator:
+            self.reward_accumulator.start()
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from file or environment"""
-        if config_path and os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                return json.load(f)
-        
-        # Fallback to environment variables
-        return {
-            'web3': {
-                'rpcUrl': os.getenv('SEPOLIA_RPC_URL', 'https://sepolia.infura.io/v3/YOUR_INFURA_KEY'),
-                'privateKey': os.getenv('PRIVATE_KEY', ''),
-                'gasLimit': int(os.getenv('GAS_LIMIT', '500000')),
-                'gasPrice': os.getenv('GAS_PRICE', '20000000000')
-            },
-            'contracts': {
-                'agroToken': os.getenv('AGRO_TOKEN_ADDRESS', ''),
-                'agroCore': os.getenv('AGRO_CORE_ADDRESS', '')
-            },
-            'ipfs': {
-                'projectId': os.getenv('IPFS_PROJECT_ID', ''),
-                'projectSecret': os.getenv('IPFS_PROJECT_SECRET', ''),
-                'endpoint': os.getenv('IPFS_ENDPOINT', 'https://ipfs.infura.io:5001')
-            }
-        }
+        return load_config(config_path)
     
     def _initialize_web3(self) -> Web3:
         """Initialize Web3 connection"""
+        w3 = None
         try:
-            w3 = Web3(Web3.HTTPProvider(self.config['web3']['rpcUrl']))
+            w3 = Web3(PooledHTTPProvider(rpc_urls(self.config), **self.config['web3'].get('rpcPool', {})))
             
             # Add PoA middleware for testnets
             w3.middleware_onion.inject(geth_poa_middleware, layer=0)
@@ -70,6 +150,8 @@ class Web3Service:
             
         except Exception as e:
             logger.error(f"Failed to initialize Web3: {e}")
+            if w3 is not None:
+                w3.provider.close()
             raise
     
     def _load_account(self) -> Account:
@@ -92,26 +174,16 @@ class Web3Service:
         try:
             contracts = {}
             
-            # Load ABIs
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            config_dir = os.path.join(current_dir, '../../config')
-            
             # Load AgroAI Token contract
-            with open(os.path.join(config_dir, 'AgroAIToken-abi.json'), 'r') as f:
-                token_abi = json.load(f)
-            
             contracts['token'] = self.w3.eth.contract(
                 address=self.config['contracts']['agroToken'],
-                abi=token_abi
+                abi=load_abi('AgroAIToken')
             )
             
             # Load AgroAI Core contract
-            with open(os.path.join(config_dir, 'AgroAICore-abi.json'), 'r') as f:
-                core_abi = json.load(f)
-            
             contracts['core'] = self.w3.eth.contract(
                 address=self.config['contracts']['agroCore'],
-                abi=core_abi
+                abi=load_abi('AgroAICore')
             )
             
             logger.info("Smart contracts loaded successfully")
@@ -144,57 +216,156 @@ class Web3Service:
             logger.warning(f"Failed to initialize IPFS client: {e}")
             return None
     
+    def _initialize_pin_queue(self) -> PinQueue:
+        """Write-behind pinning: uploads return a local CID, IPFS catches up"""
+        ipfs_config = self.config['ipfs']
+        return PinQueue(
+            self._pin_file,
+            db_path=ipfs_config.get('pinDbPath', 'data/pins.db'),
+            spool_dir=ipfs_config.get('pinSpoolDir', 'data/pin_spool'),
+            cid_version=int(ipfs_config.get('cidVersion', 0)),
+            concurrency=int(ipfs_config.get('pinConcurrency', 4)),
+            max_attempts=int(ipfs_config.get('pinMaxAttempts', 8)),
+            stale_seconds=float(ipfs_config.get('pinStaleSeconds', 900))
+        )
+    
+    def _pin_file(self, path: str, cid_version: int) -> str:
+        """Add a spooled file to IPFS (pin queue worker); returns the node's CID"""
+        if self.ipfs_client is None:
+            self.ipfs_client = self._initialize_ipfs()
+            if self.ipfs_client is None:
+                raise ConnectionError("IPFS node not reachable")
+        return self.ipfs_client.add(path, **ipfs_add_options(cid_version))['Hash']
+    
+    def _initialize_reward_accumulator(self) -> Optional[RewardAccumulator]:
+        """Buffer upload rewards for batched settlement (requires batchRewardUploads)"""
+        if os.getenv('REWARD_BATCHING_ENABLED', 'false').lower() != 'true':
+            return None
+        
+        accumulator = RewardAccumulator(
+            self._settle_reward_batch,
+            is_settled_fn=self._is_reward_batch_settled,
+            db_path=os.getenv('REWARD_BATCH_DB_PATH', 'data/rewards.db'),
+            max_batch_size=int(os.getenv('REWARD_BATCH_MAX_SIZE', '100')),
+            flush_interval=float(os.getenv('REWARD_BATCH_INTERVAL_SECONDS', '60'))
+        )
+        logger.info("Reward batching enabled")
+        return accumulator
+    
     def upload_to_ipfs(self, file_data: bytes, filename: str = None) -> str:
-        """Upload file to IPFS and return hash"""
+        """Queue file for IPFS and return its CID (pinned in the background)"""
         try:
-            if self.ipfs_client:
-                result = self.ipfs_client.add(file_data)
-                ipfs_hash = result['Hash']
-                logger.info(f"File uploaded to IPFS: {ipfs_hash}")
-                return ipfs_hash
-            else:
-                # Fallback: generate deterministic hash
-                hash_obj = hashlib.sha256(file_data)
-                mock_hash = f"Qm{hash_obj.hexdigest()[:44]}"
-                logger.warning(f"IPFS not available, using mock hash: {mock_hash}")
-                return mock_hash
+            ipfs_hash = self.pin_queue.enqueue_stream(io.BytesIO(file_data), filename or '')
+            logger.info(f"File queued for IPFS: {ipfs_hash}")
+            return ipfs_hash
                 
         except Exception as e:
-            logger.error(f"Failed to upload to IPFS: {e}")
-            # Generate fallback hash
-            hash_obj = hashlib.sha256(file_data)
-            return f"Qm{hash_obj.hexdigest()[:44]}"
+            # Still the real CID, so the content can be pinned later by anyone
+            logger.error(f"Failed to queue file for IPFS: {e}")
+            return compute_cid(file_data, self.pin_queue.cid_version)
+    
+    def upload_stream_to_ipfs(self, stream, filename: str = None, cid: str = None) -> str:
+        """Queue a file object for IPFS; cid skips re-hashing and re-queueing duplicates"""
+        ipfs_hash = self.pin_queue.enqueue_stream(stream, filename or '', cid=cid)
+        logger.info(f"File queued for IPFS: {ipfs_hash}")
+        return ipfs_hash
+    
+    def _send_transaction(self, function, metadata: Optional[Dict[str, Any]] = None,
+                          callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Price with the fee engine (cached gas, EIP-1559 fees), sign with a
+        locally allocated nonce and send. The receipt is resolved in the
+        background by the receipt tracker; the returned status is 'pending'
+        unless WAIT_FOR_RECEIPTS is enabled.
+        """
+        tx_hash = self.fee_engine.send(function, self.nonce_manager)
+        
+        if not self.wait_for_receipts:
+            self.receipt_tracker.track(tx_hash, metadata, callback)
+            return {
+                'transaction_hash': tx_hash.hex(),
+                'status': STATUS_PENDING,
+                'gas_used': None
+            }
+        
+        # Wait on the tracker rather than the original hash, so a fee-bumped
+        # replacement still resolves the request
+        done = threading.Event()
+        final: Dict[str, Any] = {}
+        
+        def resolved(record: Dict[str, Any]):
+            final.update(record)
+            done.set()
+            if callback:
+                callback(record)
+        
+        self.receipt_tracker.track(tx_hash, metadata, resolved)
+        if not done.wait(120):
+            raise TimeoutError(f"Transaction {tx_hash.hex()} not mined after 120s")
+        return {
+            'transaction_hash': final['transaction_hash'],
+            'status': final['status'],
+            'gas_used': final['gas_used'],
+            'block_number': final['block_number']
+        }
+    
+    def get_transaction_status(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """Get a submitted transaction's status from the tracker or, if untracked, the chain"""
+        record = self.receipt_tracker.get(tx_hash)
+        if record:
+            return record
+        
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            receipt = None
+        if receipt:
+            return {
+                'transaction_hash': tx_hash,
+                'status': STATUS_CONFIRMED if receipt['status'] == 1 else STATUS_FAILED,
+                'block_number': receipt['blockNumber'],
+                'gas_used': receipt['gasUsed']
+            }
+        return None
     
-    def reward_photo_upload(self, user_address: str) -> Dict[str, Any]:
+    def _settle_reward_batch(self, batch_id: str, folded: FoldedBatch,
+                             callback: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Mint a folded reward batch in one transaction"""
+        users, photos, detections, early_detections = folded
+        function = self.contracts['token'].functions.batchRewardUploads(
+            bytes.fromhex(batch_id[2:]), users, photos, detections, early_detections
+        )
+        return self._send_transaction(
+            function, {'type': 'reward_batch', 'batch_id': batch_id, 'recipients': len(users)}, callback
+        )
+    
+    def _is_reward_batch_settled(self, batch_id: str) -> bool:
+        return self.contracts['token'].functions.settledBatches(bytes.fromhex(batch_id[2:])).call()
+    
+    def reward_photo_upload(self, user_address: str,
+                            callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Reward user for photo upload"""
         try:
-            # Build transaction
-            function = self.contracts['token'].functions.rewardPhotoUpload(user_address)
-            
-            # Estimate gas
-            gas_estimate = function.estimateGas({'from': self.account.address})
+            if self.reward_accumulator:
+                # Paid with the next batched settlement
+                return {
+                    'success': True,
+                    **self.reward_accumulator.add(user_address, REWARD_PHOTO, callback=callback)
+                }
             
             # Build transaction
-            transaction = function.buildTransaction({
-                'from': self.account.address,
-                'gas': gas_estimate,
-                'gasPrice': int(self.config['web3']['gasPrice']),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            function = self.contracts['token'].functions.rewardPhotoUpload(user_address)
             
-            # Wait for confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            # Sign and send; the receipt is tracked in the background
+            tx_result = self._send_transaction(
+                function, {'type': 'photo_reward', 'user_address': user_address}, callback
+            )
             
-            logger.info(f"Photo reward sent to {user_address}. Tx: {tx_hash.hex()}")
+            logger.info(f"Photo reward sent to {user_address}. Tx: {tx_result['transaction_hash']}")
             
             return {
                 'success': True,
-                'transaction_hash': tx_hash.hex(),
-                'gas_used': receipt['gasUsed'],
+                **tx_result,
                 'reward_amount': 5  # 5 AGRO tokens
             }
             
@@ -205,35 +376,35 @@ class Web3Service:
                 'error': str(e)
             }
     
-    def reward_disease_detection(self, user_address: str, is_early_detection: bool, disease: str) -> Dict[str, Any]:
+    def reward_disease_detection(self, user_address: str, is_early_detection: bool, disease: str,
+                                 callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Reward user for disease detection"""
         try:
+            if self.reward_accumulator:
+                kind = REWARD_EARLY_DETECTION if is_early_detection else REWARD_DISEASE
+                return {
+                    'success': True,
+                    **self.reward_accumulator.add(user_address, kind, disease, callback=callback),
+                    'disease': disease,
+                    'early_detection': is_early_detection
+                }
+            
             function = self.contracts['token'].functions.rewardDiseaseDetection(
                 user_address, 
                 is_early_detection, 
                 disease
             )
             
-            gas_estimate = function.estimateGas({'from': self.account.address})
-            
-            transaction = function.buildTransaction({
-                'from': self.account.address,
-                'gas': gas_estimate,
-                'gasPrice': int(self.config['web3']['gasPrice']),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            tx_result = self._send_transaction(
+                function, {'type': 'disease_reward', 'user_address': user_address, 'disease': disease}, callback
+            )
             
             reward_amount = 200 if is_early_detection else 100
             logger.info(f"Disease detection reward ({reward_amount} AGRO) sent to {user_address}")
             
             return {
                 'success': True,
-                'transaction_hash': tx_hash.hex(),
-                'gas_used': receipt['gasUsed'],
+                **tx_result,
                 'reward_amount': reward_amount,
                 'disease': disease,
                 'early_detection': is_early_detection
@@ -246,7 +417,8 @@ class Web3Service:
                 'error': str(e)
             }
     
-    def process_purchase(self, user_address: str, purchase_amount: float) -> Dict[str, Any]:
+    def process_purchase(self, user_address: str, purchase_amount: float,
+                         callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Process purchase with token discounts and cashback"""
         try:
             # Convert to wei (assuming purchase amount is in ETH equivalent)
@@ -254,33 +426,29 @@ class Web3Service:
             
             function = self.contracts['token'].functions.processPurchase(user_address, amount_wei)
             
-            gas_estimate = function.estimateGas({'from': self.account.address})
+            def with_amounts(record: Dict[str, Any]):
+                if record['status'] == STATUS_CONFIRMED:
+                    record.update(self._purchase_amounts(record.get('mined_hash') or record['transaction_hash']))
+                callback(record)
             
-            transaction = function.buildTransaction({
-                'from': self.account.address,
-                'gas': gas_estimate,
-                'gasPrice': int(self.config['web3']['gasPrice']),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            tx_result = self._send_transaction(
+                function, {'type': 'purchase', 'user_address': user_address, 'amount': purchase_amount},
+                with_amounts if callback else None
+            )
             
-            # Parse transaction logs to get discount and cashback amounts
-            # This would require parsing the event logs in production
-            discount = purchase_amount * 0.2  # 20% discount
-            cashback = purchase_amount * 0.1   # 10% cashback
+            # The applied discount and cashback are only known from the
+            # mined transaction's PurchaseProcessed event; None while pending
+            amounts = {'discount_applied': None, 'cashback_earned': None}
+            if tx_result['status'] == STATUS_CONFIRMED:
+                amounts.update(self._purchase_amounts(tx_result['transaction_hash']))
             
             logger.info(f"Purchase processed for {user_address}. Amount: {purchase_amount}")
             
             return {
                 'success': True,
-                'transaction_hash': tx_hash.hex(),
-                'gas_used': receipt['gasUsed'],
+                **tx_result,
                 'purchase_amount': purchase_amount,
-                'discount_applied': discount,
-                'cashback_earned': cashback
+                **amounts
             }
             
         except Exception as e:
@@ -290,10 +458,25 @@ class Web3Service:
                 'error': str(e)
             }
     
+    def _purchase_amounts(self, tx_hash: str) -> Dict[str, float]:
+        """Discount and cashback from a mined purchase's PurchaseProcessed event"""
+        receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        events = self.contracts['token'].events.PurchaseProcessed().process_receipt(receipt, errors=DISCARD)
+        if not events:
+            logger.warning(f"No PurchaseProcessed event in {tx_hash}")
+            return {}
+        args = events[0]['args']
+        return {
+            'discount_applied': float(self.w3.fromWei(args['discount'], 'ether')),
+            'cashback_earned': float(self.w3.fromWei(args['cashback'], 'ether'))
+        }
+    
     def get_user_stats(self, user_address: str) -> Dict[str, Any]:
         """Get user statistics from blockchain"""
         try:
-            stats = self.contracts['token'].functions.getUserStats(user_address).call()
+            stats = self.reads.read_one(
+                ('stats', user_address), self.contracts['token'].functions.getUserStats(user_address)
+            )
             
             return {
                 'token_balance': self.w3.fromWei(stats[0], 'ether'),
@@ -315,7 +498,10 @@ class Web3Service:
         """Calculate potential discount for purchase"""
         try:
             amount_wei = self.w3.toWei(purchase_amount, 'ether')
-            result = self.contracts['token'].functions.calculateDiscount(user_address, amount_wei).call()
+            result = self.reads.read_one(
+                ('discount', user_address, amount_wei),
+                self.contracts['token'].functions.calculateDiscount(user_address, amount_wei)
+            )
             
             return {
                 'discount_amount': self.w3.fromWei(result[0], 'ether'),
@@ -331,25 +517,17 @@ class Web3Service:
             }
     
     def request_chainlink_verification(self, backend_url: str, ipfs_hash: str, crop_type: str, 
-                                    location: str, latitude: str, longitude: str) -> Dict[str, Any]:
+                                    location: str, latitude: str, longitude: str,
+                                    callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Request Chainlink Functions verification"""
         try:
             function = self.contracts['core'].functions.requestPhotoAnalysis(
                 backend_url, ipfs_hash, crop_type, location, latitude, longitude
             )
             
-            gas_estimate = function.estimateGas({'from': self.account.address})
-            
-            transaction = function.buildTransaction({
-                'from': self.account.address,
-                'gas': gas_estimate,
-                'gasPrice': int(self.config['web3']['gasPrice']),
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            tx_result = self._send_transaction(
+                function, {'type': 'chainlink_verification', 'ipfs_hash': ipfs_hash}, callback
+            )
             
             # Extract request ID from logs
             request_id = "0x" + "0" * 64  # Placeholder - would parse from logs
@@ -358,9 +536,8 @@ class Web3Service:
             
             return {
                 'success': True,
-                'transaction_hash': tx_hash.hex(),
-                'request_id': request_id,
-                'gas_used': receipt['gasUsed']
+                **tx_result,
+                'request_id': request_id
             }
             
         except Exception as e:
@@ -390,7 +567,8 @@ class Web3Service:
                 'chain_id': self.w3.eth.chain_id,
                 'block_number': self.w3.eth.block_number,
                 'gas_price': self.w3.eth.gas_price,
-                'connected': self.w3.isConnected()
+                'connected': self.w3.isConnected(),
+                'rpc_endpoints': self.w3.provider.pool.get_stats()
             }
         except Exception as e:
             logger.error(f"Failed to get network info: {e}")
@@ -398,12 +576,16 @@ class Web3Service:
 
 # Singleton instance
 _web3_service = None
+_web3_service_lock = threading.Lock()
 
 def get_web3_service(config_path: str = None) -> Web3Service:
     """Get singleton Web3 service instance"""
     global _web3_service
     if _web3_service is None:
-        _web3_service = Web3Service(config_path)
+        # The bootstrap thread and a request may both get here first
+        with _web3_service_lock:
+            if _web3_service is None:
+                _web3_service = Web3Service(config_path)
     return _web3_service
 
 # Utility functions for easy import
@@ -0,0 +1,247 @@
+"""
+AgroAI Service Bootstrap
+Starts slow service initializations in the background and tracks their readiness
+
+Constructing the Web3, IPFS and AI services costs RPC round trips, an
+IPFS handshake and a model load. ServiceRegistry runs every registered
+factory on its own thread, so the app can bind its port straight away.
+Routes reach a service through get(), proxy() or the requires()
+decorator. Each waits a bounded time for the service and otherwise
+raises ServiceUnavailable, which the app answers with a 503 and a
+Retry-After header. A failed service is re-attempted in the background
+on the next request after retry_after seconds. Factories should raise
+rather than return a half-working service. A service can also register
+a check: while it answers False, readiness reports the service unhealthy
+(a node that went away after startup), though get() still returns it.
+"""
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_PENDING = 'pending'
+STATE_STARTING = 'starting'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+# Startup modes: background returns at once; parallel and sequential block
+# until every service has finished (sequential is the pre-bootstrap behaviour);
+# lazy starts each service on its first get(), for CLI tools and tests
+MODE_BACKGROUND = 'background'
+MODE_PARALLEL = 'parallel'
+MODE_SEQUENTIAL = 'sequential'
+MODE_LAZY = 'lazy'
+
+class ServiceUnavailable(Exception):
+    """A route needed a service that is still starting or failed to start"""
+
+    def __init__(self, name: str, state: str, error: Optional[str] = None, retry_after: int = 5):
+        self.name = name
+        self.state = state
+        self.error = error
+        self.retry_after = retry_after
+        detail = f": {error}" if error else ''
+        super().__init__(f"{name} service is {state}{detail}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'error': str(self),
+            'service': self.name,
+            'state': self.state,
+            'retry_after': self.retry_after
+        }
+
+class _Service:
+    """Registration and lifecycle record of one service"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], required: bool,
+                 check: Optional[Callable[[Any], bool]] = None):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.check = check
+        self.state = STATE_PENDING
+        self.instance = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+class ServiceProxy:
+    """Stand-in for a service instance that resolves it on first attribute access"""
+
+    def __init__(self, registry: 'ServiceRegistry', name: str):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        return f"<ServiceProxy {self._name}: {self._registry.state(self._name)}>"
+
+class ServiceRegistry:
+    """Concurrent service construction with per-service readiness"""
+
+    def __init__(self, wait_timeout: float = 5.0, retry_after: int = 5):
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._services: Dict[str, _Service] = {}
+        self._lock = threading.Lock()
+        self._created_at = time.perf_counter()
+
+    def register(self, name: str, factory: Callable[[], Any], required: bool = True,
+                 check: Optional[Callable[[Any], bool]] = None) -> 'ServiceRegistry':
+        """Add a service; required ones gate /api/ready, as does check(instance) once it is up"""
+        with self._lock:
+            self._services[name] = _Service(name, factory, required, check)
+        return self
+
+    def start(self, mode: str = MODE_BACKGROUND, names: Optional[Iterable[str]] = None) -> 'ServiceRegistry':
+        """Begin initializing every pending service, or only those in names"""
+        if mode == MODE_LAZY:
+            return self
+        with self._lock:
+            selected = self._services.values() if names is None else [self._services[n] for n in names]
+            pending = [s for s in selected if s.state == STATE_PENDING]
+            for service in pending:
+                service.state = STATE_STARTING
+
+        if mode == MODE_SEQUENTIAL:
+            for service in pending:
+                self._initialize(service)
+            return self
+
+        for service in pending:
+            threading.Thread(target=self._initialize, args=(service,),
+                             name=f'bootstrap-{service.name}', daemon=True).start()
+        if mode == MODE_PARALLEL:
+            self.wait()
+        return self
+
+    def _initialize(self, service: _Service):
+        service.attempts += 1
+        service.started_at = time.perf_counter()
+        try:
+            instance = service.factory()
+        except Exception as e:
+            logger.error(f"Service {service.name} failed to start: {e}")
+            with self._lock:
+                service.error = str(e)
+                service.state = STATE_FAILED
+        else:
+            with self._lock:
+                service.instance = instance
+                service.error = None
+                service.state = STATE_READY
+            logger.info(f"Service {service.name} ready in "
+                        f"{(time.perf_counter() - service.started_at) * 1000.0:.0f} ms")
+        finally:
+            service.finished_at = time.perf_counter()
+            service.done.set()
+
+    def _launch(self, service: _Service):
+        """Start a lazy service, or restart a failed one once its retry interval has passed"""
+        with self._lock:
+            if service.state == STATE_FAILED:
+                if time.perf_counter() - service.finished_at < self.retry_after:
+                    return
+            elif service.state != STATE_PENDING:
+                return
+            service.state = STATE_STARTING
+            service.done.clear()
+        threading.Thread(target=self._initialize, args=(service,),
+                         name=f'bootstrap-{service.name}', daemon=True).start()
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """The service instance, waiting up to timeout (default wait_timeout) for it"""
+        service = self._services[name]
+        if service.state in (STATE_PENDING, STATE_FAILED):
+            self._launch(service)
+        if service.state != STATE_READY:
+            service.done.wait(self.wait_timeout if timeout is None else timeout)
+        if service.state != STATE_READY:
+            raise ServiceUnavailable(name, service.state, service.error, self.retry_after)
+        return service.instance
+
+    def peek(self, name: str) -> Any:
+        """The instance if ready, otherwise None; never waits"""
+        service = self._services[name]
+        return service.instance if service.state == STATE_READY else None
+
+    def proxy(self, name: str) -> ServiceProxy:
+        return ServiceProxy(self, name)
+
+    def requires(self, *names: str):
+        """Route decorator: raise ServiceUnavailable before the handler runs"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                for name in names:
+                    self.get(name)
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def state(self, name: str) -> str:
+        return self._services[name].state
+
+    def _healthy(self, service: _Service) -> bool:
+        if service.state != STATE_READY:
+            return False
+        if service.check is None:
+            return True
+        try:
+            return bool(service.check(service.instance))
+        except Exception as e:
+            logger.warning(f"Health check of {service.name} failed: {e}")
+            return False
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """One service, or every required service when name is None: started and passing its check"""
+        if name is not None:
+            return self._healthy(self._services[name])
+        return all(self._healthy(s) for s in list(self._services.values()) if s.required)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every started service has finished starting (ready or failed)"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for service in list(self._services.values()):
+            if service.state == STATE_PENDING:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not service.done.wait(remaining):
+                return False
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        services: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for service in self._services.values():
+                elapsed = None
+                if service.started_at is not None:
+                    end = service.finished_at if service.done.is_set() else time.perf_counter()
+                    elapsed = round((end - service.started_at) * 1000.0, 3)
+                services[service.name] = {
+                    'state': service.state,
+                    'required': service.required,
+                    'attempts': service.attempts,
+                    'elapsed_ms': elapsed,
+                    'error': service.error
+                }
+        # Checks may touch the network, so they run outside the lock
+        for service in list(self._services.values()):
+            services[service.name]['healthy'] = self._healthy(service)
+        return {
+            'ready': all(s['healthy'] for s in services.values() if s['required']),
+            'uptime_seconds': round(time.perf_counter() - self._created_at, 3),
+            'services': services
+        }
@@ -0,0 +1,59 @@
+"""
+AgroAI Job Worker
+Runs background jobs from the Redis queue in a process of its own
+
+Usage:
+    python -m backend.job_worker [--app enhanced_backend_complete:services] [--workers 4]
+    python -m backend.job_worker --app backend.routes.enhanced_detection:services
+
+--app names the module that registers the job handlers and the service
+registry that holds its 'jobs' queue. The module is imported in lazy
+bootstrap mode with in-process job workers disabled, so a worker
+process starts only the services its jobs touch and never binds a port.
+Run as many of these as the queue needs. Web processes can then set
+JOB_WORKERS=0 and only enqueue. Workers read uploaded images from the
+blob store, so they need the web processes' REDIS_URL and BLOB_STORE_DIR.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import signal
+import sys
+import threading
+
+from backend.jobs import BACKEND_REDIS
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--app', default='enhanced_backend_complete:services')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKER_THREADS', '4')))
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    os.environ['SERVICE_BOOTSTRAP_MODE'] = 'lazy'
+    os.environ['JOB_WORKERS'] = '0'
+    module_name, _, registry_name = args.app.partition(':')
+    registry = getattr(importlib.import_module(module_name), registry_name or 'services')
+
+    jobs = registry.get('jobs', timeout=args.startup_timeout)
+    if jobs.backend != BACKEND_REDIS:
+        # An in-process queue is only visible to the web process that owns it
+        logger.error("Job queue has no Redis connection; nothing to consume")
+        sys.exit(1)
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    jobs.start(args.workers)
+    logger.info(f"Job worker running {args.workers} thread(s) for {', '.join(jobs.get_stats()['kinds'])}")
+    stopping.wait()
+    logger.info("Job worker stopping; running jobs finish first")
+    jobs.stop(timeout=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+AgroAI Job Queue
+Background jobs for work that outlives an HTTP request, on Redis or in-process
+
+Routes call enqueue(kind, payload) and return 202 with the job id.
+Clients poll get(job_id). With a Redis client, job ids go on a Redis
+list and records are JSON strings with a TTL. Any process that imports
+the app and calls start() takes jobs from the list, so workers scale
+separately from web processes (see job_worker.py). A job is moved
+atomically to a processing list while it runs. A worker that dies
+mid-job leaves it there, and it is reclaimed after stale_seconds.
+Without Redis, jobs go on an in-process queue served by this process's
+worker threads, and records live in a bounded in-memory table.
+
+Payloads and results must be JSON-serialisable. Handlers that send
+transactions are not idempotent, so by default each kind runs at most
+once; pass max_attempts to register() for kinds that are safe to repeat.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+BACKEND_REDIS = 'redis'
+BACKEND_LOCAL = 'local'
+
+class JobQueue:
+    """Named job handlers run by worker threads from a Redis or in-process queue"""
+
+    def __init__(self, redis_client=None, prefix: str = 'agroai:jobs', result_ttl: int = 86400,
+                 stale_seconds: float = 900.0, poll_timeout: int = 1, max_local_records: int = 10000):
+        self.redis_client = redis_client
+        self.backend = BACKEND_REDIS if redis_client is not None else BACKEND_LOCAL
+        self.prefix = prefix
+        self.result_ttl = int(result_ttl)
+        self.stale_seconds = stale_seconds
+        self.poll_timeout = poll_timeout
+        self.max_local_records = max_local_records
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._max_attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local_queue: 'queue.Queue[str]' = queue.Queue()
+        self._local_records: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._last_reclaim = 0.0
+        self._counters = {'enqueued': 0, 'succeeded': 0, 'failed': 0, 'retried': 0, 'reclaimed': 0}
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @property
+    def _queue_key(self) -> str:
+        return f"{self.prefix}:queue"
+
+    @property
+    def _processing_key(self) -> str:
+        return f"{self.prefix}:processing"
+
+    def _save(self, record: Dict[str, Any]):
+        record['updated_at'] = time.time()
+        if self.backend == BACKEND_REDIS:
+            self.redis_client.set(self._key(record['id']), json.dumps(record), ex=self.result_ttl)
+            return
+        with self._lock:
+            self._local_records[record['id']] = dict(record)
+            self._local_records.move_to_end(record['id'])
+            while len(self._local_records) > self.max_local_records:
+                self._local_records.popitem(last=False)
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.backend == BACKEND_REDIS:
+            raw = self.redis_client.get(self._key(job_id))
+            return json.loads(raw) if raw else None
+        with self._lock:
+            record = self._local_records.get(job_id)
+        if record is not None and time.time() - record['updated_at'] > self.result_ttl:
+            return None
+        return dict(record) if record is not None else None
+
+    def _push(self, job_id: str):
+        if self.backend == BACKEND_REDIS:
+            self.redis_client.lpush(self._queue_key, job_id)
+        else:
+            self._local_queue.put(job_id)
+
+    def _pop(self) -> Optional[str]:
+        if self.backend == BACKEND_REDIS:
+            # Atomic hand-over, so a job is never only in this process's memory
+            return self.redis_client.brpoplpush(self._queue_key, self._processing_key, self.poll_timeout)
+        try:
+            return self._local_queue.get(timeout=self.poll_timeout)
+        except queue.Empty:
+            return None
+
+    def _ack(self, job_id: str):
+        if self.backend == BACKEND_REDIS:
+            self.redis_client.lrem(self._processing_key, 1, job_id)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any],
+                 max_attempts: int = 1) -> 'JobQueue':
+        """handler(payload) returns the job result; raising fails (or retries) the job"""
+        self._handlers[kind] = handler
+        self._max_attempts[kind] = max(1, int(max_attempts))
+        return self
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind}")
+        now = time.time()
+        record = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': JOB_QUEUED,
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'attempts': 0,
+            'worker': None,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None
+        }
+        self._save(record)
+        self._push(record['id'])
+        self._count('enqueued')
+        return record['id']
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job record without its payload, or None if unknown or expired"""
+        record = self._load(job_id)
+        if record is not None:
+            record.pop('payload', None)
+        return record
+
+    def start(self, workers: int = 2) -> 'JobQueue':
+        """Run jobs on worker threads in this process; 0 only enqueues"""
+        if not self._threads and workers > 0:
+            self._running = True
+            for index in range(workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self):
+        worker = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        while self._running:
+            try:
+                self._reclaim_stale()
+                job_id = self._pop()
+            except Exception as e:
+                logger.error(f"Job queue unavailable: {e}")
+                time.sleep(self.poll_timeout)
+                continue
+            if job_id is not None:
+                try:
+                    self._execute(job_id, worker)
+                except Exception as e:
+                    # Left on the processing list; reclaimed once stale
+                    logger.error(f"Job {job_id} could not be settled: {e}")
+
+    def _execute(self, job_id: str, worker: str):
+        record = self._load(job_id)
+        if record is None or record['status'] != JOB_QUEUED:
+            # Expired, or already handled by a reclaim race
+            self._ack(job_id)
+            return
+
+        record.update(status=JOB_RUNNING, worker=worker, started_at=time.time(),
+                      attempts=record['attempts'] + 1)
+        self._save(record)
+        try:
+            handler = self._handlers[record['kind']]
+            result = handler(record['payload'])
+        except Exception as e:
+            self._fail(record, str(e))
+        else:
+            record.update(status=JOB_SUCCEEDED, result=result, error=None, finished_at=time.time())
+            self._save(record)
+            self._count('succeeded')
+            logger.info(f"Job {job_id} ({record['kind']}) succeeded in "
+                        f"{(record['finished_at'] - record['started_at']) * 1000.0:.0f} ms")
+        self._ack(job_id)
+
+    def _fail(self, record: Dict[str, Any], error: str):
+        if record['attempts'] < self._max_attempts.get(record['kind'], 1):
+            record.update(status=JOB_QUEUED, error=error)
+            self._save(record)
+            self._push(record['id'])
+            self._count('retried')
+            logger.warning(f"Job {record['id']} ({record['kind']}) attempt {record['attempts']} "
+                           f"failed, requeued: {error}")
+            return
+        record.update(status=JOB_FAILED, error=error, finished_at=time.time())
+        self._save(record)
+        self._count('failed')
+        logger.error(f"Job {record['id']} ({record['kind']}) failed: {error}")
+
+    def _reclaim_stale(self):
+        """Settle jobs left on the processing list by workers that died mid-job"""
+        if self.backend != BACKEND_REDIS or time.time() - self._last_reclaim < self.stale_seconds / 4:
+            return
+        self._last_reclaim = time.time()
+        for job_id in self.redis_client.lrange(self._processing_key, 0, -1):
+            record = self._load(job_id)
+            if record is None:
+                self._ack(job_id)
+                continue
+            if record['status'] != JOB_RUNNING or time.time() - record['updated_at'] < self.stale_seconds:
+                continue
+            if self.redis_client.lrem(self._processing_key, 1, job_id):
+                # Only the worker that removed it settles it
+                self._count('reclaimed')
+                self._fail(record, f"Worker {record['worker']} stopped during the job")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            records = len(self._local_records)
+        stats = {
+            'backend': self.backend,
+            'workers': len(self._threads),
+            'kinds': sorted(self._handlers),
+            **counters
+        }
+        if self.backend == BACKEND_REDIS:
+            try:
+                stats['queued'] = self.redis_client.llen(self._queue_key)
+                stats['processing'] = self.redis_client.llen(self._processing_key)
+            except Exception as e:
+                stats['error'] = str(e)
+        else:
+            stats['queued'] = self._local_queue.qsize()
+            stats['records'] = records
+        return stats
+
+def wants_async(req, form=None) -> bool:
+    """
+    Whether a Flask request asked for a 202 and a job id instead of waiting;
+    pass form when the view parsed the body itself
+    """
+    if 'respond-async' in req.headers.get('Prefer', ''):
+        return True
+    value = req.args.get('async') or (req.form if form is None else form).get('async', '')
+    return str(value).lower() in ('1', 'true', 'yes')
@@ -0,0 +1,56 @@
+"""
+AgroAI Lazy Imports
+Module facade that defers importing heavy dependencies until first attribute access
+
+torch, cv2, web3 and friends cost seconds to import. lazy_import('torch')
+returns a stand-in module straight away and performs the real import
+the first time an attribute is read. After that it forwards to the
+real module. Modules that are already imported are returned as-is. Use
+it only for names that are touched inside functions; annotations and
+base classes are evaluated at definition time and would defeat it.
+"""
+
+import importlib
+import sys
+import threading
+import types
+
+_import_lock = threading.RLock()
+
+class LazyModule(types.ModuleType):
+    """Placeholder that imports the named module on first use"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with _import_lock:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module if already imported, otherwise a LazyModule for it"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+def is_loaded(name: str) -> bool:
+    """Whether the real module has been imported yet"""
+    return name in sys.modules
@@ -0,0 +1,207 @@
+"""
+AgroAI Stage Graph
+Runs a request's pipeline stages concurrently, joining only where one stage needs another's result
+
+A stage is a named callable plus the names of the stages it depends on.
+It is called with its dependencies' results as keyword arguments, as
+soon as all of them have finished. Independent stages, such as the IPFS
+upload and inference, run side by side on the shared executor. The
+request thread only schedules stages and waits. A failed stage skips its
+dependents but not unrelated stages; run.result(name) raises the failure
+for the caller to handle. Per-stage start and elapsed times are
+recorded, so a response can show that its latency is the critical path
+rather than the sum of the stages. A thread cannot be interrupted, so a
+stage still running at the timeout is abandoned, not stopped; inputs it
+reads must stay open until it returns (see run's cleanup argument).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+STAGE_SKIPPED = 'skipped'
+
+class StageSkipped(RuntimeError):
+    """A stage did not run because a stage it depends on failed"""
+
+class PipelineRun:
+    """Results, errors and timings of one StageGraph.run()"""
+
+    def __init__(self, deps: Dict[str, Tuple[str, ...]]):
+        self.deps = deps
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.status: Dict[str, str] = {}
+        self.started: Dict[str, float] = {}
+        self.finished: Dict[str, float] = {}
+        self.total_ms = 0.0
+
+    def result(self, name: str) -> Any:
+        """A stage's return value; re-raises its error, or StageSkipped"""
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results[name]
+
+    def critical_path(self) -> List[str]:
+        """The dependency chain ending at the last stage to finish"""
+        if not self.finished:
+            return []
+        path = [max(self.finished, key=self.finished.get)]
+        while True:
+            deps = [dep for dep in self.deps[path[-1]] if dep in self.finished]
+            if not deps:
+                return list(reversed(path))
+            path.append(max(deps, key=self.finished.get))
+
+    def timings(self) -> Dict[str, Any]:
+        stages = {}
+        for name in self.deps:
+            if name in self.finished:
+                stages[name] = {
+                    'status': self.status[name],
+                    'start_ms': round(self.started[name] * 1000.0, 3),
+                    'elapsed_ms': round((self.finished[name] - self.started[name]) * 1000.0, 3)
+                }
+            else:
+                # Skipped, or abandoned at the timeout before it returned
+                stages[name] = {'status': self.status.get(name, STAGE_SKIPPED)}
+        return {
+            'total_ms': round(self.total_ms, 3),
+            'sum_ms': round(sum(s.get('elapsed_ms', 0.0) for s in stages.values()), 3),
+            'critical_path': self.critical_path(),
+            'stages': stages
+        }
+
+class StageGraph:
+    """Named stages with explicit dependencies, run concurrently where independent"""
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...], bool]] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], after: Sequence[str] = (),
+            no_timeout: bool = False) -> 'StageGraph':
+        """
+        Add a stage; dependencies must already be added, so the graph cannot
+        cycle. no_timeout marks a stage whose effect cannot be abandoned
+        (it sends a transaction): once started, run() waits for its outcome
+        past the timeout instead of reporting it failed.
+        """
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [dep for dep in after if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stage(s): {', '.join(missing)}")
+        self._stages[name] = (fn, tuple(after), no_timeout)
+        return self
+
+    def run(self, timeout: Optional[float] = None,
+            cleanup: Optional[Callable[[], None]] = None) -> PipelineRun:
+        """
+        Run every stage and wait for all of them. timeout bounds the graph,
+        except no_timeout stages already running; stages not yet started
+        are skipped once it passes. cleanup (closing the inputs the stages
+        read) runs after every started stage has returned, including ones
+        abandoned at the timeout, which may be after run() returns.
+        """
+        run = PipelineRun({name: deps for name, (_, deps, _) in self._stages.items()})
+        origin = time.perf_counter()
+        deadline = None if timeout is None else origin + timeout
+        waiting = dict(self._stages)
+        pending: Dict[Future, str] = {}
+        abandoned: List[Future] = []
+        timed_out = False
+
+        def call(name: str, fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+            run.started[name] = time.perf_counter() - origin
+            try:
+                return fn(**kwargs)
+            finally:
+                run.finished[name] = time.perf_counter() - origin
+
+        def skip(name: str, reason: str):
+            run.status[name] = STAGE_SKIPPED
+            run.errors[name] = StageSkipped(f"{name} skipped: {reason}")
+
+        def schedule():
+            for name, (fn, deps, _) in list(waiting.items()):
+                if timed_out:
+                    del waiting[name]
+                    skip(name, 'pipeline timed out')
+                elif any(run.status.get(dep) in (STAGE_FAILED, STAGE_SKIPPED) for dep in deps):
+                    del waiting[name]
+                    skip(name, 'a dependency failed')
+                elif all(run.status.get(dep) == STAGE_DONE for dep in deps):
+                    del waiting[name]
+                    kwargs = {dep: run.results[dep] for dep in deps}
+                    pending[self.executor.submit(call, name, fn, kwargs)] = name
+
+        try:
+            schedule()
+            while pending:
+                remaining = None
+                if deadline is not None and not timed_out:
+                    remaining = max(0.0, deadline - time.perf_counter())
+                done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    timed_out = True
+                    for future, name in list(pending.items()):
+                        if future.cancel():
+                            # Still queued on the executor: it never runs
+                            del pending[future]
+                            skip(name, 'pipeline timed out')
+                        elif not self._stages[name][2]:
+                            # A running thread cannot be stopped; it is
+                            # reported failed and its dependents never start
+                            del pending[future]
+                            abandoned.append(future)
+                            run.status[name] = STAGE_FAILED
+                            run.errors[name] = TimeoutError(f"{name} did not finish within {timeout}s")
+                        # else: no_timeout and running; keep waiting for its outcome
+                    schedule()
+                    continue
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        run.results[name] = future.result()
+                        run.status[name] = STAGE_DONE
+                    except Exception as e:
+                        logger.warning(f"Pipeline stage {name} failed: {e}")
+                        run.errors[name] = e
+                        run.status[name] = STAGE_FAILED
+                schedule()
+        finally:
+            run.total_ms = (time.perf_counter() - origin) * 1000.0
+            if cleanup is not None:
+                _when_all_done(abandoned + list(pending), cleanup)
+        return run
+
+def _when_all_done(futures: List[Future], fn: Callable[[], None]):
+    """Call fn now, or from whichever of futures finishes last"""
+    def call():
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f"Pipeline cleanup failed: {e}")
+
+    if not futures:
+        call()
+        return
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            call()
+
+    for future in futures:
+        future.add_done_callback(finished)
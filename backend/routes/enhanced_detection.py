@@ -5,9 +5,12 @@ Extends your existing Flask detection route with Web3 functionality
 
 from flask import Blueprint, request, jsonify, current_app
 import os
+import hmac
 import logging
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from typing import Dict, Any, Optional
 from werkzeug.utils import secure_filename
 
@@ -16,6 +19,16 @@ from werkzeug.utils import secure_filename
 
 # Import blockchain services
 from ..blockchain.web3_service import get_web3_service, upload_to_ipfs
+from ..blockchain.receipt_tracker import WebhookRejected, validate_webhook_url, webhook_callback
+from ..bootstrap import ServiceRegistry, ServiceUnavailable
+from ..jobs import JOB_QUEUED, JobQueue, wants_async
+from ..lazy import lazy_import
+from ..pipeline import STAGE_FAILED, StageGraph
+from ..storage.blob_store import BlobStore
+from ..storage.multipart import read_upload_form
+from ..storage.uploads import UnsupportedFileType, UploadRejected, UploadTooLarge
+
+redis = lazy_import('redis')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,9 +37,36 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 enhanced_detection_bp = Blueprint('enhanced_detection', __name__)
 
+# Web3Service connects in the background once the blueprint is registered,
+# instead of on (and inside) the first request that needs it
+services = ServiceRegistry(
+    wait_timeout=float(os.getenv('SERVICE_WAIT_TIMEOUT', '5')),
+    retry_after=int(os.getenv('SERVICE_RETRY_AFTER', '5'))
+)
+services.register('web3', get_web3_service, check=lambda service: service.is_connected())
+# Images and predictions by CID for /verify-disease
+services.register('blobs', lambda: BlobStore(os.getenv('BLOB_STORE_DIR', 'data/blobs')), required=False)
+# Background jobs for async /detect-enhanced; handlers are defined below
+services.register('jobs', lambda: create_job_queue(), required=False)
+
+@enhanced_detection_bp.record_once
+def start_services(state):
+    services.start()
+
 # Configuration
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+# Formats accepted by content, whatever the extension says
+ALLOWED_IMAGE_TYPES = {'png', 'jpeg', 'gif', 'bmp', 'tiff'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+# File plus the other multipart form fields
+MAX_REQUEST_SIZE = MAX_FILE_SIZE + 64 * 1024
+CID_VERSION = int(os.getenv('IPFS_CID_VERSION', '0'))
+
+# Stage threads for /detect-enhanced (IPFS, inference and reward transactions)
+pipeline_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PIPELINE_WORKERS', '16')), thread_name_prefix='detect-pipeline'
+)
+PIPELINE_TIMEOUT = float(os.getenv('PIPELINE_TIMEOUT_SECONDS', '30'))
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -98,57 +138,109 @@ def detect_disease_enhanced():
     Extends your existing detection with Web3 features
     """
     try:
+        # The body is parsed as it arrives, and the upload goes straight
+        # into the buffer: magic bytes, size cap, SHA-256 and CID are all
+        # settled in this one pass. A declared Content-Length over the cap
+        # is refused before reading, and a chunked body when it passes it.
+        try:
+            form, upload = read_upload_form(
+                request.environ, 'file', MAX_REQUEST_SIZE,
+                max_size=MAX_FILE_SIZE, allowed_types=ALLOWED_IMAGE_TYPES, cid_version=CID_VERSION
+            )
+        except UploadTooLarge:
+            return jsonify({'error': 'File too large'}), 400
+        except UnsupportedFileType:
+            return jsonify({'error': 'File type not allowed'}), 400
+        except UploadRejected as e:
+            return jsonify({'error': str(e)}), 400
+        except ValueError as e:
+            return jsonify({'error': f'Malformed multipart body: {e}'}), 400
+        
         # Validate request
-        if 'file' not in request.files:
+        if upload is None:
             return jsonify({'error': 'No file provided'}), 400
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed'}), 400
+        error = None
+        if upload.filename == '':
+            error = 'No file selected'
+        elif not allowed_file(upload.filename):
+            error = 'File type not allowed'
         
         # Get optional parameters
-        user_wallet = request.form.get('wallet_address', '')
-        crop_type = request.form.get('crop_type', 'unknown')
-        location = request.form.get('location', 'unknown')
-        latitude = request.form.get('latitude', '0')
-        longitude = request.form.get('longitude', '0')
-        
-        # Read file data
-        file_data = file.read()
-        if len(file_data) > MAX_FILE_SIZE:
-            return jsonify({'error': 'File too large'}), 400
-        
-        # Reset file pointer for your existing detection function
-        file.seek(0)
+        user_wallet = form.get('wallet_address', '')
+        crop_type = form.get('crop_type', 'unknown')
+        location = form.get('location', 'unknown')
+        latitude = form.get('latitude', '0')
+        longitude = form.get('longitude', '0')
+        callback_url = form.get('callback_url', '')
+        if callback_url and error is None:
+            try:
+                validate_webhook_url(callback_url)
+            except WebhookRejected as e:
+                error = str(e)
+        if error is not None:
+            upload.close()
+            return jsonify({'error': error}), 400
         
         logger.info(f"Processing enhanced detection for user: {user_wallet}")
         
-        # Step 1: Upload to IPFS
-        ipfs_hash = None
-        try:
-            web3_service = get_web3_service()
-            ipfs_hash = web3_service.upload_to_ipfs(file_data, file.filename)
-            logger.info(f"Image uploaded to IPFS: {ipfs_hash}")
-        except Exception as e:
-            logger.warning(f"IPFS upload failed: {e}")
-            # Continue without IPFS - use fallback hash
-            import hashlib
-            ipfs_hash = f"Qm{hashlib.sha256(file_data).hexdigest()[:44]}"
+        # Detection never waits for the blockchain; while Web3Service is still
+        # starting the photo gets a fallback hash and no on-chain rewards
+        web3_service = services.peek('web3')
+        # Async mode answers 202 after detection and leaves IPFS and the
+        # transactions to a background job
+        async_mode = wants_async(request, form)
+        chain_ready = (not async_mode and bool(user_wallet) and web3_service is not None
+                       and web3_service.is_connected())
+        # Request-bound values are read here; stages run on pipeline threads
+        verification = {
+            'backend_url': request.host_url.rstrip('/'),
+            'crop_type': crop_type,
+            'location': location,
+            'latitude': latitude,
+            'longitude': longitude
+        } if current_app.config.get('ENABLE_CHAINLINK_VERIFICATION', False) else None
+        jobs = services.get('jobs') if async_mode else None
+        blob_store = services.get('blobs') if async_mode else services.peek('blobs')
         
-        # Step 2: Run your existing AI detection
-        # Replace this with your actual detection function
-        ai_result = run_existing_ai_detection(file)
+        def store_blob(ai):
+            # Keep the image and result so Chainlink verification is a lookup
+            # (and, in async mode, so the job can read the image)
+            if blob_store is not None:
+                try:
+                    blob_store.put_stream(upload.cid, upload.reader())
+                    blob_store.set_prediction(upload.cid, ai)
+                except Exception as e:
+                    if async_mode:
+                        raise
+                    logger.warning(f"Failed to store blob {upload.cid}: {e}")
         
-        # Step 3: Calculate blockchain rewards
-        reward_info = calculate_token_reward(ai_result)
+        # Inference and the IPFS upload run side by side. Both reward
+        # transactions wait only for a successful detection and go out
+        # together; Chainlink verification needs only the CID.
+        graph = (StageGraph(pipeline_executor)
+                 # Replace run_existing_ai_detection with your actual detection function
+                 .add('ai', lambda: run_existing_ai_detection(upload.reader()))
+                 .add('blob_store', store_blob, after=('ai',))
+                 .add('rewards', lambda ai: calculate_token_reward(ai), after=('ai',))
+                 .add('community_alert', lambda ai: should_trigger_community_alert(ai, location), after=('ai',)))
+        if not async_mode:
+            graph.add('ipfs', lambda: upload_image_to_ipfs(web3_service, upload.reader(), upload.filename, upload.cid))
+        if chain_ready:
+            # Transactions confirm in the background; optionally POST each
+            # final status to the caller's webhook
+            callback = webhook_callback(callback_url) if callback_url else None
+            add_reward_stages(graph, web3_service, user_wallet, callback, verification)
         
-        # Step 4: Check for community alerts
-        alert_info = should_trigger_community_alert(ai_result, location)
+        # Stages abandoned at the timeout may still be reading the upload
+        run = graph.run(timeout=PIPELINE_TIMEOUT, cleanup=upload.close)
         
-        # Step 5: Prepare enhanced result
+        ai_result = run.result('ai')
+        ipfs_hash = upload.cid if async_mode else run.result('ipfs')
+        reward_info = run.result('rewards')
+        alert_info = run.result('community_alert')
+        
+        # Prepare enhanced result
         enhanced_result = {
             # Your existing AI results
             'disease': ai_result.get('disease', 'Unknown'),
@@ -173,42 +265,34 @@ def detect_disease_enhanced():
                     'latitude': float(latitude) if latitude != '0' else None,
                     'longitude': float(longitude) if longitude != '0' else None
                 },
-                'file_size': len(file_data),
-                'filename': secure_filename(file.filename)
-            }
+                'file_size': upload.size,
+                'content_type': upload.content_type,
+                'sha256': upload.sha256,
+                'filename': secure_filename(upload.filename)
+            },
+            
+            'timings': run.timings()
         }
         
-        # Step 6: Process blockchain rewards (if wallet provided)
-        if user_wallet and web3_service.is_connected():
-            try:
-                # Award photo upload reward
-                photo_reward_result = web3_service.reward_photo_upload(user_wallet)
-                enhanced_result['blockchain']['photo_reward'] = photo_reward_result
-                
-                # Award disease detection bonus if applicable
-                if reward_info['bonus_reward'] > 20:  # More than healthy plant bonus
-                    disease_reward_result = web3_service.reward_disease_detection(
-                        user_wallet,
-                        reward_info['is_early_detection'],
-                        ai_result.get('disease', 'Unknown')
-                    )
-                    enhanced_result['blockchain']['disease_reward'] = disease_reward_result
-                
-                # Request Chainlink verification (optional)
-                if ipfs_hash and current_app.config.get('ENABLE_CHAINLINK_VERIFICATION', False):
-                    backend_url = request.host_url.rstrip('/')
-                    verification_result = web3_service.request_chainlink_verification(
-                        backend_url, ipfs_hash, crop_type, location, latitude, longitude
-                    )
-                    enhanced_result['blockchain']['chainlink_verification'] = verification_result
-                
-                logger.info(f"Blockchain rewards processed for {user_wallet}")
-                
-            except Exception as e:
-                logger.error(f"Blockchain reward processing failed: {e}")
-                enhanced_result['blockchain']['reward_error'] = str(e)
+        if async_mode:
+            run.result('blob_store')
+            job_id = jobs.enqueue('detect_enhanced_chain', {
+                'cid': upload.cid,
+                'filename': upload.filename,
+                'user_wallet': user_wallet,
+                'ai_result': ai_result,
+                'rewards': reward_info,
+                'verification': verification,
+                'callback_url': callback_url
+            })
+            status_url = f"{request.script_root}{request.path.rsplit('/', 1)[0]}/jobs/{job_id}"
+            enhanced_result['job'] = {'id': job_id, 'status': JOB_QUEUED, 'status_url': status_url}
+        elif chain_ready:
+            # Blockchain rewards (if wallet provided)
+            collect_reward_results(run, enhanced_result['blockchain'])
+            logger.info(f"Blockchain rewards processed for {user_wallet}")
         
-        # Step 7: Log analytics (for future insights)
+        # Log analytics (for future insights)
         analytics_data = {
             'timestamp': time.time(),
             'user_wallet': user_wallet,
@@ -223,8 +307,16 @@ def detect_disease_enhanced():
         # Save analytics (implement based on your needs)
         save_analytics_data(analytics_data)
         
+        if async_mode:
+            response = jsonify(enhanced_result)
+            response.status_code = 202
+            response.headers['Location'] = enhanced_result['job']['status_url']
+            return response
         return jsonify(enhanced_result)
         
+    except ServiceUnavailable:
+        # Async mode needs the job queue and blob store; answered as 503
+        raise
     except Exception as e:
         logger.error(f"Enhanced detection failed: {e}")
         return jsonify({
@@ -236,6 +328,109 @@ def detect_disease_enhanced():
             }
         }), 500
 
+def upload_image_to_ipfs(web3_service, stream, filename: str, cid: str) -> str:
+    """IPFS hash of the image; the locally computed CID if the upload fails"""
+    # A duplicate is recognised by CID and not re-spooled
+    try:
+        if web3_service is None:
+            raise ServiceUnavailable('web3', services.state('web3'))
+        ipfs_hash = web3_service.upload_stream_to_ipfs(stream, filename, cid=cid)
+        logger.info(f"Image uploaded to IPFS: {ipfs_hash}")
+        return ipfs_hash
+    except Exception as e:
+        logger.warning(f"IPFS upload failed: {e}")
+        # Continue without IPFS - the locally computed CID is still the real one
+        return cid
+
+REWARD_STAGES = ('photo_reward', 'disease_reward', 'chainlink_verification')
+
+def add_reward_stages(graph: StageGraph, web3_service, user_wallet: str, callback=None,
+                      verification: Optional[Dict[str, str]] = None) -> StageGraph:
+    """
+    Reward transactions after the graph's 'ai' and 'rewards' stages, and
+    Chainlink verification (request_chainlink_verification arguments in
+    verification) after its 'ipfs' stage. They send transactions, so they
+    are exempt from the pipeline timeout once started.
+    """
+    def disease_reward(rewards, ai):
+        # Only when more than the healthy plant bonus
+        if rewards['bonus_reward'] > 20:
+            return web3_service.reward_disease_detection(
+                user_wallet, rewards['is_early_detection'], ai.get('disease', 'Unknown'), callback=callback
+            )
+        return None
+    
+    graph.add('photo_reward', lambda ai: web3_service.reward_photo_upload(user_wallet, callback=callback),
+              after=('ai',), no_timeout=True)
+    graph.add('disease_reward', disease_reward, after=('rewards', 'ai'), no_timeout=True)
+    if verification is not None:
+        graph.add('chainlink_verification', lambda ipfs: web3_service.request_chainlink_verification(
+            ipfs_hash=ipfs, callback=callback, **verification
+        ), after=('ipfs',), no_timeout=True)
+    return graph
+
+def collect_reward_results(run, blockchain: Dict[str, Any]):
+    """Copy reward stage results, or the first failure as reward_error, into blockchain"""
+    for stage in REWARD_STAGES:
+        if run.status.get(stage) == STAGE_FAILED:
+            logger.error(f"Blockchain {stage} failed: {run.errors[stage]}")
+            blockchain.setdefault('reward_error', str(run.errors[stage]))
+        elif run.results.get(stage) is not None:
+            blockchain[stage] = run.results[stage]
+
+def run_chain_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job: IPFS upload, reward transactions and Chainlink request of an async detection"""
+    web3_service = services.get('web3')
+    callback = None
+    if payload.get('callback_url'):
+        try:
+            callback = webhook_callback(payload['callback_url'])
+        except WebhookRejected as e:
+            # Accepted at enqueue; the host has since stopped qualifying
+            logger.warning(f"Dropping webhook: {e}")
+    
+    blobs = services.get('blobs')
+    if not blobs.has(payload['cid']):
+        raise IOError(f"Image {payload['cid']} is not in {blobs.root}; is BLOB_STORE_DIR shared "
+                      f"between web and worker processes?")
+    stack = ExitStack()
+    image = stack.enter_context(blobs.open(payload['cid']))
+    graph = (StageGraph(pipeline_executor)
+             .add('ipfs', lambda: upload_image_to_ipfs(web3_service, image, payload['filename'], payload['cid']))
+             .add('ai', lambda: payload['ai_result'])
+             .add('rewards', lambda: payload['rewards']))
+    if payload['user_wallet'] and web3_service.is_connected():
+        add_reward_stages(graph, web3_service, payload['user_wallet'], callback, payload['verification'])
+    # The image stays mapped until an upload abandoned at the timeout returns
+    run = graph.run(timeout=PIPELINE_TIMEOUT, cleanup=stack.close)
+    
+    blockchain = {'ipfs_hash': run.result('ipfs'), 'timings': run.timings()}
+    collect_reward_results(run, blockchain)
+    return blockchain
+
+def create_job_queue() -> JobQueue:
+    """Redis-backed job queue (REDIS_URL); in-process without it"""
+    redis_client = None
+    if os.getenv('REDIS_URL'):
+        try:
+            redis_client = redis.Redis.from_url(os.getenv('REDIS_URL'), decode_responses=True)
+            redis_client.ping()
+        except Exception as e:
+            logger.warning(f"Redis not available ({e}), running jobs in-process")
+            redis_client = None
+    workers = int(os.getenv('JOB_WORKERS', '2'))
+    if redis_client is None:
+        # Nothing outside this process can see an in-process queue
+        workers = max(1, workers)
+    jobs = JobQueue(
+        redis_client,
+        prefix='agroai:detect-jobs',
+        result_ttl=int(os.getenv('JOB_RESULT_TTL_SECONDS', '86400')),
+        stale_seconds=float(os.getenv('JOB_STALE_SECONDS', '900'))
+    )
+    jobs.register('detect_enhanced_chain', run_chain_job)
+    return jobs.start(workers)
+
 def run_existing_ai_detection(file) -> Dict[str, Any]:
     """
     Placeholder for your existing AI detection function
@@ -273,10 +468,11 @@ def run_existing_ai_detection(file) -> Dict[str, Any]:
     }
 
 @enhanced_detection_bp.route('/blockchain-status', methods=['GET'])
+@services.requires('web3')
 def blockchain_status():
     """Get blockchain service status"""
     try:
-        web3_service = get_web3_service()
+        web3_service = services.get('web3')
         network_info = web3_service.get_network_info()
         account_balance = web3_service.get_account_balance()
         
@@ -285,7 +481,9 @@ def blockchain_status():
             'network': network_info,
             'account_balance': account_balance,
             'contracts_loaded': len(web3_service.contracts) > 0,
-            'ipfs_available': web3_service.ipfs_client is not None
+            'ipfs_available': web3_service.ipfs_client is not None,
+            'reward_batching': (web3_service.reward_accumulator.get_stats()
+                                if web3_service.reward_accumulator else None)
         })
         
     except Exception as e:
@@ -294,17 +492,40 @@ def blockchain_status():
             'error': str(e)
         }), 500
 
+@enhanced_detection_bp.route('/tx/<tx_hash>', methods=['GET'])
+@services.requires('web3')
+def get_transaction_status(tx_hash):
+    """Get the confirmation status of a submitted transaction"""
+    try:
+        web3_service = services.get('web3')
+        record = web3_service.get_transaction_status(tx_hash)
+        if record is None:
+            return jsonify({'error': 'Transaction not found'}), 404
+        
+        return jsonify(record)
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e)
+        }), 500
+
 @enhanced_detection_bp.route('/user-stats/<wallet_address>', methods=['GET'])
+@services.requires('web3')
 def get_user_blockchain_stats(wallet_address):
     """Get user's blockchain statistics"""
     try:
-        web3_service = get_web3_service()
+        web3_service = services.get('web3')
         stats = web3_service.get_user_stats(wallet_address)
         
-        return jsonify({
+        response = {
             'wallet_address': wallet_address,
             'stats': stats
-        })
+        }
+        if web3_service.reward_accumulator:
+            # Owed rewards not yet minted by a settlement batch
+            response['pending_rewards'] = web3_service.reward_accumulator.pending_for(wallet_address)
+        
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({
@@ -312,6 +533,7 @@ def get_user_blockchain_stats(wallet_address):
         }), 500
 
 @enhanced_detection_bp.route('/calculate-discount', methods=['POST'])
+@services.requires('web3')
 def calculate_purchase_discount():
     """Calculate potential discount for purchase"""
     try:
@@ -322,7 +544,7 @@ def calculate_purchase_discount():
         if not wallet_address or purchase_amount <= 0:
             return jsonify({'error': 'Invalid parameters'}), 400
         
-        web3_service = get_web3_service()
+        web3_service = services.get('web3')
         discount_info = web3_service.calculate_purchase_discount(wallet_address, purchase_amount)
         
         return jsonify({
@@ -337,6 +559,7 @@ def calculate_purchase_discount():
         }), 500
 
 @enhanced_detection_bp.route('/process-purchase', methods=['POST'])
+@services.requires('web3')
 def process_blockchain_purchase():
     """Process purchase with blockchain integration"""
     try:
@@ -348,7 +571,7 @@ def process_blockchain_purchase():
         if not wallet_address or purchase_amount <= 0:
             return jsonify({'error': 'Invalid parameters'}), 400
         
-        web3_service = get_web3_service()
+        web3_service = services.get('web3')
         purchase_result = web3_service.process_purchase(wallet_address, purchase_amount)
         
         # Log purchase for analytics
@@ -384,7 +607,53 @@ def save_analytics_data(data: Dict[str, Any]):
     except Exception as e:
         logger.warning(f"Failed to save analytics: {e}")
 
+@enhanced_detection_bp.route('/verify-disease', methods=['POST'])
+def verify_disease():
+    """
+    Chainlink Functions verification callback
+    Answers from the local blob store; re-runs detection only when the
+    image is stored without a result
+    """
+    # Only the Chainlink Functions source holds BACKEND_API_KEY
+    expected = os.getenv('BACKEND_API_KEY', '')
+    provided = request.headers.get('Authorization', '')
+    if not expected or not hmac.compare_digest(provided.encode(), f'Bearer {expected}'.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    ipfs_hash = str(data.get('ipfs_hash') or '')
+    if not (ipfs_hash.isascii() and ipfs_hash.isalnum() and len(ipfs_hash) >= 8):
+        return jsonify({'error': 'Invalid ipfs_hash'}), 400
+    
+    try:
+        prediction, source = services.get('blobs').get_or_predict(ipfs_hash, run_existing_ai_detection)
+    except KeyError:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    return jsonify({**prediction, 'ipfs_hash': ipfs_hash, 'source': source})
+
 # Error handlers
+@enhanced_detection_bp.errorhandler(ServiceUnavailable)
+def service_unavailable(error):
+    response = jsonify(error.to_dict())
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@enhanced_detection_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """State of an async /detect-enhanced job; result holds the IPFS hash and transactions"""
+    record = services.get('jobs').get(job_id)
+    if record is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(record)
+
+@enhanced_detection_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness of the services this blueprint depends on"""
+    status = services.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @enhanced_detection_bp.errorhandler(413)
 def file_too_large(error):
     return jsonify({'error': 'File too large'}), 413
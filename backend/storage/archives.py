@@ -0,0 +1,94 @@
+"""
+AgroAI Upload Archives
+Iterates images inside multipart lists and zip/tar uploads without extracting to disk
+"""
+
+import io
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'}
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+MAX_ENTRY_SIZE = 16 * 1024 * 1024  # 16MB, same as a single upload
+ZIP_SPILL_THRESHOLD = 4 * 1024 * 1024
+
+class ArchiveEntryError(ValueError):
+    """Raised for an archive entry that cannot be served"""
+
+def is_archive(filename: str) -> bool:
+    return (filename or '').lower().endswith(ARCHIVE_EXTENSIONS)
+
+def _is_image_name(name: str) -> bool:
+    base = os.path.basename(name)
+    if not base or base.startswith('.') or '__MACOSX' in name:
+        return False
+    return os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+def _read_capped(stream: BinaryIO, name: str, max_size: int) -> io.BytesIO:
+    data = stream.read(max_size + 1)
+    if len(data) > max_size:
+        raise ArchiveEntryError(f"{name} exceeds {max_size} bytes")
+    return io.BytesIO(data)
+
+def iter_zip(stream: BinaryIO, max_size: int = MAX_ENTRY_SIZE) -> Iterator[Tuple[str, BinaryIO]]:
+    """Yield (name, in-memory file) for image members, one at a time"""
+    with zipfile.ZipFile(stream) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_image_name(info.filename):
+                continue
+            if info.file_size > max_size:
+                raise ArchiveEntryError(f"{info.filename} exceeds {max_size} bytes")
+            with archive.open(info) as member:
+                yield info.filename, _read_capped(member, info.filename, max_size)
+
+def iter_tar(stream: BinaryIO, max_size: int = MAX_ENTRY_SIZE) -> Iterator[Tuple[str, BinaryIO]]:
+    """Yield image members from a tar stream; works on non-seekable input"""
+    with tarfile.open(fileobj=stream, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not _is_image_name(member.name):
+                continue
+            if member.size > max_size:
+                raise ArchiveEntryError(f"{member.name} exceeds {max_size} bytes")
+            extracted = archive.extractfile(member)
+            if extracted is not None:
+                yield member.name, _read_capped(extracted, member.name, max_size)
+
+def _seekable(stream: BinaryIO) -> bool:
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+def iter_upload_images(files: Iterable, max_size: int = MAX_ENTRY_SIZE) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Flatten uploaded files (FileStorage objects, or multipart parts with
+    .filename and .stream) into (name, file) pairs. Archives are expanded
+    lazily in memory; plain images are passed through. A stream that
+    cannot seek is read before the next file, since it may be the live
+    request body.
+    """
+    for file in files:
+        filename = file.filename or ''
+        lowered = filename.lower()
+        if lowered.endswith('.zip'):
+            if _seekable(file.stream):
+                yield from iter_zip(file.stream, max_size)
+                continue
+            # The zip directory is at the end, so the archive is spooled first
+            with tempfile.SpooledTemporaryFile(max_size=ZIP_SPILL_THRESHOLD) as spooled:
+                shutil.copyfileobj(file.stream, spooled)
+                spooled.seek(0)
+                yield from iter_zip(spooled, max_size)
+        elif is_archive(lowered):
+            yield from iter_tar(file.stream, max_size)
+        elif _is_image_name(filename):
+            yield filename, file.stream if _seekable(file.stream) else _read_capped(file.stream, filename, max_size)
+        else:
+            logger.warning(f"Skipping unsupported upload {filename}")
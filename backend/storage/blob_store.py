@@ -0,0 +1,168 @@
+"""
+AgroAI Blob Store
+Local content-addressed store of uploaded images and their predictions, keyed by IPFS CID
+
+Each image is written once under objects/<aa>/<bb>/<cid>. The shard
+directories come from the last four characters of the CID, because the
+leading characters are the same for every CID ("Qm", "bafy"). The
+prediction for the image sits next to it as <cid>.json. Writes go to
+tmp/ and are renamed into place, so readers never see a partial file
+and several processes can share one root. Reads map the blob with mmap,
+so repeated lookups are served from the page cache without copying.
+"""
+
+import io
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 256 * 1024
+
+class BlobStore:
+    """Sharded on-disk image and prediction store with memory-mapped reads"""
+
+    def __init__(self, root: str = 'data/blobs'):
+        self.root = root
+        self._objects = os.path.join(root, 'objects')
+        self._tmp = os.path.join(root, 'tmp')
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._counters = {
+            'blob_writes': 0,
+            'blob_dedupes': 0,
+            'bytes_written': 0,
+            'prediction_hits': 0,
+            'prediction_misses': 0
+        }
+
+    def _path(self, cid: str) -> str:
+        if len(cid) < 8 or not (cid.isascii() and cid.isalnum()):
+            # CIDs are base58/base32; anything else could escape the root
+            raise ValueError(f"Invalid CID: {cid!r}")
+        return os.path.join(self._objects, cid[-4:-2], cid[-2:], cid)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _write_atomic(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def has(self, cid: str) -> bool:
+        return os.path.exists(self._path(cid))
+
+    def put_stream(self, cid: str, stream: BinaryIO) -> bool:
+        """Store a file object's content under cid; False when it was already stored"""
+        path = self._path(cid)
+        if os.path.exists(path):
+            # Content-addressed: the stored bytes are already these bytes
+            self._count('blob_dedupes')
+            return False
+        written = []
+
+        def copy(f):
+            shutil.copyfileobj(stream, f, COPY_CHUNK_SIZE)
+            written.append(f.tell())
+
+        self._write_atomic(path, copy)
+        self._count('blob_writes')
+        self._count('bytes_written', written[0])
+        return True
+
+    def put(self, cid: str, data: bytes) -> bool:
+        return self.put_stream(cid, io.BytesIO(data))
+
+    @contextmanager
+    def open(self, cid: str) -> Iterator[BinaryIO]:
+        """Read-only file-like view of a blob, memory-mapped; KeyError if absent"""
+        try:
+            f = open(self._path(cid), 'rb')
+        except FileNotFoundError:
+            raise KeyError(cid)
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap refuses empty files
+                yield io.BytesIO(b'')
+                return
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield view
+            finally:
+                view.close()
+
+    def set_prediction(self, cid: str, prediction: Dict[str, Any], model_version: Optional[str] = None):
+        """Record the prediction made for a stored image"""
+        record = {
+            'cid': cid,
+            'model_version': model_version,
+            'prediction': prediction,
+            'stored_at': time.time()
+        }
+        payload = json.dumps(record).encode('utf-8')
+        self._write_atomic(self._path(cid) + '.json', lambda f: f.write(payload))
+
+    def get_prediction(self, cid: str) -> Optional[Dict[str, Any]]:
+        """The stored prediction record ({cid, model_version, prediction, stored_at}) or None"""
+        try:
+            with open(self._path(cid) + '.json', 'rb') as f:
+                record = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            self._count('prediction_misses')
+            return None
+        self._count('prediction_hits')
+        return record
+
+    def get_or_predict(self, cid: str, predict: Callable[[BinaryIO], Dict[str, Any]],
+                       model_version: Optional[str] = None,
+                       fetch: Optional[Callable[[str], Optional[bytes]]] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Prediction for cid and where it came from: 'store' when one was
+        recorded by model_version (any version when None), otherwise
+        'inference' over the stored image, or over fetch(cid) bytes if it is
+        not stored. Fetched bytes are used once and never written to the
+        store. KeyError when the image cannot be found.
+        """
+        record = self.get_prediction(cid)
+        if record is not None and model_version in (None, record['model_version']):
+            return record['prediction'], 'store'
+
+        if self.has(cid):
+            with self.open(cid) as image:
+                prediction = predict(image)
+        else:
+            data = fetch(cid) if fetch is not None else None
+            if data is None:
+                raise KeyError(cid)
+            prediction = predict(io.BytesIO(data))
+        self.set_prediction(cid, prediction, model_version)
+        return prediction, 'inference'
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['prediction_hits'] + counters['prediction_misses']
+        return {
+            'root': self.root,
+            'prediction_hit_rate': round(counters['prediction_hits'] / lookups, 4) if lookups else 0.0,
+            **counters
+        }
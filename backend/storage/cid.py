@@ -0,0 +1,174 @@
+"""
+AgroAI Local CID Computation
+Computes the CID `ipfs add` would return without talking to an IPFS node
+
+Content is cut into fixed 256 KiB chunks (go-ipfs/kubo `size-262144`).
+The chunks become the leaves of a balanced UnixFS DAG with at most 174
+links per node, encoded as dag-pb and hashed with sha2-256. This matches
+the kubo defaults:
+
+- CIDv0 (`ipfs add`): leaves are UnixFS File nodes; the result is a
+  base58btc "Qm..." string.
+- CIDv1 (`ipfs add --cid-version=1`): leaves are raw blocks; the result
+  is a base32 "baf..." string.
+
+CIDBuilder accepts data incrementally and keeps only per-leaf metadata,
+so large uploads can be hashed while they stream in.
+"""
+
+import base64
+import hashlib
+from typing import BinaryIO, List, Optional, Tuple
+
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+CODEC_RAW = 0x55
+CODEC_DAG_PB = 0x70
+MULTIHASH_SHA2_256 = 0x12
+UNIXFS_FILE = 2
+
+_BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _field_varint(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+def _field_bytes(number: int, value: bytes) -> bytes:
+    return _varint((number << 3) | 2) + _varint(len(value)) + value
+
+def _base58(data: bytes) -> str:
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = _BASE58_ALPHABET[remainder] + encoded
+    padding = len(data) - len(data.lstrip(b'\0'))
+    return _BASE58_ALPHABET[0] * padding + encoded
+
+def _multihash(block: bytes) -> bytes:
+    return bytes([MULTIHASH_SHA2_256, 32]) + hashlib.sha256(block).digest()
+
+def _unixfs_file(data: bytes, filesize: int, blocksizes: List[int] = ()) -> bytes:
+    message = _field_varint(1, UNIXFS_FILE)
+    if data:
+        message += _field_bytes(2, data)
+    message += _field_varint(3, filesize)
+    for size in blocksizes:
+        message += _field_varint(4, size)
+    return message
+
+def _dag_pb(data: bytes, links: List[Tuple[bytes, int]] = ()) -> bytes:
+    """PBNode with links before data, as the dag-pb spec requires"""
+    node = b''
+    for cid, tsize in links:
+        # kubo always writes the (empty) link name
+        link = _field_bytes(1, cid) + _field_bytes(2, b'') + _field_varint(3, tsize)
+        node += _field_bytes(2, link)
+    return node + _field_bytes(1, data)
+
+class _Node:
+    """A finished DAG node: its CID bytes, file bytes covered, and Tsize"""
+
+    __slots__ = ('cid', 'filesize', 'tsize')
+
+    def __init__(self, cid: bytes, filesize: int, tsize: int):
+        self.cid = cid
+        self.filesize = filesize
+        self.tsize = tsize
+
+def cid_to_string(cid: bytes) -> str:
+    """Text form: base58btc for CIDv0, multibase base32 ('b') for CIDv1"""
+    if cid[:1] == bytes([MULTIHASH_SHA2_256]):
+        return _base58(cid)
+    return 'b' + base64.b32encode(cid).decode('ascii').lower().rstrip('=')
+
+class CIDBuilder:
+    """Incremental `ipfs add` CID computation"""
+
+    def __init__(self, version: int = 0, chunk_size: int = CHUNK_SIZE, max_links: int = MAX_LINKS):
+        if version not in (0, 1):
+            raise ValueError(f"Unsupported CID version: {version}")
+        self.version = version
+        self.chunk_size = chunk_size
+        self.max_links = max_links
+        self.size = 0
+        self._pending = bytearray()
+        self._leaves: List[_Node] = []
+        self._result: Optional[str] = None
+
+    def _cid(self, codec: int, block: bytes) -> bytes:
+        if self.version == 0:
+            return _multihash(block)
+        return _varint(1) + _varint(codec) + _multihash(block)
+
+    def _leaf(self, chunk: bytes) -> _Node:
+        if self.version == 1:
+            return _Node(self._cid(CODEC_RAW, chunk), len(chunk), len(chunk))
+        block = _dag_pb(_unixfs_file(chunk, len(chunk)))
+        return _Node(self._cid(CODEC_DAG_PB, block), len(chunk), len(block))
+
+    def _parent(self, children: List[_Node]) -> _Node:
+        filesize = sum(child.filesize for child in children)
+        block = _dag_pb(
+            _unixfs_file(b'', filesize, [child.filesize for child in children]),
+            [(child.cid, child.tsize) for child in children]
+        )
+        return _Node(self._cid(CODEC_DAG_PB, block), filesize,
+                     len(block) + sum(child.tsize for child in children))
+
+    def update(self, data: bytes) -> 'CIDBuilder':
+        if self._result is not None:
+            raise ValueError("CIDBuilder already finalized")
+        self.size += len(data)
+        self._pending += data
+        while len(self._pending) >= self.chunk_size:
+            self._leaves.append(self._leaf(bytes(self._pending[:self.chunk_size])))
+            del self._pending[:self.chunk_size]
+        return self
+
+    def hexdigest(self) -> str:
+        """The CID string (named like hashlib for drop-in use); finalizes the builder"""
+        if self._result is None:
+            if self._pending or not self._leaves:
+                # A trailing partial chunk, or the single empty chunk of an empty file
+                self._leaves.append(self._leaf(bytes(self._pending)))
+                self._pending.clear()
+
+            # Balanced layout: every leaf at the same depth, nodes filled left to right
+            level = self._leaves
+            while len(level) > 1:
+                level = [self._parent(level[i:i + self.max_links])
+                         for i in range(0, len(level), self.max_links)]
+            self._result = cid_to_string(level[0].cid)
+        return self._result
+
+def compute_cid(data: bytes, version: int = 0) -> str:
+    """CID of an in-memory payload"""
+    return CIDBuilder(version).update(data).hexdigest()
+
+def compute_cid_stream(stream: BinaryIO, version: int = 0, read_size: int = CHUNK_SIZE) -> str:
+    """CID of a file object, read from its current position in read_size pieces"""
+    builder = CIDBuilder(version)
+    for piece in iter(lambda: stream.read(read_size), b''):
+        builder.update(piece)
+    return builder.hexdigest()
+
+def ipfs_add_options(version: int = 0) -> dict:
+    """ipfshttpclient add() keyword arguments that make the node agree with CIDBuilder"""
+    return {
+        'cid_version': version,
+        'raw_leaves': version == 1,
+        'chunker': f'size-{CHUNK_SIZE}',
+        'pin': True
+    }
@@ -0,0 +1,150 @@
+"""
+AgroAI Multipart Streams
+Parses multipart/form-data straight off the WSGI input instead of letting Werkzeug spool the body first
+
+request.files reads and spools the whole body before a view runs, and
+Flask's MAX_CONTENT_LENGTH is one limit for every route. Here the body
+is read in chunks through Werkzeug's incremental decoder, under a size
+cap chosen by the route. The cap also holds for chunked bodies, which
+carry no Content-Length. Each part is handed over as a stream and must
+be consumed before the next part is read; unread data is skipped.
+"""
+
+import io
+import logging
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.wsgi import get_input_stream
+
+from .uploads import DEFAULT_CHUNK_SIZE, UploadBuffer, UploadRejected, UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+MAX_FIELD_SIZE = 64 * 1024
+
+class BodyTooLarge(UploadTooLarge):
+    """Request body larger than the route allows"""
+
+class Part(NamedTuple):
+    """One multipart part; filename is None for plain form fields"""
+    name: str
+    filename: Optional[str]
+    stream: BinaryIO
+
+class _CappedStream(io.RawIOBase):
+    """Request body that raises BodyTooLarge once more than max_size bytes arrive"""
+
+    def __init__(self, stream: BinaryIO, max_size: int):
+        self._stream = stream
+        self._max_size = max_size
+        self._read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # Ask for one byte past the cap, so reaching it exactly is not an error
+        data = self._stream.read(min(len(buffer), self._max_size + 1 - self._read))
+        self._read += len(data)
+        if self._read > self._max_size:
+            raise BodyTooLarge(f"Request body exceeds {self._max_size} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+class _PartReader(io.RawIOBase):
+    """The data events of the current part, as a stream"""
+
+    def __init__(self, events: Iterator):
+        self._events = events
+        self._buffer = b''
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer and not self._done:
+            event = next(self._events)
+            self._buffer = bytes(event.data)
+            self._done = not event.more_data
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def drain(self):
+        scratch = bytearray(DEFAULT_CHUNK_SIZE)
+        while self.readinto(scratch):
+            pass
+
+def _iter_events(decoder: MultipartDecoder, stream: BinaryIO, chunk_size: int) -> Iterator:
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            # None marks the end of input; a truncated body then raises ValueError
+            decoder.receive_data(stream.read(chunk_size) or None)
+        elif isinstance(event, Epilogue):
+            return
+        elif isinstance(event, (Field, File, Data)):
+            yield event
+
+def iter_parts(stream: BinaryIO, boundary: bytes,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Part]:
+    """Yield each part of a multipart body as it is reached"""
+    events = _iter_events(MultipartDecoder(boundary), stream, chunk_size)
+    for event in events:
+        if not isinstance(event, (Field, File)):
+            continue
+        reader = _PartReader(events)
+        yield Part(event.name, event.filename if isinstance(event, File) else None,
+                   io.BufferedReader(reader, chunk_size))
+        reader.drain()
+
+def request_body(environ, max_size: int) -> BinaryIO:
+    """The raw request body, refused past max_size whether or not it is chunked"""
+    length = environ.get('CONTENT_LENGTH')
+    if length and length.isdigit() and int(length) > max_size:
+        raise BodyTooLarge(f"Request body exceeds {max_size} bytes")
+    return io.BufferedReader(_CappedStream(get_input_stream(environ), max_size), DEFAULT_CHUNK_SIZE)
+
+def iter_request_parts(environ, max_size: int,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Part]:
+    """
+    Parts of a multipart/form-data request, read from the WSGI input.
+    Raises UploadRejected before reading anything when the request is not
+    multipart or declares a body over max_size. Do not touch request.form,
+    request.files or request.values on the same request.
+    """
+    mimetype, options = parse_options_header(environ.get('CONTENT_TYPE', ''))
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadRejected("Expected a multipart/form-data body")
+    return iter_parts(request_body(environ, max_size), boundary.encode('latin-1'), chunk_size)
+
+def read_upload_form(environ, file_field: str, max_body_size: int, max_field_size: int = MAX_FIELD_SIZE,
+                     **buffer_kwargs) -> Tuple[Dict[str, str], Optional[UploadBuffer]]:
+    """
+    Form fields and the file_field upload of a multipart request, in one
+    pass over the WSGI input. The file goes straight into an UploadBuffer
+    (buffer_kwargs: max_size, allowed_types, cid_version, ...), so its
+    type, size cap and hashes are settled while the body arrives. Other
+    file parts are skipped. The caller closes the returned buffer.
+    """
+    fields: Dict[str, str] = {}
+    upload = None
+    try:
+        for part in iter_request_parts(environ, max_body_size):
+            if part.filename is None:
+                value = part.stream.read(max_field_size + 1)
+                if len(value) > max_field_size:
+                    raise UploadRejected(f"Form field {part.name} exceeds {max_field_size} bytes")
+                fields.setdefault(part.name, value.decode('utf-8', 'replace'))
+            elif part.name == file_field and upload is None:
+                upload = UploadBuffer(part.stream, filename=part.filename, **buffer_kwargs)
+    except Exception:
+        if upload is not None:
+            upload.close()
+        raise
+    return fields, upload
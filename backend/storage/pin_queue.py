@@ -0,0 +1,287 @@
+"""
+AgroAI IPFS Pin Queue
+Durable write-behind queue that pins content to IPFS after the request has returned
+
+enqueue_stream() computes the content's CID locally (see cid.py) and
+spools the bytes to disk under that CID. It records the pin in SQLite and
+returns the CID straight away, so callers can put it on-chain without
+waiting for IPFS. Worker threads then `ipfs add` each spooled file,
+check that the node produced the same CID, and delete the spool copy.
+Failed pins are retried with exponential backoff. After max_attempts the
+pin is parked as failed and its spool file is kept for a manual replay.
+Pins cut short by a crash are picked up again on the next start. Several
+processes may share one database and spool, so recovery only reclaims
+work that has been idle for stale_seconds.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from .cid import CHUNK_SIZE, CIDBuilder
+
+logger = logging.getLogger(__name__)
+
+PIN_PENDING = 'pending'
+PIN_PINNING = 'pinning'
+PIN_PINNED = 'pinned'
+PIN_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pins (
+    cid TEXT PRIMARY KEY,
+    cid_version INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    filename TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pins_due ON pins (status, next_attempt_at);
+"""
+
+class PinQueue:
+    """Local-CID, spool-to-disk IPFS pinning with bounded concurrency"""
+
+    def __init__(self, pin_fn: Callable[[str, int], str], db_path: str = 'data/pins.db',
+                 spool_dir: str = 'data/pin_spool', cid_version: int = 0, concurrency: int = 4,
+                 max_attempts: int = 8, base_backoff: float = 5.0, max_backoff: float = 600.0,
+                 poll_interval: float = 1.0, stale_seconds: float = 900.0):
+        """
+        pin_fn(path, cid_version) adds the file at path to IPFS, pinned,
+        with the chunker and leaf settings that cid_version implies, and
+        returns the CID the node computed. stale_seconds must exceed the
+        longest pin or spool write, or live work of another process sharing
+        the spool is taken for a crash.
+        """
+        self.pin_fn = pin_fn
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.cid_version = cid_version
+        self.concurrency = max(1, int(concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        os.makedirs(spool_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(SCHEMA)
+        self._recover()
+
+    def _spool_path(self, cid: str) -> str:
+        return os.path.join(self.spool_dir, cid)
+
+    def _recover(self):
+        """Requeue stale interrupted pins and stale spooled files never recorded"""
+        now = time.time()
+        cutoff = now - self.stale_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE pins SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (PIN_PENDING, now, PIN_PINNING, cutoff)
+            )
+            known = {row[0] for row in self._conn.execute("SELECT cid FROM pins")}
+            orphans = []
+            for name in os.listdir(self.spool_dir):
+                path = self._spool_path(name)
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        # Possibly being written or recorded by another process
+                        continue
+                    if name.endswith('.part'):
+                        # Half-written by a request that never got its CID back
+                        os.unlink(path)
+                    elif name not in known:
+                        orphans.append((name, os.path.getsize(path)))
+                except FileNotFoundError:
+                    # Renamed or removed by another process meanwhile
+                    continue
+            for cid, size in orphans:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO pins (cid, cid_version, size, status, next_attempt_at, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cid, 0 if cid.startswith('Qm') else 1, size, PIN_PENDING, now, now, now)
+                )
+        if cursor.rowcount or orphans:
+            logger.info(f"Requeued {cursor.rowcount} interrupted and {len(orphans)} unrecorded pins")
+
+    def start(self) -> 'PinQueue':
+        if not self._threads:
+            self._running = True
+            for index in range(self.concurrency):
+                thread = threading.Thread(target=self._run, name=f'ipfs-pin-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def enqueue_stream(self, stream: BinaryIO, filename: str = '', cid: Optional[str] = None) -> str:
+        """
+        Hash and spool a file object from its current position; returns its
+        CID. Pass cid when it was already computed while receiving the
+        upload: hashing is skipped, and content already queued or pinned is
+        not read at all.
+        """
+        if cid is not None:
+            existing = self.status(cid)
+            if existing is not None and existing['status'] != PIN_FAILED:
+                return cid
+
+        builder = CIDBuilder(self.cid_version) if cid is None else None
+        size = 0
+        fd, part_path = tempfile.mkstemp(suffix='.part', dir=self.spool_dir)
+        try:
+            with os.fdopen(fd, 'wb') as spool:
+                for piece in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if builder is not None:
+                        builder.update(piece)
+                    spool.write(piece)
+                    size += len(piece)
+                spool.flush()
+                os.fsync(spool.fileno())
+            if builder is not None:
+                cid = builder.hexdigest()
+            # Same content, same CID: a re-upload replaces an identical file
+            os.replace(part_path, self._spool_path(cid))
+        except Exception:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pins (cid, cid_version, size, filename, status, next_attempt_at, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(cid) DO UPDATE SET status = excluded.status, attempts = 0, "
+                "error = NULL, next_attempt_at = excluded.next_attempt_at, "
+                "updated_at = excluded.updated_at WHERE pins.status = ?",
+                (cid, self.cid_version, size, filename, PIN_PENDING, now, now, now, PIN_FAILED)
+            )
+            status = self._conn.execute("SELECT status FROM pins WHERE cid = ?", (cid,)).fetchone()[0]
+        if status == PIN_PINNED:
+            # Already on IPFS; the fresh spool copy is not needed
+            os.unlink(self._spool_path(cid))
+        else:
+            self._wakeup.set()
+        return cid
+
+    def _run(self):
+        while self._running:
+            try:
+                pin = self._claim()
+            except Exception as e:
+                logger.error(f"Pin queue claim failed: {e}")
+                pin = None
+            if pin is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._pin(*pin)
+
+    def _claim(self) -> Optional[tuple]:
+        """Move the oldest due pin to pinning; safe across processes sharing the db"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cid, cid_version, attempts FROM pins WHERE status = ? AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1", (PIN_PENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = self._conn.execute(
+                "UPDATE pins SET status = ?, updated_at = ? WHERE cid = ? AND status = ?",
+                (PIN_PINNING, now, row[0], PIN_PENDING)
+            )
+        return tuple(row) if cursor.rowcount else None
+
+    def _pin(self, cid: str, cid_version: int, attempts: int):
+        start = time.perf_counter()
+        try:
+            pinned_cid = self.pin_fn(self._spool_path(cid), cid_version)
+        except Exception as e:
+            self._record_failure(cid, attempts + 1, str(e))
+            return
+
+        if pinned_cid != cid:
+            # Deterministic, so retrying cannot help: the node's add settings
+            # differ from ours and the on-chain hash would not resolve
+            self._record_failure(cid, self.max_attempts, f"IPFS returned {pinned_cid}")
+            logger.error(f"CID mismatch for {cid}: IPFS returned {pinned_cid}")
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pins SET status = ?, attempts = ?, error = NULL, updated_at = ? WHERE cid = ?",
+                (PIN_PINNED, attempts + 1, time.time(), cid)
+            )
+        try:
+            os.unlink(self._spool_path(cid))
+        except FileNotFoundError:
+            pass
+        logger.info(f"Pinned {cid} to IPFS in {(time.perf_counter() - start) * 1000.0:.0f} ms")
+
+    def _record_failure(self, cid: str, attempts: int, error: str):
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        status = PIN_FAILED if attempts >= self.max_attempts else PIN_PENDING
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pins SET status = ?, attempts = ?, error = ?, next_attempt_at = ?, "
+                "updated_at = ? WHERE cid = ?",
+                (status, attempts, error, time.time() + backoff, time.time(), cid)
+            )
+        if status == PIN_FAILED:
+            logger.error(f"Pin of {cid} failed {attempts} times, keeping spool copy: {error}")
+        else:
+            logger.warning(f"Pin of {cid} attempt {attempts} failed, retrying in {backoff:.0f}s: {error}")
+
+    def status(self, cid: str) -> Optional[Dict[str, Any]]:
+        """Pin state of one CID, or None if it was never queued here"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cid, cid_version, size, status, attempts, error, next_attempt_at, "
+                "created_at, updated_at FROM pins WHERE cid = ?", (cid,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('cid', 'cid_version', 'size', 'status', 'attempts', 'error',
+                         'next_attempt_at', 'created_at', 'updated_at'), row))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM pins GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM pins WHERE status IN (?, ?)", (PIN_PENDING, PIN_PINNING)
+            ).fetchone()[0]
+        return {
+            'pins': {status: counts.get(status, 0) for status in
+                     (PIN_PENDING, PIN_PINNING, PIN_PINNED, PIN_FAILED)},
+            'oldest_unpinned_age_seconds': round(time.time() - oldest, 3) if oldest else None,
+            'cid_version': self.cid_version,
+            'concurrency': self.concurrency
+        }
@@ -0,0 +1,234 @@
+"""
+AgroAI Upload Buffers
+Keeps request uploads in memory and spills to an anonymous temp file only when large
+
+Uploads are read in chunks. The first chunk's magic bytes decide the
+file type, the size cap is enforced as bytes arrive, and SHA-256 (plus
+the IPFS CID when asked) is computed on the way in. An oversized or
+mislabelled upload is rejected after at most one chunk past the cap.
+from_request_file reads a FileStorage, which Werkzeug has already
+spooled in full; multipart.read_upload_form feeds a buffer straight
+from the request body instead.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Iterable, Optional
+
+from .cid import CIDBuilder
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'uploads'
+DEFAULT_SPILL_THRESHOLD = 4 * 1024 * 1024  # 4MB
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Bytes needed to recognise every signature below
+SNIFF_BYTES = 12
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff')
+)
+
+class UploadRejected(ValueError):
+    """Upload refused while it was being read"""
+
+class UploadTooLarge(UploadRejected):
+    pass
+
+class UnsupportedFileType(UploadRejected):
+    pass
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Image format from leading magic bytes, or None if unrecognised"""
+    for signature, kind in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class _SharedReader(io.RawIOBase):
+    """Read-only view with its own position over a file object shared behind a lock"""
+
+    def __init__(self, f: BinaryIO, lock: threading.Lock, size: int):
+        self._f = f
+        self._lock = lock
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with self._lock:
+            self._f.seek(self._pos)
+            data = self._f.read(len(buffer))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+class UploadBuffer:
+    """Request upload held in memory, spilled to disk above a size threshold"""
+
+    def __init__(self, stream: BinaryIO, filename: str = '',
+                 spill_threshold: int = DEFAULT_SPILL_THRESHOLD,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_size: Optional[int] = None,
+                 allowed_types: Optional[Iterable[str]] = None,
+                 cid_version: Optional[int] = None):
+        """
+        max_size rejects with UploadTooLarge; allowed_types (sniffed image
+        formats) rejects with UnsupportedFileType; cid_version also
+        computes the IPFS CID while reading.
+        """
+        self.filename = filename or ''
+        self.size = 0
+        self.max_size = max_size
+        self.allowed_types = frozenset(allowed_types) if allowed_types is not None else None
+        self.content_type: Optional[str] = None
+        self._hash = hashlib.sha256()
+        self._cid = CIDBuilder(cid_version) if cid_version is not None else None
+        # TemporaryFile is unlinked on creation, so a crashed request cannot
+        # leave anything behind even after it spills
+        spill_dir = UPLOAD_DIR if os.path.isdir(UPLOAD_DIR) else None
+        self._file = tempfile.SpooledTemporaryFile(max_size=spill_threshold, dir=spill_dir)
+        self._read_lock = threading.Lock()
+        try:
+            self._ingest(stream, chunk_size)
+        except Exception:
+            self._file.close()
+            raise
+
+    @classmethod
+    def from_request_file(cls, file_storage, **kwargs) -> 'UploadBuffer':
+        """Build a buffer from a werkzeug FileStorage without touching uploads/"""
+        return cls(file_storage.stream, filename=file_storage.filename, **kwargs)
+
+    def _ingest(self, stream: BinaryIO, chunk_size: int):
+        head = b''
+        while len(head) < SNIFF_BYTES:
+            piece = stream.read(chunk_size)
+            if not piece:
+                break
+            head += piece
+        self.content_type = sniff_image_type(head)
+        if self.allowed_types is not None and self.content_type not in self.allowed_types:
+            raise UnsupportedFileType(f"Unsupported file type ({self.content_type or 'unknown'})")
+
+        chunk = head
+        while chunk:
+            self.size += len(chunk)
+            if self.max_size is not None and self.size > self.max_size:
+                raise UploadTooLarge(f"Upload exceeds {self.max_size} bytes")
+            self._hash.update(chunk)
+            if self._cid is not None:
+                self._cid.update(chunk)
+            self._file.write(chunk)
+            chunk = stream.read(chunk_size)
+        self._file.seek(0)
+
+    @property
+    def sha256(self) -> str:
+        """Hex SHA-256 of the upload, computed while reading"""
+        return self._hash.hexdigest()
+
+    @property
+    def cid(self) -> Optional[str]:
+        """IPFS CID of the upload, when built with cid_version"""
+        return self._cid.hexdigest() if self._cid is not None else None
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the upload exceeded the in-memory threshold"""
+        return bool(getattr(self._file, '_rolled', False))
+
+    def open(self) -> BinaryIO:
+        """Rewind and return the underlying file object for reading"""
+        self._file.seek(0)
+        return self._file
+
+    def reader(self) -> BinaryIO:
+        """A file object with its own position, so several stages can read at once"""
+        return io.BufferedReader(_SharedReader(self._file, self._read_lock, self.size))
+
+    def getvalue(self) -> bytes:
+        """Return the whole upload as bytes"""
+        return self.open().read()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'UploadBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def sweep_stale_uploads(directory: str = UPLOAD_DIR, max_age_seconds: int = 3600) -> int:
+    """Delete files left in the upload directory by crashed requests"""
+    if not os.path.isdir(directory):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"Failed to remove stale upload {entry.path}: {e}")
+
+    if removed:
+        logger.info(f"Removed {removed} stale upload(s) from {directory}")
+    return removed
+
+class UploadSweeper:
+    """Background thread that periodically clears stale uploads"""
+
+    def __init__(self, directory: str = UPLOAD_DIR, interval_seconds: int = 600,
+                 max_age_seconds: int = 3600):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'UploadSweeper':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sweep_stale_uploads(self.directory, self.max_age_seconds)
+            except Exception as e:
+                logger.error(f"Upload sweep failed: {e}")
+            self._stop.wait(self.interval_seconds)
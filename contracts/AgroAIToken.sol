@@ -49,6 +49,9 @@ contract AgroAIToken is ERC20, ERC20Burnable, Pausable, Ownable, ReentrancyGuard
     mapping(address => bool) public authorizedMinters;
     mapping(address => bool) public authorizedBurners;
     
+    // Settled reward batches (backend retries reuse the same batch id)
+    mapping(bytes32 => bool) public settledBatches;
+    
     // Events
     event PhotoRewarded(address indexed user, uint256 reward, uint256 photoNumber);
     event DiseaseDetectionRewarded(address indexed user, uint256 bonus, string disease, bool isEarlyDetection);
@@ -56,6 +59,7 @@ contract AgroAIToken is ERC20, ERC20Burnable, Pausable, Ownable, ReentrancyGuard
     event ReferralRewarded(address indexed referrer, address indexed referred, uint256 reward);
     event TierUpdated(address indexed user, uint256 oldTier, uint256 newTier);
     event TreatmentSuccessRewarded(address indexed user, uint256 bonus, string treatmentId);
+    event UploadRewardsSettled(bytes32 indexed batchId, address indexed user, uint256 reward, uint256 photos, uint256 detections);
     event AuthorizedMinterAdded(address indexed minter);
     event AuthorizedMinterRemoved(address indexed minter);
     
@@ -149,6 +153,47 @@ contract AgroAIToken is ERC20, ERC20Burnable, Pausable, Ownable, ReentrancyGuard
         emit DiseaseDetectionRewarded(user, bonus, disease, isEarlyDetection);
     }
     
+    /**
+     * @dev Settle accumulated upload rewards for many users in one transaction
+     * Each index folds one user's pending photo, disease and early detection rewards
+     */
+    function batchRewardUploads(
+        bytes32 batchId,
+        address[] calldata users,
+        uint256[] calldata photos,
+        uint256[] calldata detections,
+        uint256[] calldata earlyDetections
+    ) external onlyAuthorizedMinter nonReentrant {
+        require(!settledBatches[batchId], "Batch already settled");
+        require(
+            users.length == photos.length &&
+            users.length == detections.length &&
+            users.length == earlyDetections.length,
+            "Array length mismatch"
+        );
+        
+        settledBatches[batchId] = true;
+        
+        for (uint256 i = 0; i < users.length; i++) {
+            address user = users[i];
+            require(user != address(0), "Invalid user address");
+            
+            uint256 reward = photos[i] * PHOTO_REWARD +
+                detections[i] * DISEASE_BONUS +
+                earlyDetections[i] * EARLY_DETECTION_BONUS;
+            require(totalSupply() + reward <= MAX_SUPPLY, "Max supply exceeded");
+            
+            photoCount[user] += photos[i];
+            diseaseDetections[user] += detections[i] + earlyDetections[i];
+            lastActivityTime[user] = block.timestamp;
+            
+            _mint(user, reward);
+            _updateUserTier(user);
+            
+            emit UploadRewardsSettled(batchId, user, reward, photos[i], detections[i] + earlyDetections[i]);
+        }
+    }
+    
     /**
      * @dev Reward user for healthy plant verification
      */
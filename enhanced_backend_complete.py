@@ -7,42 +7,67 @@ import os
 import json
 import logging
 import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 import hashlib
-import uuid
+import hmac
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
 from flask_cors import CORS
 # from flask_limiter import Limiter
 # from flask_limiter.util import get_remote_address
-import redis
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
-import ipfshttpclient
-import requests
-from PIL import Image
-import torch
-import torchvision.transforms as transforms
-import cv2
-import numpy as np
+
+from backend.ai.batch_stream import stream_predictions
+from backend.ai.batching import MicroBatcher
+from backend.ai.labels import MODEL_INPUT_SIZE, PLANT_DISEASE_CLASSES
+from backend.ai.prediction_cache import PredictionCache, sha256_file
+from backend.bootstrap import MODE_BACKGROUND, MODE_LAZY, MODE_SEQUENTIAL, ServiceRegistry, ServiceUnavailable
+from backend.blockchain.fee_engine import FeeEngine
+from backend.blockchain.nonce_manager import shared_nonce_manager
+from backend.blockchain.receipt_tracker import ReceiptTracker, WebhookRejected, validate_webhook_url, webhook_callback
+from backend.jobs import JOB_QUEUED, JobQueue, wants_async
+from backend.lazy import lazy_import
+from backend.pipeline import StageGraph
+from backend.storage.archives import iter_upload_images
+from backend.storage.blob_store import BlobStore
+from backend.storage.cid import compute_cid, ipfs_add_options
+from backend.storage.multipart import iter_request_parts, read_upload_form
+from backend.storage.pin_queue import PinQueue
+from backend.storage.uploads import UploadBuffer, UploadRejected, UploadSweeper, UploadTooLarge
+
+# Heavy dependencies are imported on first use (mostly inside the service
+# bootstrap threads), so importing this module stays cheap
+redis = lazy_import('redis')
+web3 = lazy_import('web3')
+web3_middleware = lazy_import('web3.middleware')
+web3_logs = lazy_import('web3.logs')
+ipfshttpclient = lazy_import('ipfshttpclient')
+requests = lazy_import('requests')
+torch = lazy_import('torch')
+np = lazy_import('numpy')
+cascade = lazy_import('backend.ai.cascade')
+decode = lazy_import('backend.ai.decode')
+model_loader = lazy_import('backend.ai.model_loader')
+preprocessing = lazy_import('backend.ai.preprocessing')
+quantization = lazy_import('backend.ai.quantization')
+worker_pool = lazy_import('backend.ai.worker_pool')
+event_indexer = lazy_import('backend.blockchain.event_indexer')
+read_cache = lazy_import('backend.blockchain.read_cache')
+rpc_pool = lazy_import('backend.blockchain.rpc_pool')
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'agroai-secret-key')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# 16MB max file size; /api/predict/batch reads its body itself under AI_BATCH_MAX_REQUEST_MB
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 # CORS configuration
 CORS(app, origins=['http://localhost:3000', 'http://localhost:5001', 'https://agroai.io'])
 
-# Redis for caching
-try:
-    redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-    redis_client.ping()
-except:
-    redis_client = None
-    print("Redis not available, using in-memory cache")
-
 # Logging configuration
 logging.basicConfig(
     level=logging.INFO,
@@ -63,6 +88,11 @@ class Web3Service:
         self.account = None
         self.contract_address = None
         self.contract_abi = None
+        self.nonce_manager = None
+        self.receipt_tracker = None
+        self.reads = None
+        self.indexer = None
+        self.fee_engine = None
         self._initialize_web3()
     
     def _initialize_web3(self):
@@ -73,15 +103,41 @@ class Web3Service:
             private_key = os.environ.get('PRIVATE_KEY', '')
             
             if not rpc_url or not private_key:
-                logger.error("Missing Web3 configuration")
-                return
+                raise ValueError("Missing Web3 configuration (SEPOLIA_RPC_URL, PRIVATE_KEY)")
             
-            # Initialize Web3
-            self.w3 = Web3(Web3.HTTPProvider(rpc_url))
-            self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            # Initialize Web3 over every configured endpoint
+            rpc_urls = [rpc_url] + [url for url in os.environ.get('RPC_URLS', '').split(',') if url.strip()]
+            self.w3 = web3.Web3(rpc_pool.PooledHTTPProvider(
+                rpc_urls,
+                hedge=os.environ.get('RPC_HEDGING', 'true').lower() == 'true',
+                hedge_percentile=float(os.environ.get('RPC_HEDGE_PERCENTILE', '95')),
+                failure_threshold=int(os.environ.get('RPC_FAILURE_THRESHOLD', '3')),
+                cooldown=float(os.environ.get('RPC_COOLDOWN_SECONDS', '30'))
+            ))
+            self.w3.middleware_onion.inject(web3_middleware.geth_poa_middleware, layer=0)
             
             # Load account
             self.account = self.w3.eth.account.from_key(private_key)
+            self.nonce_manager = shared_nonce_manager(self.w3, self.account.address)
+            self.receipt_tracker = ReceiptTracker(
+                self.w3,
+                poll_interval=float(os.environ.get('RECEIPT_POLL_INTERVAL', '2')),
+                timeout_seconds=float(os.environ.get('RECEIPT_TIMEOUT', '600'))
+            )
+            self.fee_engine = FeeEngine(
+                self.w3,
+                self.account,
+                gas_cache_ttl=float(os.environ.get('GAS_CACHE_TTL_SECONDS', '300')),
+                gas_headroom=int(os.environ.get('GAS_HEADROOM', '50000')),
+                stuck_after=float(os.environ.get('TX_STUCK_AFTER_SECONDS', '90')),
+                max_fee_cap=int(os.environ['MAX_FEE_PER_GAS']) if os.environ.get('MAX_FEE_PER_GAS') else None,
+                on_replaced=self.receipt_tracker.replace
+            )
+            self.reads = read_cache.BlockAwareReadCache(
+                self.w3,
+                multicall_address=os.environ.get('MULTICALL3_ADDRESS', read_cache.MULTICALL3_ADDRESS) or None,
+                head_ttl=float(os.environ.get('READ_CACHE_HEAD_TTL', '1'))
+            )
             
             # Load contract
             self._load_contract()
@@ -89,7 +145,18 @@ class Web3Service:
             logger.info(f"Web3 initialized successfully. Network: {self.w3.eth.chain_id}")
             
         except Exception as e:
+            # The registry marks the service failed and retries it; nothing
+            # has started a thread yet, only the provider's hedge workers
             logger.error(f"Failed to initialize Web3: {e}")
+            if self.w3 is not None:
+                self.w3.provider.close()
+            raise
+        
+        # Background loops start once construction can no longer fail, so
+        # retried constructions leave no threads polling the RPC behind
+        self.fee_engine.start()
+        if self.indexer:
+            self.indexer.start()
     
     def _load_contract(self):
         """Load smart contract"""
@@ -107,9 +174,28 @@ class Web3Service:
                     abi=self.contract_abi
                 )
                 logger.info("Smart contract loaded successfully")
+                
+                # Scanning from genesis would take days of eth_getLogs calls, so
+                # without a known start block the service runs unindexed and
+                # only the history endpoints report 503
+                indexer_enabled = os.environ.get('EVENT_INDEXER_ENABLED', 'true').lower() == 'true'
+                start_block = os.environ.get('EVENT_INDEXER_START_BLOCK') or config.get('deploymentBlock')
+                if indexer_enabled and start_block in (None, ''):
+                    logger.warning("Event indexer disabled: set EVENT_INDEXER_START_BLOCK (or deploymentBlock "
+                                   "in config/contract-config.json) to the contract's deployment block")
+                elif indexer_enabled:
+                    self.indexer = event_indexer.EventIndexer(
+                        self.w3,
+                        self.contract,
+                        start_block=int(start_block),
+                        db_path=os.environ.get('EVENT_INDEXER_DB_PATH', 'data/events.db'),
+                        chunk_size=int(os.environ.get('EVENT_INDEXER_CHUNK_SIZE', '2000')),
+                        confirmations=int(os.environ.get('EVENT_INDEXER_CONFIRMATIONS', '2'))
+                    )
             
         except Exception as e:
             logger.error(f"Failed to load contract: {e}")
+            raise
     
     def is_connected(self) -> bool:
         """Check if Web3 is connected"""
@@ -129,7 +215,13 @@ class Web3Service:
                 'network': self.w3.eth.chain_id,
                 'block_number': self.w3.eth.block_number,
                 'contract_address': self.contract_address,
-                'account': self.account.address if self.account else None
+                'account': self.account.address if self.account else None,
+                'nonce': self.nonce_manager.get_status() if self.nonce_manager else None,
+                'fees': self.fee_engine.get_stats() if self.fee_engine else None,
+                'read_cache': self.reads.get_stats() if self.reads else None,
+                'indexer': self.indexer.get_status() if self.indexer else None,
+                'pending_transactions': self.receipt_tracker.pending_count() if self.receipt_tracker else 0,
+                'rpc_endpoints': self.w3.provider.pool.get_stats()
             }
         except Exception as e:
             return {
@@ -143,7 +235,7 @@ class Web3Service:
             if not self.contract:
                 return 0.0
             
-            balance_wei = self.contract.functions.balanceOf(address).call()
+            balance_wei = self.reads.read_one(('balance', address), self.contract.functions.balanceOf(address))
             balance_ether = self.w3.from_wei(balance_wei, 'ether')
             return float(balance_ether)
             
@@ -157,22 +249,86 @@ class Web3Service:
             if not self.contract:
                 return {}
             
-            stats = self.contract.functions.getUserStats(address).call()
-            return {
-                'total_photos': stats[0],
-                'total_rewards': float(self.w3.from_wei(stats[1], 'ether')),
-                'total_purchases': stats[2],
-                'tier': stats[3],
-                'staking_balance': float(self.w3.from_wei(stats[4], 'ether')),
-                'streak_days': stats[5]
-            }
+            stats = self.reads.read_one(('stats', address), self.contract.functions.getUserStats(address))
+            return self._format_user_stats(stats)
             
         except Exception as e:
             logger.error(f"Failed to get user stats: {e}")
             return {}
     
+    def get_user_overview(self, address: str) -> Tuple[Dict, float]:
+        """Get user statistics and token balance in a single batched read"""
+        try:
+            if not self.contract:
+                return {}, 0.0
+            
+            results = self.reads.read({
+                ('stats', address): self.contract.functions.getUserStats(address),
+                ('balance', address): self.contract.functions.balanceOf(address)
+            })
+            balance = float(self.w3.from_wei(results[('balance', address)], 'ether'))
+            return self._format_user_stats(results[('stats', address)]), balance
+            
+        except Exception as e:
+            logger.error(f"Failed to get user overview: {e}")
+            return {}, 0.0
+    
+    def _format_user_stats(self, stats) -> Dict:
+        return {
+            'total_photos': stats[0],
+            'total_rewards': float(self.w3.from_wei(stats[1], 'ether')),
+            'total_purchases': stats[2],
+            'tier': stats[3],
+            'staking_balance': float(self.w3.from_wei(stats[4], 'ether')),
+            'streak_days': stats[5]
+        }
+    
+    def get_purchase(self, user_address: str, tx_hash: str) -> Optional[Dict]:
+        """What a mined processPurchase transaction charged and paid back; None until it is mined"""
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            return None
+        if receipt.status != 1:
+            raise ValueError('Purchase transaction failed')
+        
+        made = [event for event in self.contract.events.PurchaseMade().process_receipt(
+                    receipt, errors=web3_logs.DISCARD)
+                if event.args.user.lower() == user_address.lower()]
+        if not made:
+            raise ValueError('Transaction is not a purchase by this address')
+        purchase_id = made[0].args.purchaseId
+        
+        # buyer, productId, amount, tokenDiscount, cashbackAmount, timestamp, treatmentTracking
+        purchase = self.contract.functions.purchases(purchase_id).call(block_identifier=receipt.blockNumber)
+        # The tier discount is not stored; it is the rate for the tier the
+        # buyer held as the purchase's block began
+        before = receipt.blockNumber - 1
+        tier = self.contract.functions.getUserStats(user_address).call(block_identifier=before)[3]
+        discount_rate = self.contract.functions.tierDiscounts(tier).call(block_identifier=before)
+        price = purchase[2]
+        discount = price * discount_rate // 100
+        
+        def to_ether(value: int) -> float:
+            return float(self.w3.from_wei(value, 'ether'))
+        
+        return {
+            'purchase_id': purchase_id,
+            'product_id': purchase[1],
+            'transaction_hash': self.w3.to_hex(receipt.transactionHash),
+            'block_number': receipt.blockNumber,
+            'tier': tier,
+            'base_price': to_ether(price),
+            'discount_rate': discount_rate,
+            'discount_amount': to_ether(discount),
+            'token_payment': to_ether(purchase[3]),
+            'final_price': to_ether(price - discount - purchase[3]),
+            'cashback_tokens': to_ether(purchase[4]),
+            'timestamp': purchase[5]
+        }
+    
     def upload_photo_to_blockchain(self, user_address: str, ipfs_hash: str, 
-                                 crop_type: str, ai_result: Dict) -> Dict:
+                                 crop_type: str, ai_result: Dict, callback=None) -> Dict:
         """Upload photo and trigger blockchain verification"""
         try:
             if not self.contract or not self.account:
@@ -188,35 +344,46 @@ class Web3Service:
                 function_code
             )
             
-            # Estimate gas
-            gas_estimate = function.estimate_gas({'from': self.account.address})
-            
-            # Build transaction
-            transaction = function.build_transaction({
-                'from': self.account.address,
-                'gas': gas_estimate + 50000,  # Add buffer
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': self.w3.eth.get_transaction_count(self.account.address)
-            })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            # Cached gas limit and EIP-1559 fees, locally allocated nonce
+            tx_hash = self.fee_engine.send(function, self.nonce_manager)
             
-            # Wait for confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+            # Confirmation is resolved in the background; poll /api/tx/<hash>
+            record = self.receipt_tracker.track(
+                tx_hash,
+                {'type': 'photo_upload', 'user_address': user_address, 'ipfs_hash': ipfs_hash},
+                callback
+            )
             
             return {
                 'success': True,
-                'transaction_hash': receipt.transactionHash.hex(),
-                'block_number': receipt.blockNumber,
-                'gas_used': receipt.gasUsed
+                'transaction_hash': record['transaction_hash'],
+                'status': record['status']
             }
             
         except Exception as e:
             logger.error(f"Failed to upload photo to blockchain: {e}")
             return {'success': False, 'error': str(e)}
     
+    def get_transaction_status(self, tx_hash: str) -> Optional[Dict]:
+        """Get a submitted transaction's status from the tracker or, if untracked, the chain"""
+        if self.receipt_tracker:
+            record = self.receipt_tracker.get(tx_hash)
+            if record:
+                return record
+        
+        if not self.is_connected():
+            return None
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            return None
+        return {
+            'transaction_hash': tx_hash,
+            'status': 'confirmed' if receipt.status == 1 else 'failed',
+            'block_number': receipt.blockNumber,
+            'gas_used': receipt.gasUsed
+        }
+    
     def _get_verification_function_code(self) -> str:
         """Get Chainlink Functions JavaScript code for verification"""
         return """
@@ -228,7 +395,10 @@ class Web3Service:
         const aiResponse = await Functions.makeHttpRequest({
             url: `${secrets.AI_BACKEND_URL}/api/verify-disease`,
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${secrets.BACKEND_API_KEY}`
+            },
             data: { ipfs_hash: ipfsHash, crop_type: cropType }
         });
         
@@ -253,7 +423,19 @@ class IPFSService:
     
     def __init__(self):
         self.client = None
+        # Raises before the pin queue starts, so a retried construction
+        # leaves no workers behind
         self._initialize_ipfs()
+        # Uploads return a locally computed CID; pinning happens in the background
+        self.pins = PinQueue(
+            self._pin_file,
+            db_path=os.environ.get('IPFS_PIN_DB_PATH', 'data/pins.db'),
+            spool_dir=os.environ.get('IPFS_PIN_SPOOL_DIR', 'data/pin_spool'),
+            cid_version=int(os.environ.get('IPFS_CID_VERSION', '0')),
+            concurrency=int(os.environ.get('IPFS_PIN_CONCURRENCY', '4')),
+            max_attempts=int(os.environ.get('IPFS_PIN_MAX_ATTEMPTS', '8')),
+            stale_seconds=float(os.environ.get('IPFS_PIN_STALE_SECONDS', '900'))
+        ).start()
     
     def _initialize_ipfs(self):
         """Initialize IPFS client"""
@@ -273,22 +455,66 @@ class IPFSService:
             
         except Exception as e:
             logger.error(f"Failed to initialize IPFS: {e}")
+            raise
+    
+    def _pin_file(self, path: str, cid_version: int) -> str:
+        """Add a spooled file to IPFS (pin queue worker); returns the node's CID"""
+        if not self.client:
+            self._initialize_ipfs()
+            if not self.client:
+                raise ConnectionError("IPFS node not reachable")
+        return self.client.add(path, **ipfs_add_options(cid_version))['Hash']
     
     def upload_file(self, file_path: str) -> Optional[str]:
-        """Upload file to IPFS and return hash"""
+        """Queue a file for IPFS and return its CID"""
         try:
-            if not self.client:
-                return None
+            with open(file_path, 'rb') as f:
+                ipfs_hash = self.pins.enqueue_stream(f, os.path.basename(file_path))
+            logger.info(f"File queued for IPFS: {ipfs_hash}")
+            return ipfs_hash
             
-            result = self.client.add(file_path)
-            ipfs_hash = result['Hash']
-            logger.info(f"File uploaded to IPFS: {ipfs_hash}")
+        except Exception as e:
+            logger.error(f"Failed to queue file for IPFS: {e}")
+            return None
+    
+    def upload_stream(self, stream: BinaryIO) -> Optional[str]:
+        """Queue an in-memory or spooled file object for IPFS and return its CID"""
+        try:
+            stream.seek(0)
+            ipfs_hash = self.pins.enqueue_stream(stream)
+            logger.info(f"Stream queued for IPFS: {ipfs_hash}")
             return ipfs_hash
             
         except Exception as e:
-            logger.error(f"Failed to upload to IPFS: {e}")
+            logger.error(f"Failed to queue stream for IPFS: {e}")
             return None
     
+    def fetch(self, cid: str, max_size: int) -> Optional[bytes]:
+        """
+        Content of a CID this backend queued for pinning, or None. Anything
+        else, or anything over max_size, is never read; the content is
+        checked against the CID itself.
+        """
+        if not self.client or self.pins.status(cid) is None:
+            return None
+        timeout = float(os.environ.get('IPFS_FETCH_TIMEOUT', '10'))
+        try:
+            # CumulativeSize includes DAG framing, so it bounds the file size
+            if int(self.client.object.stat(cid, timeout=timeout)['CumulativeSize']) > max_size + 65536:
+                logger.warning(f"Refusing to fetch {cid}: larger than {max_size} bytes")
+                return None
+            data = self.client.cat(cid, length=max_size + 1, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Failed to fetch {cid} from IPFS: {e}")
+            return None
+        if len(data) > max_size:
+            logger.warning(f"Refusing {cid}: larger than {max_size} bytes")
+            return None
+        if compute_cid(data, 0 if cid.startswith('Qm') else 1) != cid:
+            logger.warning(f"IPFS content for {cid} does not match its CID")
+            return None
+        return data
+    
     def upload_json(self, data: Dict) -> Optional[str]:
         """Upload JSON data to IPFS"""
         try:
@@ -306,84 +532,312 @@ class IPFSService:
 class AIService:
     """AI service for disease detection"""
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         self.model = None
+        self.model_version = 'mock'
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.classes = [
-            'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
-            'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 'Corn_(maize)___Common_rust_',
-            'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy',
-            'Grape___Black_rot', 'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
-            'Grape___healthy', 'Potato___Early_blight', 'Potato___Late_blight', 'Potato___healthy',
-            'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___Late_blight',
-            'Tomato___Leaf_Mold', 'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites Two-spotted_spider_mite',
-            'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus',
-            'Tomato___healthy'
-        ]
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
-        self._load_model()
+        self.classes = list(PLANT_DISEASE_CLASSES)
+        self.preprocessor = None
+        self._preprocess_lock = threading.Lock()
+        self.batcher = None
+        self.worker_pool = None
+        self.cascade = None
+        self.cache = PredictionCache(
+            redis_client,
+            max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', '2048')),
+            ttl_seconds=int(os.environ.get('AI_CACHE_TTL_SECONDS', '86400'))
+        )
+        self.model_format = os.environ.get('AI_MODEL_FORMAT', 'pytorch').lower()
+        # An empty AI_MODEL_PATH (as in env.template) means the format's default
+        self.model_path = os.environ.get('AI_MODEL_PATH') or model_loader.DEFAULT_MODEL_PATHS.get(
+            self.model_format, model_loader.DEFAULT_MODEL_PATHS['pytorch']
+        )
+        self.quantization = os.environ.get('AI_QUANTIZATION', 'off').lower()
+        self.load_stats = {
+            'format': self.model_format,
+            'path': self.model_path,
+            'quantization': 'off',
+            'load_time_ms': None,
+            'warmup_ms': {},
+            'first_inference_ms': None
+        }
+        self._model_lock = threading.Lock()
+        self._model_initialized = False
+        # Demo mode: answer with mock predictions when there is no model
+        self.mock_predictions = os.environ.get('AI_MOCK_PREDICTIONS', 'false').lower() == 'true'
+        self.lazy = os.environ.get('AI_MODEL_LAZY_LOAD', 'false').lower() == 'true'
+        if self.lazy and int(os.environ.get('AI_WORKER_PROCESSES', '0')) > 0:
+            # Loading on first use would fork the workers from a request thread
+            logger.warning("AI_MODEL_LAZY_LOAD is ignored with AI_WORKER_PROCESSES")
+            self.lazy = False
+        if not self.lazy and not self._ensure_model() and not self.mock_predictions:
+            raise RuntimeError(f"AI model could not be loaded from {self.model_path}")
+    
+    def _ensure_model(self) -> bool:
+        """Load, batch and warm up the model once, on first use when lazy"""
+        if not self._model_initialized:
+            with self._model_lock:
+                if not self._model_initialized:
+                    self._load_model()
+                    self._initialize_batcher()
+                    self._warmup_model()
+                    self._model_initialized = True
+        return self.model is not None
     
     def _load_model(self):
         """Load the trained AI model"""
         try:
-            model_path = 'models/plant_disease_model.pth'
-            if os.path.exists(model_path):
-                self.model = torch.load(model_path, map_location=self.device)
-                self.model.eval()
-                logger.info("AI model loaded successfully")
+            if self.quantization == 'int8' and self._load_quantized_model():
+                return
+            
+            if os.path.exists(self.model_path):
+                start = time.perf_counter()
+                self.model = model_loader.load_model(self.model_format, self.model_path, self.device)
+                self.load_stats['load_time_ms'] = round((time.perf_counter() - start) * 1000.0, 3)
+                self._set_model_version(self.model_path)
+                logger.info(f"AI model loaded successfully ({self.model_format}, "
+                            f"{self.load_stats['load_time_ms']} ms)")
             else:
-                logger.warning("AI model not found, using mock predictions")
+                logger.warning(f"AI model not found at {self.model_path}")
                 
         except Exception as e:
             logger.error(f"Failed to load AI model: {e}")
+        finally:
+            if self.model is not None:
+                self._load_cascade()
     
-    def predict_disease(self, image_path: str) -> Dict:
-        """Predict disease from image"""
+    def _load_cascade(self):
+        """Put a small fast model in front of the full model when configured"""
+        fast_path = os.environ.get('AI_CASCADE_MODEL_PATH')
+        if not fast_path:
+            return
         try:
-            if not self.model:
-                # Mock prediction for demo
-                return self._mock_prediction(image_path)
-            
-            # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
-            input_tensor = self.transform(image).unsqueeze(0).to(self.device)
-            
-            # Make prediction
+            fast_format = os.environ.get('AI_CASCADE_MODEL_FORMAT', 'pytorch').lower()
+            threshold = float(os.environ.get('AI_CASCADE_CONFIDENCE', '0.9'))
+            fast_model = model_loader.load_model(fast_format, fast_path, self.device)
+            self.cascade = cascade.ModelCascade(fast_model, self.model, threshold)
+            # Cascade answers differ from full-model answers, so cached
+            # predictions must not be shared across configurations
+            self._set_model_version(self.load_stats['path'], fast_path, str(threshold))
+            logger.info(f"AI model cascade enabled (fast model {fast_path}, threshold {threshold})")
+        except Exception as e:
+            logger.error(f"Failed to load cascade model, using full model only: {e}")
+    
+    def _load_quantized_model(self) -> bool:
+        """Load the gated INT8 artifact; False falls back to the fp32 path"""
+        model_path = os.environ.get('AI_QUANTIZED_MODEL_PATH', quantization.DEFAULT_QUANTIZED_MODEL_PATH)
+        min_agreement = float(os.environ.get('AI_QUANTIZATION_MIN_AGREEMENT', str(quantization.DEFAULT_MIN_AGREEMENT)))
+        
+        start = time.perf_counter()
+        model = quantization.load_quantized_model(model_path, min_agreement)
+        if model is None:
+            return False
+        
+        # Quantized kernels are CPU-only
+        self.device = torch.device('cpu')
+        self.model = model
+        self.load_stats.update({
+            'format': 'torchscript',
+            'path': model_path,
+            'quantization': 'int8',
+            'load_time_ms': round((time.perf_counter() - start) * 1000.0, 3)
+        })
+        self._set_model_version(model_path)
+        logger.info(f"INT8 AI model loaded successfully ({self.load_stats['load_time_ms']} ms)")
+        return True
+    
+    def _warmup_model(self):
+        """Run representative batch sizes so the first request skips graph optimization"""
+        if self.model is None:
+            return
+        try:
+            max_batch_size = self.batcher.max_batch_size if self.batcher else 1
+            configured = os.environ.get('AI_MODEL_WARMUP_BATCH_SIZES', '')
+            batch_sizes = [int(size) for size in configured.split(',') if size.strip()] or [1, max_batch_size]
+            if self.worker_pool:
+                self.load_stats['warmup_ms'] = self.worker_pool.warmup(batch_sizes, MODEL_INPUT_SIZE)
+            else:
+                self.load_stats['warmup_ms'] = model_loader.warmup(
+                    self.model, self.device, batch_sizes, MODEL_INPUT_SIZE
+                )
+                if self.cascade:
+                    self.load_stats['cascade_warmup_ms'] = model_loader.warmup(
+                        self.cascade.fast_model, self.device, batch_sizes, MODEL_INPUT_SIZE
+                    )
+            logger.info(f"AI model warmed up: {self.load_stats['warmup_ms']}")
+        except Exception as e:
+            logger.warning(f"AI model warmup failed: {e}")
+    
+    def _set_model_version(self, model_path: str, *extra: str):
+        """Derive the model version and invalidate predictions from older models"""
+        def fingerprint(parts) -> str:
+            described = []
+            for part in parts:
+                if os.path.exists(part):
+                    stat = os.stat(part)
+                    part = f"{os.path.abspath(part)}:{stat.st_size}:{stat.st_mtime_ns}"
+                described.append(part)
+            return hashlib.sha256('|'.join(described).encode()).hexdigest()[:16]
+        
+        # AI_MODEL_VERSION names the full model only; extras such as the
+        # cascade model and threshold change answers too, so they always
+        # extend it
+        version = os.environ.get('AI_MODEL_VERSION') or fingerprint([model_path])
+        if extra:
+            version = f"{version}+{fingerprint(extra)[:8]}"
+        self.model_version = version
+        self.cache.set_model_version(version)
+    
+    def _initialize_batcher(self):
+        """Start the micro-batching scheduler and size the reusable input buffer"""
+        if not self.model:
+            return
+        if os.environ.get('AI_BATCHING_ENABLED', 'true').lower() != 'true':
+            self.preprocessor = preprocessing.BatchPreprocessor(1, MODEL_INPUT_SIZE)
+            logger.info("AI micro-batching disabled")
+            return
+
+        max_batch_size = int(os.environ.get('AI_MAX_BATCH_SIZE', '16'))
+        batch_fn = self._predict_batch
+        workers = int(os.environ.get('AI_WORKER_PROCESSES', '0'))
+        if workers > 0 and self.load_stats['format'] == 'onnx':
+            raise ValueError("AI_WORKER_PROCESSES needs a pytorch or torchscript model; "
+                             "ONNX Runtime sessions are not fork-safe")
+        if workers > 0:
+            # Fork before any forward pass so workers start from a clean
+            # intra-op thread pool; warmup then runs inside the workers
+            try:
+                threads = int(os.environ.get('AI_THREADS_PER_WORKER', '0')) or None
+                self.worker_pool = worker_pool.InferenceWorkerPool(
+                    self.model, workers, max_batch_size, len(self.classes), threads
+                )
+                batch_fn = self._predict_batch_pool
+                if self.cascade:
+                    logger.warning("Model cascade is not used by the inference worker pool")
+            except Exception as e:
+                logger.error(f"Failed to start inference worker pool, using in-process inference: {e}")
+                workers = 0
+
+        if self.worker_pool is None:
+            self.preprocessor = preprocessing.BatchPreprocessor(max_batch_size, MODEL_INPUT_SIZE)
+        self.batcher = MicroBatcher(
+            batch_fn,
+            max_batch_size=max_batch_size,
+            max_wait_ms=float(os.environ.get('AI_MAX_BATCH_WAIT_MS', '5')),
+            workers=max(1, workers)
+        )
+        logger.info(f"AI micro-batching enabled (max batch {self.batcher.max_batch_size})")
+    
+    def _predict_batch(self, images: List['np.ndarray']) -> List[Tuple['torch.Tensor', Optional[str]]]:
+        """Run one forward pass over decoded RGB uint8 images; returns (probabilities, stage)"""
+        # The preprocessor writes into a shared buffer; the batcher's single
+        # worker never contends, direct callers are serialized here
+        with self._preprocess_lock:
+            batch = self.preprocessor.prepare(images).to(self.device)
             with torch.no_grad():
-                outputs = self.model(input_tensor)
-                probabilities = torch.nn.functional.softmax(outputs[0], dim=0)
-                confidence, predicted_idx = torch.max(probabilities, 0)
+                if self.cascade:
+                    probabilities, stages = self.cascade(batch)
+                else:
+                    probabilities = torch.nn.functional.softmax(self.model(batch), dim=1)
+                    stages = [None] * len(images)
+        return list(zip(probabilities.cpu(), stages))
+    
+    def _predict_batch_pool(self, images: List['np.ndarray']) -> List[Tuple['torch.Tensor', Optional[str]]]:
+        """Run a batch on the inference worker pool; in-process once every worker has died"""
+        try:
+            return [(probabilities, None) for probabilities in self.worker_pool.predict_batch(images)]
+        except worker_pool.WorkerDied:
+            if self.worker_pool.get_stats()['alive_workers']:
+                raise
+        with self._preprocess_lock:
+            if self.preprocessor is None:
+                logger.error("No inference workers left; running inference in-process")
+                self.preprocessor = preprocessing.BatchPreprocessor(self.batcher.max_batch_size, MODEL_INPUT_SIZE)
+        return self._predict_batch(images)
+    
+    def predict_disease(self, image: Union[str, BinaryIO], image_digest: Optional[str] = None) -> Dict:
+        """Predict disease from an image path or in-memory file object"""
+        if not self._ensure_model():
+            if not self.mock_predictions:
+                raise RuntimeError("AI model is not loaded")
+            # Mock prediction for demo
+            return self._mock_prediction(image)
+        
+        try:
+            # Serve re-submitted photos from the content-addressed cache
+            digest = image_digest or sha256_file(image)
+            cached = self.cache.get(digest)
+            if cached is not None:
+                cached['timestamp'] = datetime.now().isoformat()
+                return cached
             
-            # Get prediction details
-            predicted_class = self.classes[predicted_idx.item()]
-            confidence_score = confidence.item() * 100
+            start = time.perf_counter()
             
-            # Parse class name
-            parts = predicted_class.split('___')
-            crop_type = parts[0].replace('_', ' ')
-            disease = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
+            # Decode at reduced JPEG resolution; resize/normalize happen per batch
+            rgb_image = np.asarray(decode.decode_image(image, MODEL_INPUT_SIZE))
             
-            # Get treatment recommendation
-            treatment = self._get_treatment_recommendation(disease)
+            # Make prediction, sharing a forward pass with concurrent requests
+            if self.batcher:
+                probabilities, stage = self.batcher.predict(rgb_image)
+            else:
+                probabilities, stage = self._predict_batch([rgb_image])[0]
             
-            return {
-                'crop_type': crop_type,
-                'disease': disease,
-                'confidence': round(confidence_score, 2),
-                'is_healthy': 'healthy' in disease.lower(),
-                'treatment': treatment,
-                'timestamp': datetime.now().isoformat()
-            }
+            if self.load_stats['first_inference_ms'] is None:
+                self.load_stats['first_inference_ms'] = round((time.perf_counter() - start) * 1000.0, 3)
+            
+            result = self._format_prediction(probabilities, stage)
+            self.cache.set(digest, result)
+            return result
             
         except Exception as e:
             logger.error(f"Failed to predict disease: {e}")
-            return self._mock_prediction(image_path)
+            if not self.mock_predictions:
+                raise
+            return self._mock_prediction(image)
+    
+    def _format_prediction(self, probabilities: 'torch.Tensor', stage: Optional[str] = None) -> Dict:
+        """Turn a class probability vector into the API prediction payload"""
+        confidence, predicted_idx = torch.max(probabilities, 0)
+        
+        # Get prediction details
+        predicted_class = self.classes[predicted_idx.item()]
+        confidence_score = confidence.item() * 100
+        
+        # Parse class name
+        parts = predicted_class.split('___')
+        crop_type = parts[0].replace('_', ' ')
+        disease = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
+        
+        # Get treatment recommendation
+        treatment = self._get_treatment_recommendation(disease)
+        
+        result = {
+            'crop_type': crop_type,
+            'disease': disease,
+            'confidence': round(confidence_score, 2),
+            'is_healthy': 'healthy' in disease.lower(),
+            'treatment': treatment,
+            'timestamp': datetime.now().isoformat()
+        }
+        if stage:
+            # Which cascade stage answered: 'fast' or 'full'
+            result['model_stage'] = stage
+        return result
+    
+    def get_stats(self) -> Dict:
+        """Get inference scheduler statistics"""
+        return {
+            'model_loaded': self.model is not None,
+            'model_version': self.model_version,
+            'model_load': self.load_stats,
+            'device': str(self.device),
+            'batching': self.batcher.get_stats() if self.batcher else None,
+            'worker_pool': self.worker_pool.get_stats() if self.worker_pool else None,
+            'cascade': self.cascade.get_stats() if self.cascade else None,
+            'cache': self.cache.get_stats()
+        }
     
-    def _mock_prediction(self, image_path: str) -> Dict:
+    def _mock_prediction(self, image: Union[str, BinaryIO]) -> Dict:
         """Generate mock prediction for demo purposes"""
         import random
         
@@ -426,9 +880,112 @@ class AIService:
         return 'Consult with agricultural extension service for specific treatment'
 
 # Initialize services
-web3_service = Web3Service()
-ipfs_service = IPFSService()
-ai_service = AIService()
+def connect_redis():
+    """Redis (REDIS_URL) for caching and the job queue; None when unavailable"""
+    try:
+        client = redis.Redis.from_url(os.environ.get('REDIS_URL') or 'redis://localhost:6379/0',
+                                      decode_responses=True)
+        client.ping()
+        return client
+    except Exception:
+        logger.warning("Redis not available, using in-memory cache")
+        return None
+
+# Initialize services concurrently in the background so the port binds at
+# once; routes wait briefly for what they need and otherwise answer 503
+services = ServiceRegistry(
+    wait_timeout=float(os.environ.get('SERVICE_WAIT_TIMEOUT', '5')),
+    retry_after=int(os.environ.get('SERVICE_RETRY_AFTER', '5'))
+)
+services.register('redis', connect_redis, required=False)
+# Constructors raise when their backend is unreachable or the model is
+# missing; the checks keep /api/ready honest if a node drops afterwards
+services.register('web3', Web3Service, check=lambda service: service.is_connected())
+services.register('ipfs', IPFSService, check=lambda service: service.client is not None)
+services.register('ai', lambda: AIService(services.get('redis')),
+                  check=lambda service: service.model is not None or service.lazy or service.mock_predictions)
+BOOTSTRAP_MODE = os.environ.get('SERVICE_BOOTSTRAP_MODE', MODE_BACKGROUND)
+if BOOTSTRAP_MODE != MODE_LAZY and int(os.environ.get('AI_WORKER_PROCESSES', '0')) > 0:
+    # The inference workers are forked while the model loads, and fork must
+    # come before any other thread exists: AI (and the Redis client it
+    # takes) start first, on this thread
+    services.start(MODE_SEQUENTIAL, names=('redis', 'ai'))
+services.start(BOOTSTRAP_MODE)
+web3_service = services.proxy('web3')
+ipfs_service = services.proxy('ipfs')
+ai_service = services.proxy('ai')
+
+# Shared decode/inference threads for /api/predict/batch
+BATCH_MAX_IN_FLIGHT = int(os.environ.get('AI_BATCH_MAX_IN_FLIGHT', '32'))
+BATCH_MAX_IMAGES = int(os.environ.get('AI_BATCH_MAX_IMAGES', '1000'))
+BATCH_MAX_REQUEST_SIZE = int(float(os.environ.get('AI_BATCH_MAX_REQUEST_MB', '1024')) * 1024 * 1024)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_IN_FLIGHT, thread_name_prefix='batch-predict')
+# Images held in memory across all concurrent batch requests, not per request
+batch_slots = threading.BoundedSemaphore(BATCH_MAX_IN_FLIGHT)
+
+# Stage threads for the upload pipelines; each request uses a few at once
+pipeline_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PIPELINE_WORKERS', '16')), thread_name_prefix='pipeline'
+)
+PIPELINE_TIMEOUT = float(os.environ.get('PIPELINE_TIMEOUT_SECONDS', '30'))
+
+# Every uploaded image and its prediction, by CID, so Chainlink verification
+# callbacks are answered without IPFS round trips or inference
+blob_store = BlobStore(os.environ.get('BLOB_STORE_DIR', 'data/blobs'))
+CID_VERSION = int(os.environ.get('IPFS_CID_VERSION', '0'))
+
+# Clear files orphaned in uploads/ by older request paths or crashes
+upload_sweeper = UploadSweeper(
+    interval_seconds=int(os.environ.get('UPLOAD_SWEEP_INTERVAL_SECONDS', '600')),
+    max_age_seconds=int(os.environ.get('UPLOAD_MAX_AGE_SECONDS', '3600'))
+).start()
+
+# Background jobs: the slow half of async uploads (IPFS, chain transactions)
+def run_upload_photo_job(payload: Dict) -> Dict:
+    """Job: add the stored image to IPFS and record it on-chain"""
+    if not blob_store.has(payload['cid']):
+        # The web process that took the request stored it under its own root
+        raise IOError(f"Image {payload['cid']} is not in {blob_store.root}; job workers "
+                      f"must share BLOB_STORE_DIR with the web processes")
+    with blob_store.open(payload['cid']) as image:
+        ipfs_hash = ipfs_service.upload_stream(image)
+    if not ipfs_hash:
+        raise IOError('Failed to upload to IPFS')
+    
+    ai_result = payload['ai_result']
+    callback = None
+    if payload.get('callback_url'):
+        try:
+            callback = webhook_callback(payload['callback_url'])
+        except WebhookRejected as e:
+            # Accepted at enqueue; the host has since stopped qualifying
+            logger.warning(f"Dropping webhook: {e}")
+    blockchain_result = web3_service.upload_photo_to_blockchain(
+        payload['user_address'], ipfs_hash, ai_result['crop_type'], ai_result, callback=callback
+    )
+    if not blockchain_result['success']:
+        raise RuntimeError(blockchain_result['error'])
+    # Confirmation is tracked by the receipt tracker, not waited for here
+    return {'ipfs_hash': ipfs_hash, 'blockchain': blockchain_result}
+
+def create_job_queue() -> JobQueue:
+    """Redis-backed job queue; in-process when Redis is unavailable"""
+    redis_client = services.get('redis')
+    workers = int(os.environ.get('JOB_WORKERS', '2'))
+    if redis_client is None:
+        # Nothing outside this process can see an in-process queue
+        workers = max(1, workers)
+    jobs = JobQueue(
+        redis_client,
+        result_ttl=int(os.environ.get('JOB_RESULT_TTL_SECONDS', '86400')),
+        stale_seconds=float(os.environ.get('JOB_STALE_SECONDS', '900'))
+    )
+    jobs.register('upload_photo_blockchain', run_upload_photo_job)
+    return jobs.start(workers)
+
+# Registered once its handlers exist; start() only picks up pending services
+services.register('jobs', create_job_queue, required=False)
+services.start(BOOTSTRAP_MODE)
 
 # ============ API ROUTES ============
 
@@ -439,24 +996,82 @@ def index():
 
 @app.route('/api/health')
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness; never waits on a starting service)"""
+    chain = services.peek('web3')
+    ipfs = services.peek('ipfs')
+    ai = services.peek('ai')
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'services': {
-            'web3': web3_service.is_connected(),
-            'ipfs': ipfs_service.client is not None,
-            'ai': ai_service.model is not None,
-            'redis': redis_client is not None
-        }
+            'web3': chain is not None and chain.is_connected(),
+            'ipfs': ipfs is not None and ipfs.client is not None,
+            'ai': ai is not None and ai.model is not None,
+            'redis': services.peek('redis') is not None
+        },
+        'ai_model': ai.load_stats if ai else None
     })
 
+@app.route('/api/ready')
+def readiness_check():
+    """Readiness endpoint: 200 once every required service has started"""
+    status = services.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/ai/stats')
+def ai_stats():
+    """AI inference statistics (queue depth, batch sizes, latency, cache hits)"""
+    return jsonify(ai_service.get_stats())
+
 @app.route('/api/blockchain-status')
 def blockchain_status():
     """Get blockchain connection status"""
     return jsonify(web3_service.get_status())
 
+@app.route('/api/tx/<tx_hash>')
+def transaction_status(tx_hash):
+    """Get the confirmation status of a submitted transaction"""
+    record = web3_service.get_transaction_status(tx_hash)
+    if record is None:
+        return jsonify({'error': 'Transaction not found'}), 404
+    return jsonify(record)
+
+@app.route('/api/ipfs/pins')
+def ipfs_pin_stats():
+    """Write-behind IPFS pin queue counters"""
+    return jsonify(ipfs_service.pins.get_stats())
+
+@app.route('/api/ipfs/pins/<cid>')
+def ipfs_pin_status(cid):
+    """Pin state of an uploaded CID"""
+    status = ipfs_service.pins.status(cid)
+    if status is None:
+        return jsonify({'error': 'CID not found'}), 404
+    return jsonify(status)
+
+@app.route('/api/jobs')
+@services.requires('jobs')
+def job_stats():
+    """Background job queue backend, depth and counters"""
+    return jsonify(services.get('jobs').get_stats())
+
+@app.route('/api/jobs/<job_id>')
+@services.requires('jobs')
+def job_status(job_id):
+    """State of an async upload job; result holds the IPFS hash and transaction"""
+    record = services.get('jobs').get(job_id)
+    if record is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # The job ends once the transaction is sent; fold in its confirmation
+    tx_hash = ((record.get('result') or {}).get('blockchain') or {}).get('transaction_hash')
+    chain = services.peek('web3')
+    if tx_hash and chain is not None:
+        record['transaction'] = chain.get_transaction_status(tx_hash)
+    return jsonify(record)
+
 @app.route('/api/contract-config')
+@services.requires('web3')
 def contract_config():
     """Get contract configuration for frontend"""
     try:
@@ -469,16 +1084,16 @@ def contract_config():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/user-stats/<address>')
+@services.requires('web3')
 def get_user_stats(address):
     """Get user statistics"""
     try:
         # Validate address
-        if not Web3.is_address(address):
+        if not web3.Web3.is_address(address):
             return jsonify({'error': 'Invalid address'}), 400
         
-        # Get stats from blockchain
-        stats = web3_service.get_user_stats(address)
-        balance = web3_service.get_token_balance(address)
+        # Get stats and balance from blockchain in one round trip
+        stats, balance = web3_service.get_user_overview(address)
         
         return jsonify({
             'address': address,
@@ -490,114 +1105,310 @@ def get_user_stats(address):
         logger.error(f"Failed to get user stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/user-history/<address>')
+def get_user_history(address):
+    """Get a user's on-chain activity from the local event index"""
+    if not web3.Web3.is_address(address):
+        return jsonify({'error': 'Invalid address'}), 400
+    if not web3_service.indexer:
+        return jsonify({'error': 'Event indexer not available'}), 503
+    
+    try:
+        before_block = request.args.get('before_block', type=int)
+        history = web3_service.indexer.user_history(
+            address,
+            event=request.args.get('event'),
+            limit=request.args.get('limit', 50, type=int),
+            before_block=before_block
+        )
+        return jsonify({
+            'address': address,
+            'events': history,
+            'indexed_to_block': web3_service.indexer.checkpoint()
+        })
+        
+    except Exception as e:
+        logger.error(f"Failed to get user history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/user-activity/<address>')
+def get_user_activity(address):
+    """Get aggregate user statistics from the local event index"""
+    if not web3.Web3.is_address(address):
+        return jsonify({'error': 'Invalid address'}), 400
+    if not web3_service.indexer:
+        return jsonify({'error': 'Event indexer not available'}), 503
+    
+    try:
+        return jsonify({
+            'address': address,
+            **web3_service.indexer.user_stats(address)
+        })
+        
+    except Exception as e:
+        logger.error(f"Failed to get user activity: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def calculate_upload_rewards(ai_result: Dict) -> Dict:
+    """Token rewards for an uploaded photo"""
+    base_reward = 5
+    disease_bonus = 100 if not ai_result['is_healthy'] else 20
+    confidence_bonus = int(ai_result['confidence'] / 10) if ai_result['confidence'] > 80 else 0
+    return {
+        'base_reward': base_reward,
+        'disease_bonus': disease_bonus,
+        'confidence_bonus': confidence_bonus,
+        'total_reward': base_reward + disease_bonus + confidence_bonus
+    }
+
+def read_image_form(**buffer_kwargs) -> Tuple[Dict[str, str], Optional[UploadBuffer]]:
+    """
+    Form fields and the 'file' upload, parsed from the request stream in
+    one pass: the image goes straight into its UploadBuffer instead of
+    being spooled by request.files first. Raises UploadRejected or
+    ValueError for a body the views answer with 4xx.
+    """
+    return read_upload_form(request.environ, 'file', app.config['MAX_CONTENT_LENGTH'], **buffer_kwargs)
+
+def image_form_error(e: ValueError):
+    """Response for a request body read_image_form refused"""
+    if isinstance(e, UploadRejected):
+        return jsonify({'error': str(e)}), 413 if isinstance(e, UploadTooLarge) else 400
+    return jsonify({'error': f'Malformed multipart body: {e}'}), 400
+
+def enqueue_photo_upload(upload: UploadBuffer, user_address: str, callback_url: Optional[str]):
+    """Async upload: predict now, leave IPFS and the chain to a background job (202)"""
+    with upload:
+        jobs = services.get('jobs')
+        ai_result = ai_service.predict_disease(upload.open(), image_digest=upload.sha256)
+        # Workers read the image from the blob store, not from this request
+        blob_store.put_stream(upload.cid, upload.open())
+        blob_store.set_prediction(upload.cid, ai_result, ai_service.model_version)
+    
+    job_id = jobs.enqueue('upload_photo_blockchain', {
+        'user_address': user_address,
+        'cid': upload.cid,
+        'ai_result': ai_result,
+        'callback_url': callback_url
+    })
+    status_url = f'/api/jobs/{job_id}'
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': JOB_QUEUED,
+        'status_url': status_url,
+        'ai_result': ai_result,
+        'ipfs_hash': upload.cid,
+        'rewards': calculate_upload_rewards(ai_result)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
 @app.route('/api/upload-photo-blockchain', methods=['POST'])
+@services.requires('ai')
 def upload_photo_blockchain():
     """Upload photo with blockchain integration"""
     try:
+        try:
+            form, upload = read_image_form(cid_version=CID_VERSION)
+        except ValueError as e:
+            return image_form_error(e)
+        
         # Validate request
-        if 'file' not in request.files:
+        if upload is None:
             return jsonify({'error': 'No file provided'}), 400
         
-        file = request.files['file']
-        user_address = request.form.get('user_address')
+        user_address = form.get('user_address')
+        callback_url = form.get('callback_url')
         
-        if not file or not user_address:
-            return jsonify({'error': 'Missing required parameters'}), 400
-        
-        if not Web3.is_address(user_address):
-            return jsonify({'error': 'Invalid user address'}), 400
+        error = None
+        if not user_address:
+            error = 'Missing required parameters'
+        elif not web3.Web3.is_address(user_address):
+            error = 'Invalid user address'
+        elif callback_url:
+            try:
+                validate_webhook_url(callback_url)
+            except WebhookRejected as e:
+                error = str(e)
+        if error:
+            upload.close()
+            return jsonify({'error': error}), 400
         
-        # Save file temporarily
-        filename = f"{uuid.uuid4()}_{file.filename}"
-        filepath = os.path.join('uploads', filename)
-        os.makedirs('uploads', exist_ok=True)
-        file.save(filepath)
+        if wants_async(request, form):
+            return enqueue_photo_upload(upload, user_address, callback_url)
         
+        # Only the synchronous path talks to IPFS and the chain from here;
+        # 503 with Retry-After while either is down
         try:
-            # Run AI prediction
-            ai_result = ai_service.predict_disease(filepath)
-            
-            # Upload to IPFS
-            ipfs_hash = ipfs_service.upload_file(filepath)
+            services.get('ipfs')
+            services.get('web3')
+        except ServiceUnavailable:
+            upload.close()
+            raise
+        callback = webhook_callback(callback_url) if callback_url else None
+        
+        def upload_ipfs():
+            ipfs_hash = ipfs_service.upload_stream(upload.reader())
             if not ipfs_hash:
-                return jsonify({'error': 'Failed to upload to IPFS'}), 500
-            
-            # Upload to blockchain
-            blockchain_result = web3_service.upload_photo_to_blockchain(
-                user_address, ipfs_hash, ai_result['crop_type'], ai_result
-            )
-            
-            if not blockchain_result['success']:
-                return jsonify({'error': blockchain_result['error']}), 500
-            
-            # Calculate rewards
-            base_reward = 5
-            disease_bonus = 100 if not ai_result['is_healthy'] else 20
-            confidence_bonus = int(ai_result['confidence'] / 10) if ai_result['confidence'] > 80 else 0
-            total_reward = base_reward + disease_bonus + confidence_bonus
-            
-            # Clean up temporary file
-            os.remove(filepath)
-            
-            return jsonify({
-                'success': True,
-                'ai_result': ai_result,
-                'ipfs_hash': ipfs_hash,
-                'blockchain': blockchain_result,
-                'rewards': {
-                    'base_reward': base_reward,
-                    'disease_bonus': disease_bonus,
-                    'confidence_bonus': confidence_bonus,
-                    'total_reward': total_reward
-                }
-            })
-            
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            raise e
+                raise IOError('Failed to upload to IPFS')
+            return ipfs_hash
+        
+        def store_blob(ai, ipfs):
+            # Keep the image and prediction for /api/verify-disease
+            try:
+                blob_store.put_stream(ipfs, upload.reader())
+                blob_store.set_prediction(ipfs, ai, ai_service.model_version)
+            except Exception as e:
+                logger.warning(f"Failed to store blob {ipfs}: {e}")
+        
+        # Inference and the IPFS upload are independent; the chain call and
+        # the blob store each need both. The chain call sends a transaction,
+        # so once started it is waited for past the timeout, and the upload
+        # is closed only after stages abandoned at the timeout return.
+        run = (StageGraph(pipeline_executor)
+               .add('ai', lambda: ai_service.predict_disease(upload.reader(), image_digest=upload.sha256))
+               .add('ipfs', upload_ipfs)
+               .add('blob_store', store_blob, after=('ai', 'ipfs'))
+               .add('blockchain', lambda ai, ipfs: web3_service.upload_photo_to_blockchain(
+                   user_address, ipfs, ai['crop_type'], ai, callback=callback
+               ), after=('ai', 'ipfs'), no_timeout=True)
+               .run(timeout=PIPELINE_TIMEOUT, cleanup=upload.close))
+        
+        ai_result = run.result('ai')
+        try:
+            ipfs_hash = run.result('ipfs')
+        except IOError as e:
+            return jsonify({'error': str(e)}), 500
+        blockchain_result = run.result('blockchain')
+        
+        if not blockchain_result['success']:
+            return jsonify({'error': blockchain_result['error']}), 500
+        
+        return jsonify({
+            'success': True,
+            'ai_result': ai_result,
+            'ipfs_hash': ipfs_hash,
+            'blockchain': blockchain_result,
+            'rewards': calculate_upload_rewards(ai_result),
+            'timings': run.timings()
+        })
             
+    except ServiceUnavailable:
+        # Async mode needs the job queue; answered as 503 with Retry-After
+        raise
     except Exception as e:
         logger.error(f"Failed to upload photo: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/predict', methods=['POST'])
+@services.requires('ai')
 def predict_disease():
     """AI disease prediction endpoint"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        try:
+            _, upload = read_image_form()
+        except ValueError as e:
+            return image_form_error(e)
         
-        file = request.files['file']
-        if not file:
-            return jsonify({'error': 'Invalid file'}), 400
+        if upload is None:
+            return jsonify({'error': 'No file provided'}), 400
         
-        # Save file temporarily
-        filename = f"{uuid.uuid4()}_{file.filename}"
-        filepath = os.path.join('uploads', filename)
-        os.makedirs('uploads', exist_ok=True)
-        file.save(filepath)
+        # Decode straight from the request stream
+        with upload:
+            result = ai_service.predict_disease(upload.open(), image_digest=upload.sha256)
         
-        try:
-            # Run AI prediction
-            result = ai_service.predict_disease(filepath)
-            
-            # Clean up
-            os.remove(filepath)
-            
-            return jsonify(result)
-            
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            raise e
+        return jsonify(result)
             
     except Exception as e:
         logger.error(f"Failed to predict disease: {e}")
         return jsonify({'error': str(e)}), 500
 
+def has_backend_api_key() -> bool:
+    """Whether the request carries BACKEND_API_KEY as a bearer token; never true when unset"""
+    expected = os.environ.get('BACKEND_API_KEY', '')
+    provided = request.headers.get('Authorization', '')
+    return bool(expected) and hmac.compare_digest(provided.encode(), f'Bearer {expected}'.encode())
+
+@app.route('/api/verify-disease', methods=['POST'])
+def verify_disease():
+    """Chainlink Functions verification: the prediction for an uploaded image by CID"""
+    start = time.perf_counter()
+    if not has_backend_api_key():
+        return jsonify({'error': 'Unauthorized'}), 401
+    data = request.get_json(silent=True) or {}
+    ipfs_hash = str(data.get('ipfs_hash') or '')
+    crop_type = data.get('crop_type')
+    if not (ipfs_hash.isascii() and ipfs_hash.isalnum() and len(ipfs_hash) >= 8):
+        return jsonify({'error': 'Invalid ipfs_hash'}), 400
+    
+    try:
+        # A stored prediction is served even while the model is still loading;
+        # only a miss needs the AI service (503 until it is up)
+        ai = services.peek('ai')
+        record = None if ai is not None else blob_store.get_prediction(ipfs_hash)
+        if record is not None:
+            prediction, source = record['prediction'], 'store'
+        else:
+            ai = ai or services.get('ai')
+            ipfs = services.peek('ipfs')
+            max_size = app.config['MAX_CONTENT_LENGTH']
+            prediction, source = blob_store.get_or_predict(
+                ipfs_hash, ai.predict_disease, ai.model_version,
+                fetch=(lambda cid: ipfs.fetch(cid, max_size)) if ipfs is not None else None
+            )
+    except KeyError:
+        return jsonify({'error': 'Image not found'}), 404
+    
+    result = dict(prediction)
+    result.update({
+        'ipfs_hash': ipfs_hash,
+        'source': source,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 3)
+    })
+    if crop_type:
+        result['crop_match'] = str(crop_type).lower() == str(prediction.get('crop_type', '')).lower()
+    return jsonify(result)
+
+@app.route('/api/blobs/stats')
+def blob_stats():
+    """Local blob store counters (writes, dedupes, prediction hit rate)"""
+    return jsonify(blob_store.get_stats())
+
+@app.route('/api/predict/batch', methods=['POST'])
+@services.requires('ai')
+def predict_disease_batch():
+    """Batch prediction over a multipart list or zip/tar archive, streamed as NDJSON"""
+    # The body is parsed as it arrives rather than through request.files,
+    # which would spool all of it (and apply the 16MB app-wide limit) before
+    # the first prediction. Results start while later files are uploading.
+    try:
+        parts = iter_request_parts(request.environ, BATCH_MAX_REQUEST_SIZE)
+        files = (part for part in parts if part.filename is not None and part.name in ('files', 'file'))
+        first = next(files, None)
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), 413 if isinstance(e, UploadTooLarge) else 400
+    except ValueError as e:
+        return jsonify({'error': f'Malformed multipart body: {e}'}), 400
+    if first is None:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    def generate():
+        entries = iter_upload_images(itertools.chain([first], files))
+        predictions = stream_predictions(
+            entries, ai_service.predict_disease,
+            max_in_flight=BATCH_MAX_IN_FLIGHT, max_images=BATCH_MAX_IMAGES,
+            executor=batch_executor, slots=batch_slots
+        )
+        count = 0
+        for line in predictions:
+            count += 1
+            yield json.dumps(line) + '\n'
+        logger.info(f"Batch prediction streamed {count} result(s)")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/marketplace/products')
 def get_products():
     """Get marketplace products"""
@@ -632,46 +1443,28 @@ def get_products():
     return jsonify(products)
 
 @app.route('/api/purchase', methods=['POST'])
+@services.requires('web3')
 def process_purchase():
-    """Process purchase with token integration"""
+    """Report a purchase from its on-chain receipt"""
     try:
         data = request.get_json()
         
         user_address = data.get('user_address')
-        product_id = data.get('product_id')
-        payment_method = data.get('payment_method', 'fiat')
-        token_amount = data.get('token_amount', 0)
+        # processPurchase charges msg.sender, so the buyer's wallet sends it
+        # and this endpoint reports what the contract applied
+        tx_hash = data.get('transaction_hash')
         
-        if not user_address or not product_id:
+        if not user_address or not tx_hash:
             return jsonify({'error': 'Missing required parameters'}), 400
         
-        # Mock purchase processing
-        purchase_id = str(uuid.uuid4())
-        
-        # Calculate discounts based on user tier
-        user_stats = web3_service.get_user_stats(user_address)
-        tier = user_stats.get('tier', 0)
-        discount_rates = [5, 10, 15, 20, 25]  # Bronze to Diamond
-        discount_rate = discount_rates[min(tier, 4)]
-        
-        # Mock product price
-        base_price = 25.99
-        discount_amount = (base_price * discount_rate) / 100
-        final_price = base_price - discount_amount
+        try:
+            purchase = web3_service.get_purchase(user_address, tx_hash)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if purchase is None:
+            return jsonify({'error': 'Purchase transaction not mined yet', 'transaction_hash': tx_hash}), 404
         
-        # Calculate cashback
-        cashback_amount = (base_price * 10) / 100  # 10% cashback in tokens
-        
-        return jsonify({
-            'success': True,
-            'purchase_id': purchase_id,
-            'base_price': base_price,
-            'discount_rate': discount_rate,
-            'discount_amount': discount_amount,
-            'final_price': final_price,
-            'cashback_tokens': cashback_amount,
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify({'success': True, **purchase})
         
     except Exception as e:
         logger.error(f"Failed to process purchase: {e}")
@@ -742,6 +1535,13 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+@app.errorhandler(ServiceUnavailable)
+def service_unavailable(error):
+    response = jsonify(error.to_dict())
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.errorhandler(429)
 def ratelimit_handler(e):
     return jsonify({'error': 'Rate limit exceeded'}), 429
@@ -0,0 +1,38 @@
+import pytest
+
+from backend.bootstrap import (MODE_SEQUENTIAL, STATE_FAILED, STATE_READY, ServiceRegistry,
+                               ServiceUnavailable)
+
+def test_raising_factory_fails_the_service():
+    def broken():
+        raise ConnectionError('node unreachable')
+
+    services = ServiceRegistry(wait_timeout=0.1).register('ipfs', broken).start(MODE_SEQUENTIAL)
+    assert services.state('ipfs') == STATE_FAILED
+    assert not services.get_status()['ready']
+    with pytest.raises(ServiceUnavailable):
+        services.get('ipfs', timeout=0)
+
+def test_failing_check_keeps_registry_unready():
+    connected = [False]
+    services = (ServiceRegistry()
+                .register('web3', object, check=lambda _: connected[0])
+                .register('cache', object, required=False, check=lambda _: False)
+                .start(MODE_SEQUENTIAL))
+    assert services.state('web3') == STATE_READY
+    status = services.get_status()
+    assert not status['ready']
+    assert status['services']['web3']['healthy'] is False
+    # get() still hands the instance out; only readiness is gated
+    assert services.get('web3') is not None
+
+    connected[0] = True
+    # An unhealthy optional service does not gate readiness
+    assert services.is_ready()
+    assert services.get_status()['ready']
+
+def test_start_only_named_services():
+    services = ServiceRegistry().register('a', object).register('b', object)
+    services.start(MODE_SEQUENTIAL, names=('a',))
+    assert services.state('a') == STATE_READY
+    assert services.state('b') != STATE_READY
@@ -0,0 +1,84 @@
+import io
+import os
+
+import pytest
+
+from backend.storage.cid import CHUNK_SIZE, MAX_LINKS, CIDBuilder, compute_cid, compute_cid_stream, cid_to_string
+
+# `ipfs add` results for known content (kubo defaults)
+KNOWN = [
+    (b'hello world\n', 0, 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'),
+    (b'', 0, 'QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH'),
+    (b'hello world\n', 1, 'bafkreifjjcie6lypi6ny7amxnfftagclbuxndqonfipmb64f2km2devei4'),
+    (b'', 1, 'bafkreihdwdcefgh4dqkjv67uzcmw7ojee6xedzdetojuzjevtenxquvyku'),
+]
+
+def reference_cid(data: bytes, version: int, chunk_size: int = CHUNK_SIZE, max_links: int = MAX_LINKS) -> str:
+    """
+    kubo's balanced layout built top-down: the shallowest tree that holds
+    every leaf, each child subtree filled completely before the next
+    """
+    builder = CIDBuilder(version, chunk_size, max_links)
+    leaves = [builder._leaf(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    leaves = leaves or [builder._leaf(b'')]
+    depth, capacity = 0, 1
+    while capacity < len(leaves):
+        depth, capacity = depth + 1, capacity * max_links
+
+    def build(nodes, depth):
+        if depth == 0:
+            return nodes[0]
+        per_child = max_links ** (depth - 1)
+        return builder._parent([build(nodes[i:i + per_child], depth - 1)
+                                for i in range(0, len(nodes), per_child)])
+
+    return cid_to_string(build(leaves, depth).cid)
+
+def feed(builder: CIDBuilder, data: bytes, piece: int) -> str:
+    for i in range(0, len(data), piece):
+        builder.update(data[i:i + piece])
+    return builder.hexdigest()
+
+@pytest.mark.parametrize('data,version,expected', KNOWN)
+def test_known_vectors(data, version, expected):
+    assert compute_cid(data, version) == expected
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_multi_chunk_file_gets_a_parent_node(version):
+    data = os.urandom(2 * CHUNK_SIZE + 1000)
+    cid = compute_cid(data, version)
+    assert cid == reference_cid(data, version)
+    # Three leaves under one root: not the CID of any single chunk
+    assert cid != compute_cid(data[:CHUNK_SIZE], version)
+    assert cid.startswith('Qm' if version == 0 else 'bafy')
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_chunk_boundaries_do_not_depend_on_update_sizes(version):
+    data = os.urandom(3 * CHUNK_SIZE + 17)
+    expected = compute_cid(data, version)
+    for piece in (1000, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1):
+        assert feed(CIDBuilder(version), data, piece) == expected
+    assert compute_cid_stream(io.BytesIO(data), version, read_size=4096) == expected
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_more_than_max_links_leaves_adds_a_level(version):
+    # 175 full leaves and a partial one: two subtrees under the root
+    data = bytes(range(256)) * (((MAX_LINKS + 1) * CHUNK_SIZE + 5000) // 256)
+    assert len(data) > MAX_LINKS * CHUNK_SIZE
+    cid = feed(CIDBuilder(version), data, 1024 * 1024)
+    assert cid == reference_cid(data, version)
+
+@pytest.mark.parametrize('leaves', [1, 2, 3, 4, 9, 10, 27, 28, 40])
+def test_deep_balanced_trees_match_reference(leaves):
+    # Tiny chunks and fan-out exercise trees several levels deep
+    data = bytes(i % 251 for i in range(leaves * 4 - 1))
+    for version in (0, 1):
+        builder = CIDBuilder(version, chunk_size=4, max_links=3)
+        assert feed(builder, data, 5) == reference_cid(data, version, chunk_size=4, max_links=3)
+
+def test_finalized_builder_rejects_updates():
+    builder = CIDBuilder(0).update(b'abc')
+    first = builder.hexdigest()
+    assert builder.hexdigest() == first
+    with pytest.raises(ValueError):
+        builder.update(b'more')
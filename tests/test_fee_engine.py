@@ -0,0 +1,85 @@
+from backend.blockchain.fee_engine import GAS_HEADROOM, FeeEngine, gas_limit
+from backend.blockchain.nonce_manager import NonceManager
+
+class FakeEth:
+    def __init__(self, pending=0, mined=0):
+        self.pending = pending
+        self.mined = mined
+        self.sent = []
+
+    def get_transaction_count(self, address, block):
+        return self.pending if block == 'pending' else self.mined
+
+    def send_raw_transaction(self, raw):
+        self.sent.append(raw)
+        return b'\x01' * 31 + bytes([len(self.sent)])
+
+class FakeW3:
+    def __init__(self, **counts):
+        self.eth = FakeEth(**counts)
+
+class FakeAccount:
+    address = '0x' + '11' * 20
+
+def make_engine(w3):
+    engine = FeeEngine(w3, FakeAccount(), stuck_after=0.0)
+    engine._fees = {'maxPriorityFeePerGas': 10, 'maxFeePerGas': 100}
+    engine._sign = lambda function, gas, nonce, fees: ('signed', nonce, fees['maxFeePerGas'])
+    return engine
+
+def test_gas_limit_keeps_absolute_headroom():
+    # A 30k estimate on a warm account gets the headroom, not just +20%
+    assert gas_limit(30000, 1.2) == 30000 + GAS_HEADROOM
+    # Large calls keep the relative buffer
+    assert gas_limit(1000000, 1.2) == 1200000
+
+def test_stuck_transaction_is_replaced_through_nonce_manager():
+    w3 = FakeW3(pending=5, mined=5)
+    manager = NonceManager(w3, FakeAccount.address)
+    engine = make_engine(w3)
+    engine.estimate_gas = lambda function: 21000
+
+    engine.send(object(), manager)
+    assert w3.eth.sent == [('signed', 5, 100)]
+
+    engine._replace_stuck()
+    assert w3.eth.sent[-1][:2] == ('signed', 5)
+    assert w3.eth.sent[-1][2] > 100
+    assert manager.get_status()['replacements'] == 1
+    assert engine.get_stats()['replacements'] == 1
+
+def test_replacement_refused_for_nonce_handed_back():
+    w3 = FakeW3(pending=5, mined=5)
+    manager = NonceManager(w3, FakeAccount.address)
+    engine = make_engine(w3)
+    engine.estimate_gas = lambda function: 21000
+    engine.send(object(), manager)
+
+    # Dropped from the mempool: the node's pending count falls back to 5,
+    # and nonce 5 is about to go to a different transaction
+    manager.resync()
+    engine._replace_stuck()
+    assert len(w3.eth.sent) == 1
+    assert engine.get_stats()['inflight_nonces'] == []
+    assert manager.allocate() == 5
+
+def test_transaction_broadcast_elsewhere_is_watched():
+    # The async service broadcasts itself and hands the engine a sync call
+    w3 = FakeW3(pending=5, mined=5)
+    manager = NonceManager(w3, FakeAccount.address)
+    engine = make_engine(w3)
+    tx_hash = manager.submit(lambda nonce: ('async', nonce, 100))
+    engine.watch(5, tx_hash, manager, object(), 21000, {'maxPriorityFeePerGas': 10, 'maxFeePerGas': 100})
+
+    engine._replace_stuck()
+    assert w3.eth.sent[-1][:2] == ('signed', 5)
+    assert w3.eth.sent[-1][2] > 100
+
+def test_stop_joins_the_refresh_thread():
+    engine = FeeEngine(FakeW3(), FakeAccount(), refresh_interval=3600).start()
+    thread = engine._thread
+    assert thread.is_alive()
+    # Wakes the loop out of its hour-long wait instead of abandoning it
+    engine.stop()
+    assert not thread.is_alive()
+    assert engine._thread is None
@@ -0,0 +1,21 @@
+from backend.blockchain.nonce_manager import shared_nonce_manager
+
+class FakeEth:
+    def get_transaction_count(self, address, block):
+        return 7
+
+class FakeW3:
+    eth = FakeEth()
+
+def test_services_signing_with_one_key_share_an_allocator():
+    address = '0x' + 'ab' * 20
+    sync_side = shared_nonce_manager(FakeW3(), address)
+    async_side = shared_nonce_manager(FakeW3(), address.upper().replace('0X', '0x'))
+    assert sync_side is async_side
+    assert [sync_side.allocate(), async_side.allocate()] == [7, 8]
+
+def test_released_nonce_is_reused():
+    manager = shared_nonce_manager(FakeW3(), '0x' + 'cd' * 20)
+    nonce = manager.allocate()
+    manager.release(nonce)
+    assert manager.allocate() == nonce
@@ -0,0 +1,55 @@
+import os
+import time
+
+from backend.storage.pin_queue import PIN_PENDING, PIN_PINNING, PinQueue
+
+def make_queue(tmp_path, stale_seconds=60.0):
+    return PinQueue(lambda path, version: None, db_path=str(tmp_path / 'pins.db'),
+                    spool_dir=str(tmp_path / 'spool'), stale_seconds=stale_seconds)
+
+def add_pin(queue, cid, status, updated_at):
+    queue._conn.execute(
+        "INSERT INTO pins (cid, cid_version, size, status, next_attempt_at, created_at, updated_at) "
+        "VALUES (?, 0, 1, ?, ?, ?, ?)", (cid, status, updated_at, updated_at, updated_at)
+    )
+
+def spool_file(queue, name, age=0.0):
+    path = queue._spool_path(name)
+    with open(path, 'wb') as f:
+        f.write(b'x')
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+    return path
+
+def statuses(queue):
+    return dict(queue._conn.execute("SELECT cid, status FROM pins"))
+
+def test_recover_leaves_live_work_of_other_processes(tmp_path):
+    queue = make_queue(tmp_path)
+    add_pin(queue, 'QmBusy', PIN_PINNING, time.time())
+    part = spool_file(queue, 'upload.part')
+    unrecorded = spool_file(queue, 'QmJustRenamed')
+
+    queue._recover()
+    assert statuses(queue) == {'QmBusy': PIN_PINNING}
+    assert os.path.exists(part)
+    assert os.path.exists(unrecorded)
+
+def test_recover_reclaims_stale_work(tmp_path):
+    queue = make_queue(tmp_path)
+    add_pin(queue, 'QmCrashed', PIN_PINNING, time.time() - 3600)
+    part = spool_file(queue, 'upload.part', age=3600)
+    spool_file(queue, 'QmOrphan', age=3600)
+
+    queue._recover()
+    assert statuses(queue) == {'QmCrashed': PIN_PENDING, 'QmOrphan': PIN_PENDING}
+    assert not os.path.exists(part)
+
+def test_recover_is_idempotent_across_processes(tmp_path):
+    first = make_queue(tmp_path)
+    spool_file(first, 'QmOrphan', age=3600)
+    first._recover()
+    # A second process sharing the database finds the orphan already recorded
+    second = make_queue(tmp_path)
+    assert statuses(second) == {'QmOrphan': PIN_PENDING}
@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.pipeline import STAGE_DONE, STAGE_FAILED, STAGE_SKIPPED, StageGraph, StageSkipped
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        yield pool
+
+def test_dependencies_receive_results(executor):
+    run = (StageGraph(executor)
+           .add('a', lambda: 2)
+           .add('b', lambda: 3)
+           .add('c', lambda a, b: a * b, after=('a', 'b'))
+           .run(timeout=5))
+    assert run.result('c') == 6
+    assert all(run.status[name] == STAGE_DONE for name in ('a', 'b', 'c'))
+
+def test_failure_skips_dependents_only(executor):
+    def fail():
+        raise IOError('boom')
+
+    run = (StageGraph(executor)
+           .add('a', fail)
+           .add('b', lambda: 'ok')
+           .add('c', lambda a: a, after=('a',))
+           .add('d', lambda c: c, after=('c',))
+           .run(timeout=5))
+    assert run.status == {'a': STAGE_FAILED, 'b': STAGE_DONE, 'c': STAGE_SKIPPED, 'd': STAGE_SKIPPED}
+    with pytest.raises(IOError):
+        run.result('a')
+    with pytest.raises(StageSkipped):
+        run.result('d')
+    assert run.result('b') == 'ok'
+
+def test_timeout_fails_running_and_skips_waiting(executor):
+    release = threading.Event()
+    try:
+        run = (StageGraph(executor)
+               .add('slow', lambda: release.wait(5))
+               .add('after_slow', lambda slow: slow, after=('slow',))
+               .run(timeout=0.1))
+        assert run.status['slow'] == STAGE_FAILED
+        assert isinstance(run.errors['slow'], TimeoutError)
+        assert run.status['after_slow'] == STAGE_SKIPPED
+        assert 'elapsed_ms' not in run.timings()['stages']['after_slow']
+    finally:
+        release.set()
+
+def test_timeout_waits_for_running_no_timeout_stage(executor):
+    run = (StageGraph(executor)
+           .add('tx', lambda: time.sleep(0.3) or '0xabc', no_timeout=True)
+           .add('receipt', lambda tx: tx, after=('tx',))
+           .run(timeout=0.05))
+    # The transaction's outcome is reported, not a timeout; nothing new starts
+    assert run.status['tx'] == STAGE_DONE
+    assert run.result('tx') == '0xabc'
+    assert run.status['receipt'] == STAGE_SKIPPED
+
+def test_queued_stage_is_skipped_at_timeout():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        try:
+            run = (StageGraph(pool)
+                   .add('busy', lambda: release.wait(5))
+                   .add('queued', lambda: 'never', no_timeout=True)
+                   .run(timeout=0.1))
+            assert run.status['busy'] == STAGE_FAILED
+            assert run.status['queued'] == STAGE_SKIPPED
+            assert 'queued' not in run.started
+        finally:
+            release.set()
+
+def test_cleanup_waits_for_abandoned_stages(executor):
+    release = threading.Event()
+    closed = threading.Event()
+    run = (StageGraph(executor)
+           .add('reader', lambda: release.wait(5))
+           .run(timeout=0.05, cleanup=closed.set))
+    assert run.status['reader'] == STAGE_FAILED
+    assert not closed.is_set()
+    release.set()
+    assert closed.wait(5)
+
+def test_cleanup_runs_before_return_without_stragglers(executor):
+    closed = []
+    StageGraph(executor).add('a', lambda: 1).run(timeout=5, cleanup=lambda: closed.append(True))
+    assert closed == [True]
+
+def test_critical_path_follows_latest_dependency(executor):
+    run = (StageGraph(executor)
+           .add('fast', lambda: time.sleep(0.01))
+           .add('slow', lambda: time.sleep(0.15))
+           .add('join', lambda fast, slow: None, after=('fast', 'slow'))
+           .add('side', lambda fast: None, after=('fast',))
+           .run(timeout=5))
+    assert run.critical_path() == ['slow', 'join']
+    timings = run.timings()
+    assert timings['critical_path'] == ['slow', 'join']
+    assert timings['sum_ms'] >= timings['stages']['slow']['elapsed_ms']
+
+def test_add_rejects_unknown_and_duplicate_stages(executor):
+    graph = StageGraph(executor).add('a', lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add('a', lambda: 2)
+    with pytest.raises(ValueError):
+        graph.add('b', lambda missing: missing, after=('missing',))
@@ -0,0 +1,50 @@
+import re
+
+import pytest
+
+from backend.blockchain.read_cache import MULTICALL3_ADDRESS, BlockAwareReadCache
+
+class FakeFunction:
+    address = '0x' + '22' * 20
+    fn_name = 'getUserStats'
+
+    def __init__(self, result):
+        self.result = result
+        self.blocks = []
+
+    def call(self, block_identifier=None):
+        self.blocks.append(block_identifier)
+        return self.result
+
+class FakeEth:
+    block_number = 100
+
+    def __init__(self):
+        self.contracts = []
+
+    def contract(self, address, abi):
+        # web3 refuses anything but 20 bytes of hex, as an ENS name
+        if not re.fullmatch(r'0x[0-9a-fA-F]{40}', address):
+            raise ValueError(f"ENS name: '{address}' is invalid")
+        self.contracts.append(address)
+        return object()
+
+class FakeW3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+def test_multicall3_address_is_checksummed():
+    web3 = pytest.importorskip('web3')
+    assert web3.Web3.is_checksum_address(MULTICALL3_ADDRESS)
+
+def test_cache_builds_with_default_multicall_address():
+    w3 = FakeW3()
+    cache = BlockAwareReadCache(w3)
+    assert w3.eth.contracts == [MULTICALL3_ADDRESS]
+
+    function = FakeFunction([1, 2])
+    assert cache.read_one(('stats', 'a'), function) == [1, 2]
+    # Served from the cache until the head moves
+    assert cache.read_one(('stats', 'a'), function) == [1, 2]
+    assert function.blocks == [100]
+    assert cache.get_stats()['hits'] == 1
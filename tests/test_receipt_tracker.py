@@ -0,0 +1,65 @@
+import socket
+import threading
+import types
+
+import pytest
+
+from backend.blockchain import receipt_tracker
+from backend.blockchain.receipt_tracker import STATUS_CONFIRMED, ReceiptTracker, WebhookRejected, webhook_callback
+
+RECEIPT = {'status': 1, 'transactionHash': '0x' + 'ab' * 32, 'blockNumber': 7, 'gasUsed': 21000}
+
+def public_dns(addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port)) for address in addresses]
+    return getaddrinfo
+
+def test_slow_callback_does_not_hold_up_the_tracker():
+    tracker = ReceiptTracker(w3=None)
+    release, delivered = threading.Event(), []
+
+    def slow(record):
+        release.wait(5)
+        delivered.append(record['status'])
+
+    tracker.track(RECEIPT['transactionHash'], callback=slow)
+    tracker._resolve(RECEIPT['transactionHash'], RECEIPT)
+    # _resolve returned while the callback is still waiting
+    assert tracker.get(RECEIPT['transactionHash'])['status'] == STATUS_CONFIRMED
+    assert delivered == []
+    release.set()
+    tracker._callback_executor.shutdown(wait=True)
+    assert delivered == [STATUS_CONFIRMED]
+
+def test_webhook_connects_to_the_validated_address(monkeypatch):
+    monkeypatch.setenv('WEBHOOK_ALLOWED_HOSTS', 'hooks.example.com')
+    monkeypatch.setattr(socket, 'getaddrinfo', public_dns(['93.184.216.34']))
+    pools = []
+
+    class FakePool:
+        def __init__(self, host, port, **kwargs):
+            self.host, self.port, self.kwargs, self.requests = host, port, kwargs, []
+            pools.append(self)
+
+        def urlopen(self, method, path, **kwargs):
+            self.requests.append((method, path, kwargs['headers']['Host']))
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(receipt_tracker, 'urllib3', types.SimpleNamespace(HTTPSConnectionPool=FakePool))
+    monkeypatch.setattr(receipt_tracker, 'requests',
+                        types.SimpleNamespace(certs=types.SimpleNamespace(where=lambda: 'ca.pem')))
+
+    post = webhook_callback('https://hooks.example.com/tx?id=1')
+    post({'status': STATUS_CONFIRMED})
+    pool = pools[0]
+    assert (pool.host, pool.port) == ('93.184.216.34', 443)
+    assert pool.kwargs['server_hostname'] == pool.kwargs['assert_hostname'] == 'hooks.example.com'
+    assert pool.requests == [('POST', '/tx?id=1', 'hooks.example.com')]
+
+    # Rebound to a private address after validation: refused, nothing sent
+    monkeypatch.setattr(socket, 'getaddrinfo', public_dns(['10.0.0.5']))
+    with pytest.raises(WebhookRejected):
+        post({'status': STATUS_CONFIRMED})
+    assert len(pools) == 1
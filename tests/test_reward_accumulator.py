@@ -0,0 +1,43 @@
+from backend.blockchain.receipt_tracker import STATUS_CONFIRMED, STATUS_FAILED
+from backend.blockchain.reward_accumulator import (BATCH_FAILED, BATCH_OPEN, BATCH_SETTLED, REWARD_PHOTO,
+                                                   RewardAccumulator)
+
+def make_accumulator(tmp_path, status, **kwargs):
+    """settle_fn whose receipt resolves before it returns, as with a fast chain"""
+    sent = []
+
+    def settle(batch_id, folded, callback):
+        tx_hash = '0x%064x' % (len(sent) + 1)
+        sent.append((batch_id, folded))
+        callback({'transaction_hash': tx_hash, 'status': status})
+        return {'transaction_hash': tx_hash}
+
+    return RewardAccumulator(settle, db_path=str(tmp_path / 'rewards.db'), **kwargs), sent
+
+def batch(accumulator, batch_id):
+    return accumulator._conn.execute(
+        "SELECT status, attempts, tx_hash FROM batches WHERE batch_id = ?", (batch_id,)
+    ).fetchone()
+
+def test_early_confirmation_settles_batch(tmp_path):
+    accumulator, sent = make_accumulator(tmp_path, STATUS_CONFIRMED)
+    notified = []
+    accumulator.add('0xabc', REWARD_PHOTO, callback=notified.append)
+    accumulator.flush()
+
+    assert batch(accumulator, sent[0][0]) == (BATCH_SETTLED, 1, '0x%064x' % 1)
+    assert accumulator.get_stats()['owed_rewards'] == 0
+    assert notified[0]['batch_id'] == sent[0][0]
+
+def test_early_failure_reopens_batch_for_resend(tmp_path):
+    accumulator, sent = make_accumulator(tmp_path, STATUS_FAILED, max_attempts=2)
+    accumulator.add('0xabc', REWARD_PHOTO)
+    accumulator.flush()
+    batch_id = sent[0][0]
+    # Not overwritten to 'submitted' by the flush that sent it
+    assert batch(accumulator, batch_id)[:2] == (BATCH_OPEN, 1)
+
+    accumulator.flush()
+    assert [sent_id for sent_id, _ in sent] == [batch_id, batch_id]
+    assert batch(accumulator, batch_id)[:2] == (BATCH_FAILED, 2)
+    assert accumulator.get_stats()['owed_rewards'] == 1